@@ -1,40 +1,238 @@
-from flask import Flask, request, jsonify
+"""
+Reactivate API (Flask).
+
+create_app(config) builds an app around the `api` blueprint. Creating it
+does no I/O: MongoDB is connected on the first request (or by a server hook
+after forking), and the in-memory rank index and challenge catalog are
+built by start_warm_up() according to WARM_UP:
+
+  blocking    build them before serving (default)
+  background  serve immediately and build them in a thread
+  lazy        build each one on first use
+
+GET /health reports liveness only; GET /ready answers 503 until MongoDB
+answers a ping and warm-up has finished, so instances can be added to a
+load balancer as soon as they can serve.
+"""
+
+from flask import Blueprint, Flask, Response, current_app, g, request, jsonify
 from flask_cors import CORS
-from mongoengine import connect, disconnect
-from models.user import User
-from models.challenge import Challenge
+from db import connect_db as connect_mongodb, disconnect_db, is_connected, ping
+from services.admission import Overloaded, get_admission_controller
+from services.challenge_catalog import (
+    CHALLENGE_FIELDS, DIFFICULTIES, PUBLIC_FIELDS, get_challenge_catalog
+)
+from services.completion_store import (
+    COMPLETED_FORMATS, COMPLETED_KEYS, PROFILE_FIELDS, collection_storage, complete_one,
+    completed_field, profile_fields, profile_projection
+)
+from services.completions import APPLIED, DUPLICATE, MAX_BATCH_SIZE, UNKNOWN_USER, apply_completions
+from services.leaderboard_cache import build_leaderboard, get_leaderboard_cache, leaderboard_window
+from services.leaderboard_export import EXPORT_FORMATS, export_leaderboard, get_export_limiter
+from services.fieldsets import parse_fields, parse_ids
+from services.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, get_metrics
+from services.pagination import decode_cursor, encode_cursor, parse_limit
+from services.profile_cache import get_profile_cache, profile_cache_enabled
+from services.rank_index import get_rank_index
+from services.ranking import background_ranking, rank_for, rank_for_score, record_scores
+from services.rollups import WINDOWS, record_completions, window_leaderboard
+from services.serialization import dumps, json_response
+from services.users import (
+    CREATED, MAX_BATCH_SIZE as MAX_USER_BATCH_SIZE, create_user_document,
+    create_user_documents, find_user_profile, new_user_fields, valid_user_id
+)
+from services.write_behind import BufferFull, get_write_behind_buffer, write_behind_enabled
 import os
+import pymongo
+import threading
+import time
+from contextlib import ExitStack
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# Initialize Flask app
-app = Flask(__name__)
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'default-secret-key')
+WARM_UP_MODES = ('blocking', 'background', 'lazy')
 
-# Enable CORS
-CORS(app)
+api = Blueprint('api', __name__)
+
+def default_config():
+    """App settings from the environment"""
+    return {
+        'SECRET_KEY': os.getenv('SECRET_KEY', 'default-secret-key'),
+        'MONGODB_URI': os.getenv('MONGODB_URI', 'mongodb://localhost:27017/reactivate'),
+        'WARM_UP': os.getenv('WARM_UP', 'blocking').lower()
+    }
+
+def create_app(config=None):
+    """Build the Flask app; `config` overrides settings from the environment"""
+    app = Flask(__name__)
+    app.config.update(default_config())
+    app.config.update(config or {})
+    if app.config['WARM_UP'] not in WARM_UP_MODES:
+        raise ValueError(f"WARM_UP must be one of {', '.join(WARM_UP_MODES)}")
+    
+    # Enable CORS
+    CORS(app)
+    app.register_blueprint(api)
+    return app
 
 # Database connection
-def connect_db():
-    """Connect to MongoDB"""
+def connect_db(uri=None):
+    """Connect to MongoDB (idempotent)
+
+    The client is not fork-safe: under a pre-forking server call this in
+    each worker after the fork (see gunicorn.conf.py), never in the master.
+    """
+    # Command timings are only captured on clients created after this
+    get_metrics().install()
+    return connect_mongodb(uri)
+
+# Warm-up and readiness
+_warmed_up = threading.Event()
+
+def start_background_jobs():
+    """Start the rank materializer and write-behind buffer when they are enabled"""
+    from services.rank_materializer import get_rank_materializer
+    from services.write_behind import replay
+    
+    if background_ranking():
+        try:
+            get_rank_materializer().start()
+            print("Background rank materializer started")
+        except Exception as e:
+            print(f"Error starting rank materializer: {e}")
+    if write_behind_enabled():
+        try:
+            applied = replay()
+            if applied is not None:
+                print(f"Replayed {applied} unapplied completions")
+            get_write_behind_buffer().start()
+            print("Write-behind buffer started")
+        except Exception as e:
+            print(f"Error starting write-behind buffer: {e}")
+
+def warm_up(uri=None):
+    """Build in-memory indexes before serving traffic"""
+    connect_db(uri)
+    if not background_ranking():
+        try:
+            index = get_rank_index()
+            print(f"Rank index built with {len(index)} users")
+        except Exception as e:
+            print(f"Error preparing ranks: {e}")
     try:
-        connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/reactivate'))
-        print("Connected to MongoDB successfully!")
+        catalog = get_challenge_catalog()
+        print(f"Challenge catalog loaded with {len(catalog)} challenges")
     except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
+        print(f"Error loading challenge catalog: {e}")
+    start_background_jobs()
+    _warmed_up.set()
+
+def start_warm_up(app):
+    """Connect and warm up as app.config['WARM_UP'] says"""
+    mode, uri = app.config['WARM_UP'], app.config['MONGODB_URI']
+    if mode == 'background':
+        connect_db(uri)
+        threading.Thread(target=warm_up, args=(uri,), name='warm-up', daemon=True).start()
+    elif mode == 'lazy':
+        # Caches are built by the first request that needs them
+        connect_db(uri)
+        start_background_jobs()
+        _warmed_up.set()
+    else:
+        warm_up(uri)
 
-def disconnect_db():
-    """Disconnect from MongoDB"""
+def shut_down():
+    """Stop background work and close the connection"""
+    from services.rank_materializer import get_rank_materializer
+    
+    if write_behind_enabled():
+        get_write_behind_buffer().stop()
+    if background_ranking():
+        get_rank_materializer().stop()
+    if profile_cache_enabled():
+        get_profile_cache().close()
+    disconnect_db()
+
+def log_completions(events):
+    """Append applied completions to the event log and windowed rollups
+
+    The score is already awarded at this point, so a failure here is
+    reported but does not fail the request.
+    """
     try:
-        disconnect()
-        print("Disconnected from MongoDB")
+        record_completions(events, logged=collection_storage())
     except Exception as e:
-        print(f"Error disconnecting from MongoDB: {e}")
+        print(f"Error recording completions: {e}")
+
+# Request instrumentation
+@api.before_app_request
+def start_request_timer():
+    metrics = get_metrics()
+    if metrics.enabled:
+        g.metrics_started = metrics.request_started()
+
+@api.teardown_app_request
+def record_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+        status = g.pop('response_status', 500)
+        get_metrics().request_finished(route, request.method, status, started)
+
+@api.after_app_request
+def remember_status(response):
+    g.response_status = response.status_code
+    return response
+
+@api.before_app_request
+def connect_on_first_request():
+    if not is_connected():
+        connect_db(current_app.config['MONGODB_URI'])
+
+# Admission control (see services/admission.py)
+def overloaded_response(retry_after):
+    response = jsonify({'error': 'Server is overloaded, try again later'})
+    response.status_code = 503
+    response.headers['Retry-After'] = str(retry_after)
+    return response
+
+@api.before_app_request
+def admit_request():
+    admission = get_admission_controller()
+    if not admission.enabled:
+        return None
+    try:
+        ticket = admission.admit(request.endpoint)
+    except Overloaded as e:
+        return overloaded_response(e.retry_after)
+    if ticket is not None:
+        g.admission_ticket = ticket
+        # Bounds every MongoDB operation of the request by what is left of its budget
+        g.admission_timeout = ExitStack()
+        g.admission_timeout.enter_context(pymongo.timeout(ticket.remaining()))
+    return None
+
+@api.after_app_request
+def shed_expired(response):
+    # Routes turn a MongoDB timeout into a 500; past the deadline it is load shedding
+    ticket = g.get('admission_ticket')
+    if response.status_code == 500 and ticket is not None and ticket.expired():
+        return overloaded_response(1)
+    return response
+
+@api.teardown_app_request
+def release_request(exc):
+    timeout = g.pop('admission_timeout', None)
+    if timeout is not None:
+        timeout.close()
+    ticket = g.pop('admission_ticket', None)
+    if ticket is not None:
+        get_admission_controller().release(ticket)
 
 # User Management Routes
-@app.route('/api/users', methods=['POST'])
+@api.route('/api/users', methods=['POST'])
 def create_user():
     """Create a new user"""
     try:
@@ -43,90 +241,219 @@ def create_user():
             return jsonify({'error': 'userId is required'}), 400
         
         userId = data['userId']
+        if not valid_user_id(userId):
+            return jsonify({'error': 'userId must be a string of 1-100 characters'}), 400
         
-        # Check if user already exists
-        existing_user = User.objects(userId=userId).first()
-        if existing_user:
+        # Create the user unless it already exists, in one upsert
+        started = time.monotonic()
+        if not create_user_document(userId):
             return jsonify({'error': 'User already exists'}), 409
         
-        # Create new user
-        new_user = User(userId=userId)
-        new_user.save()
+        new_user = dict(new_user_fields(), userId=userId)
+        get_profile_cache().write([new_user], started)
+        record_scores({userId: new_user['score']})
+        get_leaderboard_cache().note_score(new_user['score'])
         
         return jsonify({
             'message': 'User created successfully',
             'user': {
-                'userId': new_user.userId,
-                'score': new_user.score,
-                'rank': new_user.rank,
-                'completedChallenges': new_user.completedChallenges
+                'userId': new_user['userId'],
+                'score': new_user['score'],
+                'rank': new_user['rank'],
+                'completedChallenges': new_user['completedChallenges']
             }
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/users/<userId>', methods=['GET'])
+@api.route('/api/users/batch', methods=['POST'])
+def create_users_batch():
+    """Create many users at once"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('userIds'), list):
+            return jsonify({'error': 'userIds list is required'}), 400
+        
+        user_ids = data['userIds']
+        if len(user_ids) > MAX_USER_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_USER_BATCH_SIZE} users per batch'}), 413
+        
+        started = time.monotonic()
+        statuses = create_user_documents(user_ids)
+        
+        created = [user_id for user_id, status in zip(user_ids, statuses) if status == CREATED]
+        get_profile_cache().write([dict(new_user_fields(), userId=user_id) for user_id in created], started)
+        record_scores({user_id: 0 for user_id in created})
+        if created:
+            get_leaderboard_cache().note_score(0)
+        
+        results = []
+        summary = {}
+        for user_id, status in zip(user_ids, statuses):
+            results.append({'userId': user_id, 'status': status})
+            summary[status] = summary.get(status, 0) + 1
+        
+        return jsonify({'results': results, 'summary': summary}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/users/<userId>', methods=['GET'])
 def get_user(userId):
     """Get user profile data"""
     try:
-        user = User.objects(userId=userId).first()
+        completed = request.args.get('completed', 'full')
+        if completed not in COMPLETED_FORMATS:
+            return jsonify({'error': 'completed must be one of full, count, compact'}), 400
+        try:
+            fields = parse_fields(request.args.get('fields'), PROFILE_FIELDS, always=('userId',))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        fields = fields or profile_fields(completed)
+        
+        cache = get_profile_cache()
+        if cache.enabled:
+            user = cache.fetch(userId)
+        else:
+            user = find_user_profile(userId, profile_projection(fields))
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        return jsonify({
-            'userId': user.userId,
-            'score': user.score,
-            'rank': user.rank,
-            'completedChallenges': user.completedChallenges
-        }), 200
+        profile = {'userId': user['userId']}
+        score = user.get('score', 0)
+        if 'score' in fields:
+            profile['score'] = score
+        if 'rank' in fields:
+            profile['rank'] = rank_for(user['userId'], score, user.get('rank', 0))
+        for field in fields:
+            if field in COMPLETED_KEYS:
+                key, value = completed_field(user, COMPLETED_KEYS[field], get_challenge_catalog().ordinals())
+                profile[key] = value
+        return json_response(dumps(profile))
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 # Challenge Management Routes
-@app.route('/api/challenges', methods=['GET'])
+@api.route('/api/challenges', methods=['GET'])
 def get_challenges():
-    """Get all challenges"""
-    try:
-        challenges = Challenge.objects.all()
-        challenges_list = []
-        
-        for challenge in challenges:
-            challenges_list.append({
-                'id': challenge.challenge_id,
-                'title': challenge.title,
-                'description': challenge.description,
-                'difficulty': challenge.difficulty,
-                'starterCode': challenge.starterCode
-            })
+    """Get all challenges, optionally filtered, sparse or one page at a time"""
+    try:
+        catalog = get_challenge_catalog()
+        if not request.args:
+            entry = catalog.list_entry()
+            return json_response(entry.body, gzipped=entry.gzipped)
         
-        return jsonify(challenges_list), 200
+        try:
+            difficulty = request.args.get('difficulty')
+            if difficulty is not None and difficulty not in DIFFICULTIES:
+                raise ValueError('difficulty must be one of easy, medium, hard')
+            fields = parse_fields(request.args.get('fields'), PUBLIC_FIELDS, always=('id',))
+            ids = parse_ids(request.args.get('ids'))
+            paged = 'limit' in request.args or 'cursor' in request.args
+            if ids is not None and paged:
+                raise ValueError('ids cannot be combined with limit or cursor')
+            if paged:
+                limit = parse_limit(request.args.get('limit'), default=50, maximum=500)
+                after = None
+                if 'cursor' in request.args:
+                    after, = decode_cursor(request.args['cursor'], 1)
+                    if not isinstance(after, str):
+                        raise ValueError('Invalid cursor')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        if ids is not None:
+            return json_response(dumps(catalog.select(ids, difficulty, fields)))
+        if not paged:
+            entry = catalog.selection_entry(difficulty, fields)
+            return json_response(entry.body, gzipped=entry.gzipped)
+        
+        challenges, more = catalog.page(limit, after, difficulty, fields)
+        response = json_response(dumps(challenges))
+        if more:
+            response.headers['X-Next-Cursor'] = encode_cursor([challenges[-1]['id']])
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/challenges/<challenge_id>', methods=['GET'])
+def open_offloaded_tests(challenge_id):
+    """(GridFS stream, body prefix) of an offloaded test-case set, or None if inline"""
+    from gridfs.errors import NoFile
+    from services.test_cases import open_test_cases
+    
+    catalog = get_challenge_catalog()
+    offloaded = catalog.test_file(challenge_id)
+    if offloaded is None:
+        return None
+    try:
+        return open_test_cases(offloaded[0]), offloaded[1]
+    except NoFile:
+        # The set was replaced after the catalog was loaded
+        catalog.load()
+        offloaded = catalog.test_file(challenge_id)
+        return None if offloaded is None else (open_test_cases(offloaded[0]), offloaded[1])
+
+@api.route('/api/challenges/<challenge_id>', methods=['GET'])
 def get_challenge(challenge_id):
     """Get a specific challenge"""
     try:
-        challenge = Challenge.objects(challenge_id=challenge_id).first()
-        if not challenge:
+        catalog = get_challenge_catalog()
+        fields = None
+        if 'fields' in request.args:
+            try:
+                fields = parse_fields(request.args['fields'], CHALLENGE_FIELDS, always=('id',))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        if fields is None or 'testCases' in fields:
+            offloaded = open_offloaded_tests(challenge_id)
+            if offloaded is not None:
+                from services.test_cases import stream_challenge
+                
+                grid_out, prefix = offloaded
+                if fields is not None:
+                    prefix = catalog.test_prefix(catalog.get_fields(
+                        challenge_id, tuple(field for field in fields if field != 'testCases')
+                    ))
+                return Response(stream_challenge(prefix, grid_out), mimetype='application/json')
+        
+        if fields is not None:
+            challenge = catalog.get_fields(challenge_id, fields)
+            if challenge is None:
+                return jsonify({'error': 'Challenge not found'}), 404
+            return json_response(dumps(challenge))
+        
+        entry = catalog.get(challenge_id)
+        if entry is None:
             return jsonify({'error': 'Challenge not found'}), 404
         
-        return jsonify({
-            'id': challenge.challenge_id,
-            'title': challenge.title,
-            'description': challenge.description,
-            'difficulty': challenge.difficulty,
-            'starterCode': challenge.starterCode,
-            'testCases': challenge.testCases
-        }), 200
+        return json_response(entry.body, gzipped=entry.gzipped)
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/challenges/<challenge_id>/complete', methods=['POST'])
+@api.route('/api/challenges/<challenge_id>/tests', methods=['GET'])
+def get_challenge_tests(challenge_id):
+    """Get a challenge's test cases, streamed when they are offloaded"""
+    try:
+        offloaded = open_offloaded_tests(challenge_id)
+        if offloaded is not None:
+            from services.test_cases import iter_chunks
+            
+            return Response(iter_chunks(offloaded[0]), mimetype='application/json')
+        
+        challenge = get_challenge_catalog().get_fields(challenge_id, ('testCases',))
+        if challenge is None:
+            return jsonify({'error': 'Challenge not found'}), 404
+        return json_response(dumps(challenge.get('testCases', [])))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/challenges/<challenge_id>/complete', methods=['POST'])
 def complete_challenge(challenge_id):
     """Complete a challenge and update user score"""
     try:
@@ -137,82 +464,255 @@ def complete_challenge(challenge_id):
         userId = data['userId']
         score = data['score']
         
-        # Check if user exists
-        user = User.objects(userId=userId).first()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        if isinstance(score, bool) or not isinstance(score, int) or score < 0:
+            return jsonify({'error': 'score must be a non-negative integer'}), 400
         
-        # Check if challenge exists
-        challenge = Challenge.objects(challenge_id=challenge_id).first()
-        if not challenge:
+        # Check if challenge exists (served from the in-memory catalog)
+        if not get_challenge_catalog().exists(challenge_id):
             return jsonify({'error': 'Challenge not found'}), 404
         
-        # Check if user already completed this challenge
-        if challenge_id in user.completedChallenges:
-            return jsonify({'error': 'Challenge already completed'}), 409
+        if write_behind_enabled():
+            return complete_challenge_buffered(userId, challenge_id, score)
         
-        # Update user score and completed challenges
-        user.score += score
-        user.completedChallenges.append(challenge_id)
+        # Award the score and record the challenge in one conditional write
+        started = time.monotonic()
+        status, user = complete_one(userId, challenge_id, score)
+        if status == UNKNOWN_USER:
+            return jsonify({'error': 'User not found'}), 404
+        if status == DUPLICATE:
+            return jsonify({'error': 'Challenge already completed'}), 409
         
-        # Recalculate rank (simple implementation - can be optimized)
-        all_users = User.objects.order_by('-score')
-        rank = 1
-        for u in all_users:
-            if u.userId == userId:
-                user.rank = rank
-                break
-            rank += 1
+        # The next profile read of this user sees the new score
+        get_profile_cache().write([user], started)
+        record_scores({user['userId']: user['score']}, completions=1)
+        get_leaderboard_cache().note_score(user['score'])
+        log_completions([(userId, challenge_id, score)])
         
-        user.save()
+        profile = {
+            'userId': user['userId'],
+            'score': user['score'],
+            'rank': rank_for(user['userId'], user['score'], user.get('rank', 0)),
+            'completedCount': user['completedCount']
+        }
+        # With collection storage the list is only sent by GET /api/users/<userId>
+        if 'completedChallenges' in user:
+            profile['completedChallenges'] = user['completedChallenges']
         
         return jsonify({
             'message': 'Challenge completed successfully',
-            'user': {
-                'userId': user.userId,
-                'score': user.score,
-                'rank': user.rank,
-                'completedChallenges': user.completedChallenges
-            }
+            'user': profile
         }), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def complete_challenge_buffered(userId, challenge_id, score):
+    """Log a completion now and apply its score with the next write-behind flush"""
+    try:
+        status, user = get_write_behind_buffer().submit(userId, challenge_id, score)
+    except BufferFull:
+        response = jsonify({'error': 'Too many pending completions, retry shortly'})
+        response.headers['Retry-After'] = '1'
+        return response, 503
+    if status == UNKNOWN_USER:
+        return jsonify({'error': 'User not found'}), 404
+    if status == DUPLICATE:
+        return jsonify({'error': 'Challenge already completed'}), 409
+    
+    return jsonify({
+        'message': 'Challenge completion accepted',
+        'user': {
+            'userId': user['userId'],
+            'score': user['score'],
+            'rank': rank_for_score(user['score'], user.get('rank', 0))
+        }
+    }), 202
+
+@api.route('/api/completions/batch', methods=['POST'])
+def complete_challenges_batch():
+    """Apply a batch of challenge completions"""
+    try:
+        data = request.get_json()
+        if not data or not isinstance(data.get('completions'), list):
+            return jsonify({'error': 'completions list is required'}), 400
+        
+        items = data['completions']
+        if len(items) > MAX_BATCH_SIZE:
+            return jsonify({'error': f'At most {MAX_BATCH_SIZE} completions per batch'}), 413
+        
+        statuses, scores = apply_completions(items)
+        
+        # Re-rank every affected user once for the whole batch
+        record_scores(scores, completions=statuses.count(APPLIED))
+        get_profile_cache().invalidate(list(scores))
+        if scores:
+            get_leaderboard_cache().note_score(max(scores.values()))
+        log_completions([
+            (item['userId'], item['challenge_id'], item['score'])
+            for item, status in zip(items, statuses) if status == APPLIED
+        ])
+        
+        results = []
+        summary = {}
+        for item, status in zip(items, statuses):
+            fields = item if isinstance(item, dict) else {}
+            results.append({
+                'userId': fields.get('userId'),
+                'challenge_id': fields.get('challenge_id'),
+                'status': status
+            })
+            summary[status] = summary.get(status, 0) + 1
+        
+        return jsonify({'results': results, 'summary': summary}), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Leaderboard Route
-@app.route('/api/leaderboard', methods=['GET'])
+@api.route('/api/leaderboard', methods=['GET'])
 def get_leaderboard():
-    """Get top users for leaderboard"""
+    """Get top users for leaderboard, optionally one page at a time"""
     try:
-        # Get top 100 users sorted by score
-        top_users = User.objects.order_by('-score').limit(100)
+        window = request.args.get('window', 'all')
+        if window != 'all' and window not in WINDOWS:
+            return jsonify({'error': 'window must be one of day, week, all'}), 400
         
-        leaderboard = []
-        for user in top_users:
-            leaderboard.append({
-                'userId': user.userId,
-                'score': user.score,
-                'rank': user.rank
-            })
+        if window == 'all' and 'limit' not in request.args and 'cursor' not in request.args:
+            # Serve the cached top 100; clients revalidate with If-None-Match
+            version, body = get_leaderboard_cache().get()
+            
+            response = json_response(body)
+            response.set_etag(f'leaderboard-{version}')
+            response.headers['Cache-Control'] = 'no-cache'
+            return response.make_conditional(request)
+        
+        try:
+            limit = parse_limit(request.args.get('limit'), default=100, maximum=1000)
+            after = None
+            if 'cursor' in request.args:
+                # Windowed boards also carry the rank of the last entry
+                after = decode_cursor(request.args['cursor'], 2 if window == 'all' else 3)
+                score, after_user = after[:2]
+                if not isinstance(score, int) or not isinstance(after_user, str):
+                    raise ValueError('Invalid cursor')
+                if window != 'all' and (not isinstance(after[2], int) or after[2] < 1):
+                    raise ValueError('Invalid cursor')
+                after = tuple(after)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        return jsonify(leaderboard), 200
+        if window == 'all':
+            leaderboard = build_leaderboard(limit, after)
+        else:
+            leaderboard = window_leaderboard(window, limit, after)
+        response = json_response(dumps(leaderboard))
+        if len(leaderboard) == limit:
+            last = leaderboard[-1]
+            values = [last['score'], last['userId']] + ([] if window == 'all' else [last['rank']])
+            response.headers['X-Next-Cursor'] = encode_cursor(values)
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@api.route('/api/leaderboard/around/<userId>', methods=['GET'])
+def get_leaderboard_around(userId):
+    """Get the users directly above and below a user"""
+    try:
+        try:
+            radius = parse_limit(request.args.get('radius'), default=5, maximum=100, name='radius')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        leaderboard = leaderboard_window(userId, radius)
+        if leaderboard is None:
+            return jsonify({'error': 'User not found'}), 404
+        return json_response(dumps(leaderboard))
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@api.route('/api/leaderboard/export', methods=['GET'])
+def get_leaderboard_export():
+    """Stream every user in rank order as NDJSON or CSV"""
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({'error': 'format must be one of ndjson, csv'}), 400
+    
+    limiter = get_export_limiter()
+    if not limiter.try_acquire():
+        response = jsonify({'error': 'Too many exports in progress, try again later'})
+        response.status_code = 503
+        response.headers['Retry-After'] = '30'
+        return response
+    try:
+        response = Response(export_leaderboard(export_format), mimetype=EXPORT_FORMATS[export_format])
+    except Exception:
+        limiter.release()
+        raise
+    # The body streams after the request is torn down; the slot is held until it ends
+    response.call_on_close(limiter.release)
+    response.headers['Content-Disposition'] = f'attachment; filename=leaderboard.{export_format}'
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@api.route('/api/stats', methods=['GET'])
+def get_stats():
+    """Get cache statistics"""
+    from services.rank_materializer import get_rank_materializer
+    
+    return json_response(dumps({
+        'leaderboardCache': get_leaderboard_cache().stats(),
+        'challengeCatalog': get_challenge_catalog().stats(),
+        'rankMaterializer': get_rank_materializer().stats(),
+        'writeBehind': get_write_behind_buffer().stats(),
+        'admission': get_admission_controller().stats(),
+        'leaderboardExport': get_export_limiter().stats(),
+        'profileCache': get_profile_cache().stats()
+    }))
+
+@api.route('/metrics', methods=['GET'])
+def get_metrics_text():
+    """Prometheus metrics"""
+    return Response(get_metrics().render(), content_type=METRICS_CONTENT_TYPE)
+
 # Health check route
-@app.route('/health', methods=['GET'])
+HEALTH_BODY = dumps({'status': 'healthy', 'message': 'Reactivate API is running'})
+
+@api.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
-    return jsonify({'status': 'healthy', 'message': 'Reactivate API is running'}), 200
+    return json_response(HEALTH_BODY)
+
+# Readiness probe: unlike /health, fails until this instance can serve traffic
+READY_BODY = dumps({'status': 'ready'})
+
+@api.route('/ready', methods=['GET'])
+def ready_check():
+    """Readiness endpoint"""
+    database = False
+    try:
+        with pymongo.timeout(1):
+            ping()
+        database = True
+    except Exception:
+        pass
+    if database and _warmed_up.is_set():
+        return json_response(READY_BODY)
+    return jsonify({
+        'status': 'starting',
+        'database': database,
+        'warmedUp': _warmed_up.is_set()
+    }), 503
+
+app = create_app()
 
 if __name__ == '__main__':
-    # Connect to database
-    connect_db()
+    start_warm_up(app)
     
     # Run the app
     host = os.getenv('API_HOST', '0.0.0.0')
     port = int(os.getenv('API_PORT', 5000))
-    debug = os.getenv('FLASK_DEBUG', 'True').lower() == 'true'
+    debug = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
     
-    app.run(host=host, port=port, debug=debug) 
\ No newline at end of file
+    app.run(host=host, port=port, debug=debug)
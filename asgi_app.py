@@ -0,0 +1,392 @@
+"""
+Async variant of the Reactivate API.
+
+Serves the same URLs and JSON shapes as app.py for the user, challenge,
+completion, leaderboard and health routes, but runs on an ASGI server with
+the Motor driver so a worker never blocks on a MongoDB round trip. The
+in-memory rank index, challenge catalog and leaderboard cache are the same
+classes the Flask app uses; only their MongoDB I/O is done here with Motor.
+Ranks always come from the rank index and completions are always embedded
+in the user document (RANK_MODE=background, COMPLETIONS_STORAGE,
+WRITE_BEHIND, ADMISSION_CONTROL and the ?fields=/?difficulty=/?ids= read
+parameters are Flask app features).
+
+Run with: python run.py --server async
+"""
+
+import os
+from contextlib import asynccontextmanager
+
+from dotenv import load_dotenv
+from gridfs.errors import NoFile
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorGridFSBucket
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Route
+
+from models.challenge import Challenge
+from services.challenge_catalog import (
+    VERSION_KEY as CHALLENGES_VERSION_KEY, ChallengeCatalog
+)
+from services.leaderboard_cache import (
+    LEADERBOARD_SORT, VERSION_KEY as LEADERBOARD_VERSION_KEY, LeaderboardCache,
+    leaderboard_projection, leaderboard_query, rank_entries
+)
+from services.pagination import decode_cursor, encode_cursor, parse_limit
+from services.rank_index import RankIndex
+from services.serialization import dumps
+from services.test_cases import BUCKET_NAME as TESTS_BUCKET
+from services.users import new_user_fields, valid_user_id
+from services.versions import COUNTERS_COLLECTION
+
+load_dotenv()
+
+MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/reactivate')
+
+client = None
+db = None
+rank_index = RankIndex()
+catalog = ChallengeCatalog(
+    compress=os.getenv('CHALLENGE_CATALOG_GZIP', 'False').lower() == 'true',
+    check_interval=float(os.getenv('CHALLENGE_CATALOG_TTL', '30')),
+    auto_refresh=False
+)
+leaderboard_cache = LeaderboardCache(
+    version_ttl=float(os.getenv('LEADERBOARD_VERSION_TTL', '0'))
+)
+
+
+def json_body(obj, status=200):
+    return Response(dumps(obj), status_code=status, media_type='application/json')
+
+
+def error(message, status):
+    return json_body({'error': message}, status)
+
+
+def body_response(body, gzipped=None, status=200, request=None):
+    """Send pre-serialized JSON, gzip-compressed when the client accepts it"""
+    headers = {}
+    if gzipped is not None:
+        headers['Vary'] = 'Accept-Encoding'
+        if 'gzip' in request.headers.get('accept-encoding', ''):
+            headers['Content-Encoding'] = 'gzip'
+            body = gzipped
+    return Response(body, status_code=status, media_type='application/json', headers=headers)
+
+
+async def read_json(request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+async def get_version(name):
+    doc = await db[COUNTERS_COLLECTION].find_one({'_id': name}, {'version': 1})
+    return doc['version'] if doc else 0
+
+
+async def bump_version(name):
+    doc = await db[COUNTERS_COLLECTION].find_one_and_update(
+        {'_id': name}, {'$inc': {'version': 1}},
+        upsert=True, return_document=ReturnDocument.AFTER
+    )
+    return doc['version']
+
+
+async def load_catalog(version=None):
+    if version is None:
+        version = await get_version(CHALLENGES_VERSION_KEY)
+    docs = await db.challenges.find().sort('challenge_id', 1).to_list(None)
+    catalog.populate(version, (Challenge._from_son(doc) for doc in docs))
+
+
+async def refresh_catalog():
+    if catalog.due_for_check():
+        version = await get_version(CHALLENGES_VERSION_KEY)
+        if version != catalog.version:
+            await load_catalog(version)
+
+
+async def load_rank_index():
+    cursor = db.users.find({}, {'_id': 0, 'userId': 1, 'score': 1}).sort(LEADERBOARD_SORT)
+    rank_index.rebuild([(doc['userId'], doc.get('score', 0)) async for doc in cursor])
+
+
+async def note_score(score):
+    if leaderboard_cache.needs_bump(score):
+        leaderboard_cache.bumped(await bump_version(LEADERBOARD_VERSION_KEY))
+
+
+@asynccontextmanager
+async def lifespan(app):
+    global client, db
+    client = AsyncIOMotorClient(MONGODB_URI)
+    db = client.get_default_database('reactivate')
+    await db.users.create_index('userId', unique=True)
+    await db.users.create_index(LEADERBOARD_SORT)
+    await load_rank_index()
+    await load_catalog()
+    print(f"Async API ready: {len(rank_index)} users, {len(catalog)} challenges")
+    yield
+    client.close()
+
+
+# User Management Routes
+async def create_user(request):
+    """Create a new user"""
+    try:
+        data = await read_json(request)
+        if not data or 'userId' not in data:
+            return error('userId is required', 400)
+
+        userId = data['userId']
+        if not valid_user_id(userId):
+            return error('userId must be a string of 1-100 characters', 400)
+
+        try:
+            result = await db.users.update_one(
+                {'userId': userId}, {'$setOnInsert': new_user_fields()}, upsert=True
+            )
+        except DuplicateKeyError:
+            result = None
+        if result is None or result.upserted_id is None:
+            return error('User already exists', 409)
+
+        new_user = dict(new_user_fields(), userId=userId)
+        rank_index.set_score(userId, new_user['score'])
+        await note_score(new_user['score'])
+
+        return json_body({
+            'message': 'User created successfully',
+            'user': {
+                'userId': new_user['userId'],
+                'score': new_user['score'],
+                'rank': new_user['rank'],
+                'completedChallenges': new_user['completedChallenges']
+            }
+        }, 201)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_user(request):
+    """Get user profile data"""
+    try:
+        userId = request.path_params['userId']
+        user = await db.users.find_one(
+            {'userId': userId}, {'_id': 0, 'userId': 1, 'score': 1, 'completedChallenges': 1}
+        )
+        if not user:
+            return error('User not found', 404)
+
+        # Reads never move the index: a completion may have written a newer score since
+        score = user.get('score', 0)
+        rank = rank_index.rank_of(user['userId'])
+        return json_body({
+            'userId': user['userId'],
+            'score': score,
+            'rank': rank if rank is not None else rank_index.rank_of_score(score),
+            'completedChallenges': user.get('completedChallenges', [])
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# Challenge Management Routes
+async def get_challenges(request):
+    """Get all challenges, optionally one page at a time"""
+    try:
+        await refresh_catalog()
+        if 'limit' not in request.query_params and 'cursor' not in request.query_params:
+            entry = catalog.list_entry()
+            return body_response(entry.body, entry.gzipped, request=request)
+
+        try:
+            limit = parse_limit(request.query_params.get('limit'), default=50, maximum=500)
+            after = None
+            if 'cursor' in request.query_params:
+                after, = decode_cursor(request.query_params['cursor'], 1)
+                if not isinstance(after, str):
+                    raise ValueError('Invalid cursor')
+        except ValueError as e:
+            return error(str(e), 400)
+
+        challenges, more = catalog.page(limit, after)
+        response = body_response(dumps(challenges))
+        if more:
+            response.headers['X-Next-Cursor'] = encode_cursor([challenges[-1]['id']])
+        return response
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def get_challenge(request):
+    """Get a specific challenge"""
+    try:
+        await refresh_catalog()
+        challenge_id = request.path_params['challenge_id']
+        grid_out = await open_offloaded_tests(challenge_id)
+        if grid_out is not None:
+            return StreamingResponse(stream_challenge(catalog.test_file(challenge_id)[1], grid_out),
+                                     media_type='application/json')
+        entry = catalog.get(challenge_id)
+        if entry is None:
+            return error('Challenge not found', 404)
+        return body_response(entry.body, entry.gzipped, request=request)
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+async def open_offloaded_tests(challenge_id):
+    """Open a test-case set offloaded to GridFS, or return None if it is inline"""
+    offloaded = catalog.test_file(challenge_id)
+    if offloaded is None:
+        return None
+    bucket = AsyncIOMotorGridFSBucket(db, bucket_name=TESTS_BUCKET)
+    try:
+        return await bucket.open_download_stream(offloaded[0])
+    except NoFile:
+        # The set was replaced after the catalog was loaded
+        await load_catalog()
+        offloaded = catalog.test_file(challenge_id)
+        return None if offloaded is None else await bucket.open_download_stream(offloaded[0])
+
+
+async def stream_challenge(prefix, grid_out):
+    """Yield the challenge's other fields, then its stored test-case chunks"""
+    yield prefix
+    while True:
+        chunk = await grid_out.readchunk()
+        if not chunk:
+            break
+        yield chunk
+    yield b'}'
+
+
+async def complete_challenge(request):
+    """Complete a challenge and update user score"""
+    try:
+        challenge_id = request.path_params['challenge_id']
+        data = await read_json(request)
+        if not data or 'userId' not in data or 'score' not in data:
+            return error('userId and score are required', 400)
+
+        userId = data['userId']
+        score = data['score']
+
+        if isinstance(score, bool) or not isinstance(score, int) or score < 0:
+            return error('score must be a non-negative integer', 400)
+
+        await refresh_catalog()
+        if challenge_id not in catalog:
+            return error('Challenge not found', 404)
+
+        user = await db.users.find_one_and_update(
+            {'userId': userId, 'completedChallenges': {'$ne': challenge_id}},
+            {'$inc': {'score': score, 'completedCount': 1}, '$push': {'completedChallenges': challenge_id}},
+            projection={'_id': 0, 'userId': 1, 'score': 1, 'completedChallenges': 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if user is None:
+            if await db.users.find_one({'userId': userId}, {'_id': 1}) is None:
+                return error('User not found', 404)
+            return error('Challenge already completed', 409)
+
+        rank_index.set_score(user['userId'], user['score'])
+        await note_score(user['score'])
+
+        return json_body({
+            'message': 'Challenge completed successfully',
+            'user': {
+                'userId': user['userId'],
+                'score': user['score'],
+                'rank': rank_index.rank_of(user['userId']),
+                'completedChallenges': user['completedChallenges']
+            }
+        })
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# Leaderboard Route
+async def get_leaderboard(request):
+    """Get top users for leaderboard, optionally one page at a time"""
+    try:
+        params = request.query_params
+        if 'limit' not in params and 'cursor' not in params:
+            version = leaderboard_cache.cached_version()
+            if version is None:
+                version = await get_version(LEADERBOARD_VERSION_KEY)
+                leaderboard_cache.mark_checked()
+            body = leaderboard_cache.lookup(version)
+            if body is None:
+                docs = await db.users.find(
+                    leaderboard_query(), leaderboard_projection(False)
+                ).sort(LEADERBOARD_SORT).limit(leaderboard_cache.size).to_list(None)
+                body = leaderboard_cache.store(version, rank_entries(
+                    docs, first_page=True, stored_ranks=False, rank_of_score=rank_index.rank_of_score
+                ))
+
+            etag = f'"leaderboard-{version}"'
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if etag in request.headers.get('if-none-match', ''):
+                return Response(status_code=304, headers=headers)
+            return Response(body, media_type='application/json', headers=headers)
+
+        try:
+            limit = parse_limit(params.get('limit'), default=100, maximum=1000)
+            after = None
+            if 'cursor' in params:
+                score, after_user = decode_cursor(params['cursor'], 2)
+                if not isinstance(score, int) or not isinstance(after_user, str):
+                    raise ValueError('Invalid cursor')
+                after = (score, after_user)
+        except ValueError as e:
+            return error(str(e), 400)
+
+        docs = await db.users.find(
+            leaderboard_query(after), leaderboard_projection(False)
+        ).sort(LEADERBOARD_SORT).limit(limit).to_list(None)
+        leaderboard = rank_entries(
+            docs, first_page=after is None, stored_ranks=False, rank_of_score=rank_index.rank_of_score
+        )
+        response = body_response(dumps(leaderboard))
+        if len(leaderboard) == limit:
+            last = leaderboard[-1]
+            response.headers['X-Next-Cursor'] = encode_cursor([last['score'], last['userId']])
+        return response
+
+    except Exception as e:
+        return error(str(e), 500)
+
+
+# Health check route
+async def health_check(request):
+    """Health check endpoint"""
+    return json_body({'status': 'healthy', 'message': 'Reactivate API is running'})
+
+
+app = Starlette(
+    routes=[
+        Route('/api/users', create_user, methods=['POST']),
+        Route('/api/users/{userId}', get_user, methods=['GET']),
+        Route('/api/challenges', get_challenges, methods=['GET']),
+        Route('/api/challenges/{challenge_id}', get_challenge, methods=['GET']),
+        Route('/api/challenges/{challenge_id}/complete', complete_challenge, methods=['POST']),
+        Route('/api/leaderboard', get_leaderboard, methods=['GET']),
+        Route('/health', health_check, methods=['GET']),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'])],
+    lifespan=lifespan
+)
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Side-by-side load test of the Flask app and the async (ASGI + Motor) app.
+
+Each server is started against the benchmark database and hit with the
+same read-heavy mix of GET routes from `--connections` concurrent
+keep-alive connections. Reports requests/sec and latency percentiles for
+each server.
+
+Usage: python -m benchmarks.async_vs_sync [--connections 1000] [--duration 30]
+"""
+
+import argparse
+import asyncio
+
+from benchmarks.load_test import (
+    SERVERS, Workload, parse_mix, run_workload, seed, start_server, stop_server,
+    summarize_run, wait_until_healthy
+)
+
+READ_MIX = 'health=10,get_challenges=10,get_challenge=20,leaderboard=20,get_user=40'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--servers', nargs='+', choices=list(SERVERS), default=['flask', 'async'])
+    args = parser.parse_args()
+
+    seed(args.users, 100)
+
+    results = {}
+    for port, name in enumerate(args.servers, start=5001):
+        base_url = f'http://127.0.0.1:{port}'
+        server = start_server(name, port)
+        try:
+            wait_until_healthy(base_url)
+            workload = Workload(args.users, 100, parse_mix(READ_MIX), seed=1)
+            latencies, errors, elapsed = asyncio.run(
+                run_workload(base_url, workload, args.connections, args.duration)
+            )
+        finally:
+            stop_server(server)
+        results[name] = summarize_run(latencies, errors, elapsed)[1]
+
+    print(f"\n{args.connections} concurrent connections, {args.duration:.0f}s per server")
+    print(f"  {'server':<8}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'errors':>8}")
+    for name, total in results.items():
+        print(f"  {name:<8}{total['rps']:>10.0f}{total['p50_ms']:>10.1f}"
+              f"{total['p99_ms']:>10.1f}{total['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
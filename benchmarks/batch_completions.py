@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Compare completion throughput of the per-call route and the batch route.
+
+Both routes are driven in-process through Flask's test client, so the
+numbers measure server work rather than HTTP overhead.
+
+Usage: python -m benchmarks.batch_completions [--items 10000] [--users 2000]
+"""
+
+import argparse
+import random
+import time
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_challenges, seed_users
+)
+from services.challenge_catalog import get_challenge_catalog
+from services.rank_index import load_rank_index
+
+
+def make_items(count, users, challenges, seed):
+    rng = random.Random(seed)
+    pairs = set()
+    while len(pairs) < count:
+        pairs.add((rng.randrange(users), rng.randrange(challenges)))
+    return [
+        {'userId': f'user_{u:08d}', 'challenge_id': f'challenge_{c:05d}', 'score': rng.randrange(10, 100)}
+        for u, c in pairs
+    ]
+
+
+def reset(users, challenges):
+    seed_users(users)
+    seed_challenges(challenges)
+    get_challenge_catalog().load()
+    load_rank_index()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--items', type=int, default=10000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--challenges', type=int, default=200)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        client = app.test_client()
+        items = make_items(args.items, args.users, args.challenges, seed=1)
+
+        reset(args.users, args.challenges)
+        started = time.perf_counter()
+        for item in items:
+            client.post(f"/api/challenges/{item['challenge_id']}/complete",
+                        json={'userId': item['userId'], 'score': item['score']})
+        per_call = time.perf_counter() - started
+
+        reset(args.users, args.challenges)
+        started = time.perf_counter()
+        response = client.post('/api/completions/batch', json={'completions': items})
+        batch = time.perf_counter() - started
+
+        print(f"\n{args.items} completions across {args.users} users")
+        print(f"  per-call route: {per_call:.2f}s ({args.items / per_call:,.0f} completions/s)")
+        print(f"  batch route:    {batch:.2f}s ({args.items / batch:,.0f} completions/s)")
+        print(f"  speedup:        {per_call / batch:.1f}x")
+        print(f"  batch summary:  {response.get_json()['summary']}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
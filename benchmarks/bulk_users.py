@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Compare user provisioning throughput: one POST /api/users per user vs. a
+single POST /api/users/batch.
+
+Usage: python -m benchmarks.bulk_users [--users 10000]
+"""
+
+import argparse
+import time
+
+from app import app
+from benchmarks.common import connect_bench_db, disconnect_bench_db, seed_users
+from services.rank_index import load_rank_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=10000)
+    parser.add_argument('--existing', type=int, default=1000,
+                        help='users seeded beforehand, so some requests conflict')
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        client = app.test_client()
+        user_ids = [f'user_{i:08d}' for i in range(args.users)]
+
+        seed_users(args.existing)
+        load_rank_index()
+        started = time.perf_counter()
+        statuses = [client.post('/api/users', json={'userId': u}).status_code for u in user_ids]
+        per_call = time.perf_counter() - started
+
+        seed_users(args.existing)
+        load_rank_index()
+        started = time.perf_counter()
+        response = client.post('/api/users/batch', json={'userIds': user_ids})
+        batch = time.perf_counter() - started
+
+        print(f"\n{args.users} users ({args.existing} already existing)")
+        print(f"  per-call route: {per_call:.2f}s ({args.users / per_call:,.0f} users/s), "
+              f"{statuses.count(201)} created, {statuses.count(409)} existing")
+        print(f"  batch route:    {batch:.2f}s ({args.users / batch:,.0f} users/s), "
+              f"{response.get_json()['summary']}")
+        print(f"  speedup:        {per_call / batch:.1f}x")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Shared helpers for the benchmark scripts.
+
+Benchmarks run against their own database (BENCH_MONGODB_URI) so seeding
+never touches the application data.
+"""
+
+import os
+import random
+import statistics
+import time
+
+from dotenv import load_dotenv
+
+from db import connect_db, disconnect_db
+
+load_dotenv()
+
+BENCH_MONGODB_URI = os.getenv('BENCH_MONGODB_URI', 'mongodb://localhost:27017/reactivate_bench')
+
+
+def connect_bench_db():
+    """Connect MongoEngine to the benchmark database"""
+    connect_db(BENCH_MONGODB_URI)
+    print(f"Connected to benchmark database: {BENCH_MONGODB_URI.split('@')[-1]}")
+
+
+def disconnect_bench_db():
+    """Disconnect from the benchmark database"""
+    disconnect_db()
+
+
+def seed_users(count, seed=42, batch_size=10000):
+    """Replace the users collection with `count` synthetic users"""
+    from models.user import User
+
+    collection = User._get_collection()
+    collection.delete_many({})
+    rng = random.Random(seed)
+
+    started = time.perf_counter()
+    batch = []
+    for i in range(count):
+        batch.append({
+            'userId': f'user_{i:08d}',
+            'score': int(rng.paretovariate(1.5) * 10),
+            'rank': 0,
+            'completedChallenges': [],
+            'completedCount': 0
+        })
+        if len(batch) >= batch_size:
+            collection.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        collection.insert_many(batch, ordered=False)
+
+    User.ensure_indexes()
+    elapsed = time.perf_counter() - started
+    print(f"Seeded {count} users in {elapsed:.1f}s")
+
+
+def seed_challenges(count):
+    """Replace the challenges collection with `count` synthetic challenges"""
+    from models.challenge import Challenge
+    from seed_data import generate_challenges
+
+    collection = Challenge._get_collection()
+    collection.delete_many({})
+    generate_challenges(collection, count)
+    Challenge.ensure_indexes()
+    print(f"Seeded {count} challenges")
+
+
+def time_calls(fn, repeat):
+    """Call fn `repeat` times and return the per-call durations in seconds"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    ordered = sorted(samples)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def summarize(samples):
+    """Return mean/p50/p99 of samples in milliseconds"""
+    return {
+        'mean_ms': statistics.fmean(samples) * 1000,
+        'p50_ms': percentile(samples, 50) * 1000,
+        'p99_ms': percentile(samples, 99) * 1000
+    }
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Embedded vs. collection completion storage for a user with 10k completions.
+
+For each COMPLETIONS_STORAGE mode, creates one heavy user who has already
+completed `--completed` challenges, then reports the BSON size of their
+user document and the latency of:
+  - completing a new challenge
+  - repeating a completed challenge (the membership check, answered 409)
+  - GET /api/users/<userId> with ?completed=full, count and compact
+
+Usage: python -m benchmarks.completed_storage [--completed 10000] [--repeat 200]
+"""
+
+import argparse
+import os
+from datetime import datetime, timezone
+
+import bson
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_challenges, summarize, time_calls
+)
+from models.completion import Completion
+from models.user import User
+from seed_data import challenge_id
+from services.challenge_catalog import get_challenge_catalog
+
+USER_ID = 'heavy_user'
+
+
+def create_heavy_user(mode, completed):
+    users = User._get_collection()
+    events = Completion._get_collection()
+    users.delete_many({})
+    events.delete_many({})
+
+    ids = [challenge_id(i) for i in range(completed)]
+    users.insert_one({
+        'userId': USER_ID,
+        'score': 10 * completed,
+        'rank': 0,
+        'completedChallenges': ids if mode == 'embedded' else [],
+        'completedCount': completed
+    })
+    now = datetime.now(timezone.utc)
+    for start in range(0, completed, 10000):
+        events.insert_many([
+            {'userId': USER_ID, 'challenge_id': c, 'score': 10, 'completedAt': now}
+            for c in ids[start:start + 10000]
+        ], ordered=False)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--completed', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        seed_challenges(args.completed + args.repeat + 1)
+        get_challenge_catalog().load()
+        client = app.test_client()
+
+        for mode in ('embedded', 'collection'):
+            os.environ['COMPLETIONS_STORAGE'] = mode
+            create_heavy_user(mode, args.completed)
+            doc = User._get_collection().find_one({'userId': USER_ID})
+            print(f"\n{mode} storage, {args.completed} completions")
+            print(f"  user document: {len(bson.encode(doc)) / 1024:.1f} KiB")
+
+            next_challenge = iter(range(args.completed, args.completed + args.repeat + 1))
+            rows = [
+                ('complete new challenge', lambda: client.post(
+                    f'/api/challenges/{challenge_id(next(next_challenge))}/complete',
+                    json={'userId': USER_ID, 'score': 10}
+                )),
+                ('repeat completion (409)', lambda: client.post(
+                    f'/api/challenges/{challenge_id(0)}/complete',
+                    json={'userId': USER_ID, 'score': 10}
+                )),
+            ]
+            for completed in ('full', 'count', 'compact'):
+                url = f'/api/users/{USER_ID}?completed={completed}'
+                rows.append((f'get_user completed={completed}', lambda url=url: client.get(url)))
+
+            print(f"  {'operation':<30}{'p50 ms':>10}{'p99 ms':>10}{'body KiB':>10}")
+            for label, call in rows:
+                size = len(call().data) / 1024
+                stats = summarize(time_calls(call, args.repeat if 'new' not in label else args.repeat - 1))
+                print(f"  {label:<30}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}{size:>10.1f}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
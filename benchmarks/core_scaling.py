@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Throughput of the production server (gunicorn.conf.py) as workers are added.
+
+Seeds the benchmark database once, then for each worker count starts
+gunicorn with that many worker processes and drives the same read-heavy
+mix at it. Reports requests/sec, p99 and the speedup and per-worker
+efficiency relative to a single worker. The load generator runs on the
+same machine, so keep worker counts below the core count to leave it room.
+
+Usage: python -m benchmarks.core_scaling [--workers 1 2 4 8] [--duration 30]
+"""
+
+import argparse
+import asyncio
+import os
+
+from benchmarks.async_vs_sync import READ_MIX
+from benchmarks.load_test import (
+    Workload, parse_mix, run_workload, seed, start_server, stop_server,
+    summarize_run, wait_until_healthy
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--concurrency', type=int, default=256)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--port', type=int, default=5001)
+    args = parser.parse_args()
+
+    seed(args.users, 100)
+
+    base_url = f'http://127.0.0.1:{args.port}'
+    results = {}
+    for workers in args.workers:
+        server = start_server('gunicorn', args.port, workers)
+        try:
+            wait_until_healthy(base_url)
+            workload = Workload(args.users, 100, parse_mix(READ_MIX), seed=1)
+            latencies, errors, elapsed = asyncio.run(
+                run_workload(base_url, workload, args.concurrency, args.duration)
+            )
+        finally:
+            stop_server(server)
+        results[workers] = summarize_run(latencies, errors, elapsed)[1]
+
+    baseline = results[args.workers[0]]['rps'] / args.workers[0]
+    print(f"\n{args.concurrency} concurrent connections, {args.duration:.0f}s per run, {os.cpu_count()} cores")
+    print(f"  {'workers':<8}{'req/s':>10}{'p99 ms':>10}{'speedup':>10}{'efficiency':>12}{'errors':>8}")
+    for workers, total in results.items():
+        speedup = total['rps'] / baseline
+        print(f"  {workers:<8}{total['rps']:>10.0f}{total['p99_ms']:>10.1f}{speedup:>9.2f}x"
+              f"{speedup / workers * 100:>11.0f}%{total['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Inline vs. offloaded test cases with 100MB of test data.
+
+Seeds `--challenges` challenges and gives the first `--heavy` of them
+`--total-mb` of test cases between them, first inline in the challenge
+documents and then offloaded to GridFS with services.test_cases. For each
+layout reports:
+  - catalog load time and the memory the catalog keeps
+  - GET /api/challenges latency
+  - GET /api/challenges/<heavy id>: time to first byte, total time and the
+    peak memory allocated while serving it
+
+Usage: python -m benchmarks.large_test_cases [--total-mb 100] [--heavy 10]
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import app as api
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_challenges, summarize, time_calls
+)
+from models.challenge import Challenge
+from seed_data import challenge_id
+from services.challenge_catalog import get_challenge_catalog
+from services.test_cases import get_bucket, offload_large_sets
+
+CASE_BYTES = 1024
+
+
+def make_cases(count, seed):
+    """~1KB synthetic test cases"""
+    for i in range(count):
+        yield {
+            'input': {'seed': seed, 'n': i, 'data': format(seed * 7919 + i, 'x') * (CASE_BYTES // 16)},
+            'expectedOutput': i,
+            'description': 'Synthetic large test'
+        }
+
+
+def reload_catalog():
+    """Reload the shared catalog; returns (seconds, bytes allocated and kept)"""
+    catalog = get_challenge_catalog()
+    tracemalloc.start()
+    started = time.perf_counter()
+    catalog.load()
+    elapsed = time.perf_counter() - started
+    kept, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, kept
+
+
+def fetch(client, url):
+    """Stream one response; returns (seconds to first byte, total seconds, bytes, peak allocation)"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    first, size = None, 0
+    for chunk in response.iter_encoded():
+        if first is None:
+            first = time.perf_counter() - started
+        size += len(chunk)
+    response.close()
+    total = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first, total, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--challenges', type=int, default=200)
+    parser.add_argument('--heavy', type=int, default=10)
+    parser.add_argument('--total-mb', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    per_challenge = args.total_mb * 1024 * 1024 // CASE_BYTES // args.heavy
+    if per_challenge * CASE_BYTES > 15 * 1024 * 1024:
+        parser.error('inline sets must stay under the 16MB document limit; raise --heavy')
+
+    connect_bench_db()
+    try:
+        seed_challenges(args.challenges)
+        bucket = get_bucket()
+        for file in bucket.find():
+            bucket.delete(file._id)
+        challenges = Challenge._get_collection()
+        for i in range(args.heavy):
+            challenges.update_one(
+                {'challenge_id': challenge_id(i)},
+                {'$set': {'testCases': list(make_cases(per_challenge, i)), 'testCaseCount': per_challenge}}
+            )
+
+        print(f"\n{args.challenges} challenges, {args.heavy} carrying {args.total_mb}MB of test cases")
+        print(f"  {'layout':<10}{'load s':>9}{'catalog MB':>12}{'list p50 ms':>13}"
+              f"{'TTFB ms':>10}{'get ms':>10}{'get peak MB':>13}")
+        for layout in ('inline', 'offloaded'):
+            if layout == 'offloaded':
+                offload_large_sets()
+            load_time, kept = reload_catalog()
+            client = api.app.test_client()
+            listing = summarize(time_calls(lambda: client.get('/api/challenges'), args.repeat))
+            first, total, size, peak = fetch(client, f'/api/challenges/{challenge_id(0)}')
+            print(f"  {layout:<10}{load_time:>9.2f}{kept / 2 ** 20:>12.1f}{listing['p50_ms']:>13.2f}"
+                  f"{first * 1000:>10.1f}{total * 1000:>10.1f}{peak / 2 ** 20:>13.1f}")
+            print(f"    (heavy challenge body: {size / 2 ** 20:.1f}MB)")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
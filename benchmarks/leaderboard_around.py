@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Latency of /api/leaderboard/around/<userId> by user position and board size.
+
+The window is two index range queries anchored at the user's own
+(score, userId) key, so the p50 should stay flat from the top of the board
+to the bottom and from 10k to 1M users.
+
+Usage: python -m benchmarks.leaderboard_around [--sizes 10000 1000000] [--radius 10]
+"""
+
+import argparse
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_users, summarize, time_calls
+)
+from services.rank_index import load_rank_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--radius', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        client = app.test_client()
+        print(f"\nradius {args.radius}")
+        print(f"  {'users':>10}{'position':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for size in args.sizes:
+            seed_users(size)
+            index = load_rank_index()
+            for label, position in (('top', 1), ('middle', size // 2), ('bottom', size)):
+                user_id, _ = index.user_at(position)
+                url = f'/api/leaderboard/around/{user_id}?radius={args.radius}'
+                stats = summarize(time_calls(lambda: client.get(url), args.repeat))
+                print(f"  {size:>10}{label:>10}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Memory of the full-leaderboard export on 5M users.
+
+Streams GET /api/leaderboard/export in each format and samples this
+process's resident set size every `--sample` rows. A constant-memory export
+keeps RSS flat from the first row to the last; for contrast, the last line
+loads the same rows into a list the way /api/leaderboard builds a page.
+
+Usage: python -m benchmarks.leaderboard_export [--users 5000000] [--formats ndjson csv]
+"""
+
+import argparse
+import gc
+import os
+import resource
+import time
+
+from app import app
+from benchmarks.common import connect_bench_db, disconnect_bench_db, seed_users
+from models.user import User
+from services.leaderboard_cache import LEADERBOARD_SORT
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+
+def rss_mb():
+    """Current resident set size (Linux), else the peak so far"""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * PAGE_SIZE / 2 ** 20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def stream_export(client, export_format, sample_every):
+    """Stream one export; returns (rows, bytes, seconds, [(rows, RSS MB)])"""
+    started = time.perf_counter()
+    response = client.get(f'/api/leaderboard/export?format={export_format}', buffered=False)
+    rows, size, samples = 0, 0, [(0, rss_mb())]
+    next_sample = sample_every
+    for chunk in response.iter_encoded():
+        size += len(chunk)
+        rows += chunk.count(b'\n')
+        if rows >= next_sample:
+            samples.append((rows, rss_mb()))
+            next_sample += sample_every
+    response.close()
+    samples.append((rows, rss_mb()))
+    if export_format == 'csv':
+        rows -= 1
+    return rows, size, time.perf_counter() - started, samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=5000000)
+    parser.add_argument('--formats', nargs='+', default=['ndjson', 'csv'], choices=['ndjson', 'csv'])
+    parser.add_argument('--sample', type=int, default=500000, help='rows between RSS samples')
+    parser.add_argument('--skip-seed', action='store_true', help='reuse the existing users collection')
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        if not args.skip_seed:
+            seed_users(args.users)
+        client = app.test_client()
+
+        for export_format in args.formats:
+            gc.collect()
+            rows, size, elapsed, samples = stream_export(client, export_format, args.sample)
+            print(f"\n{export_format}: {rows} rows, {size / 2 ** 20:.0f}MB in {elapsed:.1f}s "
+                  f"({rows / elapsed:,.0f} rows/s)")
+            print(f"  {'rows':>12}{'RSS MB':>10}")
+            for count, rss in samples:
+                print(f"  {count:>12}{rss:>10.1f}")
+            growth = max(rss for _, rss in samples) - samples[0][1]
+            print(f"  RSS growth over the export: {growth:.1f}MB")
+
+        gc.collect()
+        before = rss_mb()
+        everything = list(User._get_collection().find(
+            {}, {'_id': 0, 'userId': 1, 'score': 1}
+        ).sort(LEADERBOARD_SORT))
+        print(f"\nFor contrast, the same {len(everything)} rows as a list: "
+              f"+{rss_mb() - before:.0f}MB RSS")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
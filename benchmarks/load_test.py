@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Concurrent mixed-workload load test.
+
+Drives a realistic mix of profile reads, challenge reads, completions and
+leaderboard polls against a running server with `--concurrency` workers for
+`--duration` seconds, then reports throughput and p50/p95/p99 per route.
+Results are written as JSON tagged with the current git commit so runs can
+be compared across commits with --compare.
+
+Either point it at a server you started yourself (--base-url, after
+seeding the server's database with --seed), or let it seed the benchmark
+database and start the server itself with --start-server flask|async.
+
+Usage:
+  python -m benchmarks.load_test --start-server flask --concurrency 200 --duration 60
+  python -m benchmarks.load_test --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import httpx
+
+from benchmarks.common import (
+    BENCH_MONGODB_URI, connect_bench_db, disconnect_bench_db, percentile,
+    seed_challenges, seed_users
+)
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), 'results')
+
+SERVERS = {
+    'flask': [sys.executable, 'app.py'],
+    'async': [sys.executable, '-m', 'uvicorn', 'asgi_app:app', '--port', '{port}',
+              '--backlog', '4096', '--log-level', 'warning'],
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', '127.0.0.1:{port}',
+                 '--workers', '{workers}', 'app:app'],
+}
+
+DEFAULT_MIX = 'get_user=35,get_challenge=20,get_challenges=5,complete=15,leaderboard=25'
+
+
+class Workload:
+    """
+    Picks requests for each route of the mix
+    """
+
+    def __init__(self, users, challenges, mix, seed):
+        self.users = users
+        self.challenges = challenges
+        self.rng = random.Random(seed)
+        self.routes = list(mix)
+        self.weights = [mix[route] for route in self.routes]
+        self.etag = None
+
+    def user_id(self):
+        return f'user_{self.rng.randrange(self.users):08d}'
+
+    def challenge_id(self):
+        return f'challenge_{self.rng.randrange(self.challenges):05d}'
+
+    def next_request(self):
+        """Return (route, method, path, json, headers)"""
+        route = self.rng.choices(self.routes, self.weights)[0]
+        if route == 'get_user':
+            return route, 'GET', f'/api/users/{self.user_id()}', None, None
+        if route == 'get_challenge':
+            return route, 'GET', f'/api/challenges/{self.challenge_id()}', None, None
+        if route == 'get_challenges':
+            return route, 'GET', '/api/challenges', None, None
+        if route == 'complete':
+            body = {'userId': self.user_id(), 'score': self.rng.randrange(10, 100)}
+            return route, 'POST', f'/api/challenges/{self.challenge_id()}/complete', body, None
+        if route == 'health':
+            return route, 'GET', '/health', None, None
+        if route == 'leaderboard':
+            headers = {'If-None-Match': self.etag} if self.etag else None
+            return route, 'GET', '/api/leaderboard', None, headers
+        raise ValueError(f'Unknown route in mix: {route}')
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        route, _, weight = part.partition('=')
+        mix[route.strip()] = float(weight)
+    return mix
+
+
+async def run_workload(base_url, workload, concurrency, duration):
+    """Run the workload; returns ({route: [latency]}, {route: errors}, elapsed)"""
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    latencies = {route: [] for route in workload.routes}
+    errors = {route: 0 for route in workload.routes}
+
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            while time.perf_counter() < deadline:
+                route, method, path, body, headers = workload.next_request()
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body, headers=headers)
+                    # 404/409 are legitimate outcomes of random completions
+                    if response.status_code >= 500:
+                        errors[route] += 1
+                    elif route == 'leaderboard':
+                        workload.etag = response.headers.get('ETag', workload.etag)
+                except httpx.HTTPError:
+                    errors[route] += 1
+                latencies[route].append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed
+
+
+def summarize_run(latencies, errors, elapsed):
+    routes = {}
+    everything = []
+    for route, samples in latencies.items():
+        everything.extend(samples)
+        if not samples:
+            continue
+        routes[route] = {
+            'requests': len(samples),
+            'errors': errors[route],
+            'rps': len(samples) / elapsed,
+            'p50_ms': percentile(samples, 50) * 1000,
+            'p95_ms': percentile(samples, 95) * 1000,
+            'p99_ms': percentile(samples, 99) * 1000
+        }
+    total = {
+        'requests': len(everything),
+        'errors': sum(errors.values()),
+        'rps': len(everything) / elapsed,
+    }
+    if everything:
+        total.update({
+            'p50_ms': percentile(everything, 50) * 1000,
+            'p95_ms': percentile(everything, 95) * 1000,
+            'p99_ms': percentile(everything, 99) * 1000
+        })
+    return routes, total
+
+
+def print_report(routes, total):
+    print(f"  {'route':<16}{'requests':>10}{'errors':>8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for route, stats in list(routes.items()) + [('TOTAL', total)]:
+        print(f"  {route:<16}{stats['requests']:>10}{stats['errors']:>8}{stats['rps']:>10.0f}"
+              f"{stats.get('p50_ms', 0):>10.1f}{stats.get('p95_ms', 0):>10.1f}{stats.get('p99_ms', 0):>10.1f}")
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def start_server(name, port, workers=1):
+    """Start a server against the benchmark database; returns the process"""
+    command = [part.format(port=port, workers=workers) for part in SERVERS[name]]
+    env = dict(os.environ, MONGODB_URI=BENCH_MONGODB_URI, API_PORT=str(port), FLASK_DEBUG='False')
+    return subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL)
+
+
+def stop_server(server):
+    server.terminate()
+    server.wait()
+
+
+def wait_until_healthy(base_url, timeout=120):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f'{base_url}/health', timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f'{base_url} did not become healthy')
+
+
+def seed(users, challenges):
+    connect_bench_db()
+    try:
+        seed_users(users)
+        seed_challenges(challenges)
+    finally:
+        disconnect_bench_db()
+
+
+def compare(before_path, after_path):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"\n{before['commit']} -> {after['commit']}")
+    print(f"  {'route':<16}{'req/s':>18}{'p99 ms':>20}")
+    rows = [(route, before['routes'].get(route), stats) for route, stats in after['routes'].items()]
+    rows.append(('TOTAL', before['total'], after['total']))
+    for route, old, new in rows:
+        if not old:
+            continue
+        print(f"  {route:<16}{old['rps']:>8.0f} -> {new['rps']:<8.0f}"
+              f"{old.get('p99_ms', 0):>9.1f} -> {new.get('p99_ms', 0):<9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--base-url', default='http://localhost:5000')
+    parser.add_argument('--start-server', choices=list(SERVERS))
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--workers', type=int, default=1, help='worker processes for --start-server gunicorn')
+    parser.add_argument('--seed', action='store_true', help='seed the benchmark database first')
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--challenges', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--duration', type=float, default=30)
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='route=weight pairs')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--output', help='results file (default: benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    if args.seed or args.start_server:
+        seed(args.users, args.challenges)
+
+    base_url = args.base_url
+    server = None
+    if args.start_server:
+        base_url = f'http://127.0.0.1:{args.port}'
+        server = start_server(args.start_server, args.port, args.workers)
+    try:
+        wait_until_healthy(base_url)
+        workload = Workload(args.users, args.challenges, parse_mix(args.mix), args.random_seed)
+        latencies, errors, elapsed = asyncio.run(
+            run_workload(base_url, workload, args.concurrency, args.duration)
+        )
+    finally:
+        if server is not None:
+            stop_server(server)
+
+    routes, total = summarize_run(latencies, errors, elapsed)
+    print(f"\n{args.concurrency} workers for {elapsed:.1f}s against {args.start_server or base_url}")
+    print_report(routes, total)
+
+    commit = git_commit()
+    result = {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'server': args.start_server or base_url,
+        'config': {
+            'concurrency': args.concurrency, 'duration': args.duration, 'mix': args.mix, 'workers': args.workers,
+            'users': args.users, 'challenges': args.challenges, 'random_seed': args.random_seed
+        },
+        'routes': routes,
+        'total': total
+    }
+    output = args.output
+    if output is None:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+        output = os.path.join(RESULTS_DIR, f'{commit}-{stamp}.json')
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
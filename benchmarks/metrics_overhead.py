@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Overhead of the built-in metrics on the request path.
+
+Times full requests through the Flask test client with metrics enabled and
+disabled (the health route, so no MongoDB time hides the difference), plus
+the raw cost of recording one request and one MongoDB command sample and
+of rendering /metrics. Needs no database.
+
+Usage: python -m benchmarks.metrics_overhead [--repeat 20000]
+"""
+
+import argparse
+import time
+
+import app as api
+from services.metrics import Metrics, get_metrics
+
+
+def cpu_per_request(client, repeat, path):
+    client.get(path)  # warm up
+    started = time.process_time()
+    for _ in range(repeat):
+        client.get(path)
+    return (time.process_time() - started) / repeat
+
+
+def cpu_per_call(fn, repeat):
+    started = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=20000)
+    args = parser.parse_args()
+
+    metrics = get_metrics()
+    client = api.app.test_client()
+
+    metrics.enabled = False
+    off = cpu_per_request(client, args.repeat, '/health')
+    metrics.enabled = True
+    on = cpu_per_request(client, args.repeat, '/health')
+
+    print(f"\nCPU time per /health request ({args.repeat} requests)")
+    print(f"  metrics off {off * 1e6:>8.1f} us")
+    print(f"  metrics on  {on * 1e6:>8.1f} us  (+{(on - off) * 1e6:.1f} us, {(on / off - 1) * 100:+.1f}%)")
+
+    scratch = Metrics()
+    record_request = cpu_per_call(
+        lambda: scratch.request_finished('/api/users/<userId>', 'GET', 200, scratch.request_started()),
+        args.repeat
+    )
+    record_command = cpu_per_call(lambda: scratch.observe_command('users', 'find', 0.0012), args.repeat)
+    render = cpu_per_call(metrics.render, 100)
+
+    print("\nRaw cost")
+    print(f"  record request   {record_request * 1e6:>8.2f} us")
+    print(f"  record command   {record_command * 1e6:>8.2f} us")
+    print(f"  render /metrics  {render * 1e6:>8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Latency under overload with and without admission control.
+
+Runs `--threads` closed-loop clients (far more than the admission limits)
+against the Flask app in-process for `--duration` seconds, each sending a
+mix of challenge reads, profile reads and completions, once with
+ADMISSION_CONTROL off and once on. Reports per route the throughput, the
+p50/p99 latency of admitted requests and the share shed with 503.
+
+Usage: python -m benchmarks.overload [--threads 256] [--duration 20]
+"""
+
+import argparse
+import random
+import threading
+import time
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, percentile, seed_challenges, seed_users
+)
+from seed_data import challenge_id, user_id
+from services.admission import get_admission_controller
+from services.challenge_catalog import get_challenge_catalog
+from services.rank_index import load_rank_index
+
+MIX = (('get_challenge', 40), ('get_user', 30), ('complete_challenge', 30))
+
+
+def run(threads, duration, users, challenges):
+    """Drive the mix; returns {route: (latencies of admitted requests, shed count)}"""
+    results = {route: ([], [0]) for route, _ in MIX}
+    lock = threading.Lock()
+    stop = time.monotonic() + duration
+
+    def client_loop(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        routes, weights = zip(*MIX)
+        local = {route: ([], 0) for route in routes}
+        while time.monotonic() < stop:
+            route = rng.choices(routes, weights)[0]
+            challenge = challenge_id(rng.randrange(challenges))
+            started = time.perf_counter()
+            if route == 'get_challenge':
+                response = client.get(f'/api/challenges/{challenge}')
+            elif route == 'get_user':
+                response = client.get(f'/api/users/{user_id(rng.randrange(users))}?completed=count')
+            else:
+                response = client.post(f'/api/challenges/{challenge}/complete',
+                                       json={'userId': user_id(rng.randrange(users)), 'score': 10})
+            elapsed = time.perf_counter() - started
+            latencies, shed = local[route]
+            if response.status_code == 503:
+                local[route] = (latencies, shed + 1)
+            else:
+                latencies.append(elapsed)
+        with lock:
+            for route, (latencies, shed) in local.items():
+                results[route][0].extend(latencies)
+                results[route][1][0] += shed
+
+    workers = [threading.Thread(target=client_loop, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return {route: (latencies, shed[0]) for route, (latencies, shed) in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--threads', type=int, default=256)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--challenges', type=int, default=500)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        seed_users(args.users)
+        seed_challenges(args.challenges)
+        get_challenge_catalog().load()
+        load_rank_index()
+
+        admission = get_admission_controller()
+        print(f"\n{args.threads} clients for {args.duration:.0f}s; limits: "
+              f"{admission.max_in_flight} in flight, {admission.route_concurrency} per route, "
+              f"budgets read {admission.budgets['read'] * 1000:.0f}ms / write {admission.budgets['write'] * 1000:.0f}ms")
+        print(f"  {'admission':<11}{'route':<20}{'req/s':>9}{'p50 ms':>10}{'p99 ms':>10}{'shed':>8}")
+        for enabled in (False, True):
+            admission.enabled = enabled
+            results = run(args.threads, args.duration, args.users, args.challenges)
+            for route, (latencies, shed) in results.items():
+                total = len(latencies) + shed
+                p50 = percentile(latencies, 50) * 1000 if latencies else float('nan')
+                p99 = percentile(latencies, 99) * 1000 if latencies else float('nan')
+                print(f"  {'on' if enabled else 'off':<11}{route:<20}{len(latencies) / args.duration:>9.0f}"
+                      f"{p50:>10.1f}{p99:>10.1f}{(shed / total if total else 0):>8.1%}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Compare leaderboard page latency near the top and deep into the ranking.
+
+Keyset pages (?cursor=) should cost the same at page 1 and page 10,000,
+while skip-based paging grows with the page number.
+
+Usage: python -m benchmarks.pagination [--users 1000000] [--pages 1 100 10000]
+"""
+
+import argparse
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_users, summarize, time_calls
+)
+from models.user import User
+from services.pagination import encode_cursor
+from services.rank_index import load_rank_index
+
+PAGE_SIZE = 100
+
+
+def skip_page(page):
+    """Offset paging, the approach keyset cursors replace"""
+    cursor = User._get_collection().find(
+        {}, {'_id': 0, 'userId': 1, 'score': 1}
+    ).sort([('score', -1), ('userId', 1)]).skip((page - 1) * PAGE_SIZE).limit(PAGE_SIZE)
+    return list(cursor)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--pages', type=int, nargs='+', default=[1, 100, 10000])
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--skip-seed', action='store_true', help='reuse the existing users collection')
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        if not args.skip_seed:
+            seed_users(args.users)
+        index = load_rank_index()
+        client = app.test_client()
+
+        print(f"\n{len(index)} users, {PAGE_SIZE} per page")
+        print(f"  {'page':>8}{'keyset p50 ms':>16}{'keyset p99 ms':>16}{'skip p50 ms':>14}{'skip p99 ms':>14}")
+        for page in args.pages:
+            url = f'/api/leaderboard?limit={PAGE_SIZE}'
+            if page > 1:
+                user_id, score = index.user_at((page - 1) * PAGE_SIZE)
+                url += f'&cursor={encode_cursor([score, user_id])}'
+
+            keyset = summarize(time_calls(lambda: client.get(url), args.repeat))
+            skip = summarize(time_calls(lambda: skip_page(page), max(1, args.repeat // 10)))
+            print(f"  {page:>8}{keyset['p50_ms']:>16.2f}{keyset['p99_ms']:>16.2f}"
+                  f"{skip['p50_ms']:>14.2f}{skip['p99_ms']:>14.2f}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
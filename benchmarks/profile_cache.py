@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Profile polling with and without the profile cache.
+
+`--threads` clients poll GET /api/users/<id> for users drawn from a skewed
+distribution (most polls go to the first `--hot` users) and complete a
+challenge every `--write-every` polls, reading their own profile straight
+back. Runs with the cache off, with the in-process LRU, and with the LRU in
+front of Redis when `--redis-url` is given. Reports profile reads per
+second, p50/p99 latency, cache hit ratio and evictions, and how many
+read-backs missed the score just written (must be 0).
+
+Usage: python -m benchmarks.profile_cache [--users 100000] [--redis-url redis://localhost:6379/0]
+"""
+
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, percentile, seed_challenges, seed_users
+)
+from seed_data import challenge_id, user_id
+from services.challenge_catalog import get_challenge_catalog
+from services.profile_cache import RedisTier, get_profile_cache
+from services.rank_index import load_rank_index
+
+
+def run(threads, duration, users, hot, write_every):
+    """Poll for `duration` seconds; returns (read latencies, stale read-backs)"""
+    stop = threading.Event()
+
+    def client_loop(worker):
+        client = app.test_client()
+        rng = random.Random(worker)
+        latencies, stale, completed = [], 0, 0
+        while not stop.is_set():
+            for _ in range(write_every):
+                index = rng.randrange(hot) if rng.random() < 0.8 else rng.randrange(users)
+                started = time.perf_counter()
+                client.get(f'/api/users/{user_id(index)}?completed=count')
+                latencies.append(time.perf_counter() - started)
+            # Each worker writes to its own users so challenges never repeat
+            writer = user_id(worker + threads * rng.randrange(hot // threads or 1))
+            response = client.post(f'/api/challenges/{challenge_id(completed)}/complete',
+                                   json={'userId': writer, 'score': 1})
+            completed += 1
+            if response.status_code == 200:
+                expected = response.get_json()['user']['score']
+                if client.get(f'/api/users/{writer}').get_json()['score'] != expected:
+                    stale += 1
+        return latencies, stale
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        futures = [executor.submit(client_loop, worker) for worker in range(threads)]
+        time.sleep(duration)
+        stop.set()
+        results = [future.result() for future in futures]
+    return [l for latencies, _ in results for l in latencies], sum(stale for _, stale in results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--hot', type=int, default=1000)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=20)
+    parser.add_argument('--write-every', type=int, default=10, help='profile reads per completion')
+    parser.add_argument('--size', type=int, default=10000, help='LRU entries')
+    parser.add_argument('--challenges', type=int, default=5000, help='enough for every completion of one client')
+    parser.add_argument('--redis-url')
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        modes = ['off', 'lru'] + (['lru+redis'] if args.redis_url else [])
+        print(f"\n{args.threads} clients, {args.users} users ({args.hot} hot), "
+              f"1 completion per {args.write_every} reads, {args.duration:.0f}s per mode")
+        print(f"  {'cache':<11}{'reads/s':>9}{'p50 ms':>9}{'p99 ms':>9}"
+              f"{'hit ratio':>11}{'evictions':>11}{'stale':>7}")
+        for mode in modes:
+            seed_users(args.users)
+            seed_challenges(args.challenges)
+            get_challenge_catalog().load()
+            load_rank_index()
+
+            # The users were just re-seeded, so start every mode from an empty cache
+            cache = get_profile_cache()
+            cache.close()
+            cache.clear()
+            cache.enabled = mode != 'off'
+            cache.size = args.size
+            if mode == 'lru+redis':
+                cache.shared = RedisTier(args.redis_url)
+                cache.shared.client.flushdb()
+                cache.shared.listen(lambda uid: cache.evict_local([uid]))
+            before = cache.stats()
+
+            latencies, stale = run(args.threads, args.duration, args.users, args.hot, args.write_every)
+            after = cache.stats()
+            hits = sum(after[key] - before[key] for key in ('hits', 'sharedHits'))
+            lookups = hits + after['misses'] - before['misses']
+            ratio = f"{hits / lookups:.1%}" if lookups else '-'
+            print(f"  {mode:<11}{len(latencies) / args.duration:>9.0f}"
+                  f"{percentile(latencies, 50) * 1000:>9.2f}{percentile(latencies, 99) * 1000:>9.2f}"
+                  f"{ratio:>11}{after['evictions'] - before['evictions']:>11}{stale:>7}")
+        get_profile_cache().close()
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Query-plan audit for every API route.
+
+Seeds the benchmark database, exercises each route through Flask's test
+client, captures the MongoDB commands it sends with a pymongo command
+listener, and explains them. Any command whose winning plan contains a
+COLLSCAN or an in-memory SORT fails the audit (exit status 1), so this
+doubles as a regression gate for indexing decisions.
+
+Usage: python -m benchmarks.query_audit [--users 100000] [--challenges 200]
+"""
+
+import argparse
+import sys
+
+from pymongo import monitoring
+
+# Commands that have a query plan worth explaining
+EXPLAINABLE = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+# Envelope fields the driver adds that explain does not accept
+ENVELOPE = {'$db', 'lsid', '$clusterTime', '$readPreference', 'txnNumber', 'apiVersion',
+            'apiStrict', 'apiDeprecationErrors', 'maxTimeMS', 'writeConcern', 'readConcern'}
+BANNED_STAGES = {'COLLSCAN', 'SORT'}
+# Challenge whose test cases the audit moves to GridFS
+OFFLOADED_CHALLENGE = 'challenge_00003'
+
+
+class CommandRecorder(monitoring.CommandListener):
+    """Collects the commands sent while a route runs"""
+
+    def __init__(self):
+        self.commands = []
+        self.recording = False
+
+    def started(self, event):
+        if self.recording and event.command_name in EXPLAINABLE:
+            self.commands.append((event.database_name, event.command_name, dict(event.command)))
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+recorder = CommandRecorder()
+monitoring.register(recorder)
+
+# Imported after registering the listener so the client picks it up
+from app import app  # noqa: E402
+from benchmarks.common import (  # noqa: E402
+    connect_bench_db, disconnect_bench_db, seed_challenges, seed_users
+)
+from mongoengine.connection import get_connection  # noqa: E402
+from services.challenge_catalog import get_challenge_catalog  # noqa: E402
+from services.pagination import encode_cursor  # noqa: E402
+from services.rank_index import get_rank_index, load_rank_index  # noqa: E402
+from services.test_cases import store_test_cases  # noqa: E402
+
+
+def explain_targets(name, command):
+    """Split a captured command into explainable single statements"""
+    command = {k: v for k, v in command.items() if k not in ENVELOPE}
+    if name == 'update':
+        for statement in command.pop('updates'):
+            yield dict(command, updates=[statement])
+    elif name == 'delete':
+        for statement in command.pop('deletes'):
+            yield dict(command, deletes=[statement])
+    else:
+        yield command
+
+
+def collect(node, key, found, skip=('rejectedPlans',)):
+    """Collect every value stored under `key` anywhere in an explain document"""
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k in skip:
+                continue
+            if k == key:
+                found.append(v)
+            collect(v, key, found, skip)
+    elif isinstance(node, list):
+        for item in node:
+            collect(item, key, found, skip)
+    return found
+
+
+def audit(database, command):
+    """Explain one command; returns (stages, docs examined, docs returned)"""
+    result = get_connection()[database].command(
+        {'explain': command, 'verbosity': 'executionStats'}
+    )
+    planner = collect(result, 'queryPlanner', [])
+    stages = collect(planner, 'stage', [])
+    stats = collect(result, 'executionStats', [])
+    examined = sum(s.get('totalDocsExamined', 0) for s in stats if isinstance(s, dict))
+    returned = sum(s.get('nReturned', 0) for s in stats if isinstance(s, dict))
+    return stages, examined, returned
+
+
+def routes(users):
+    """(label, method, path, json) for every route in app.py"""
+    index = get_rank_index()
+    user_id, score = index.user_at(max(1, users // 2))
+    deep = encode_cursor([score, user_id])
+    # Windowed cursors also carry the rank of the last entry
+    deep_window = encode_cursor([score, user_id, 1])
+    challenge_id = 'challenge_00001'
+    return [
+        ('health_check', 'GET', '/health', None),
+        ('ready_check', 'GET', '/ready', None),
+        ('create_user', 'POST', '/api/users', {'userId': 'audit_user'}),
+        ('create_users_batch', 'POST', '/api/users/batch', {'userIds': ['audit_a', 'audit_b']}),
+        ('get_user', 'GET', f'/api/users/{user_id}', None),
+        ('get_user (count)', 'GET', f'/api/users/{user_id}?completed=count', None),
+        ('get_user (compact)', 'GET', f'/api/users/{user_id}?completed=compact', None),
+        ('get_user (full)', 'GET', f'/api/users/{user_id}?completed=full', None),
+        ('get_user (fields)', 'GET', f'/api/users/{user_id}?fields=score,rank', None),
+        ('get_challenges', 'GET', '/api/challenges', None),
+        ('get_challenges (page)', 'GET', '/api/challenges?limit=20', None),
+        ('get_challenges (difficulty)', 'GET', '/api/challenges?difficulty=hard', None),
+        ('get_challenges (difficulty page)', 'GET', '/api/challenges?difficulty=hard&limit=20', None),
+        ('get_challenges (fields)', 'GET', '/api/challenges?fields=title,difficulty', None),
+        ('get_challenges (ids)', 'GET', f'/api/challenges?ids={challenge_id},challenge_00002', None),
+        ('get_challenge', 'GET', f'/api/challenges/{challenge_id}', None),
+        ('get_challenge (fields)', 'GET', f'/api/challenges/{challenge_id}?fields=title,testCaseCount', None),
+        ('get_challenge (offloaded)', 'GET', f'/api/challenges/{OFFLOADED_CHALLENGE}', None),
+        ('get_challenge_tests', 'GET', f'/api/challenges/{challenge_id}/tests', None),
+        ('get_challenge_tests (offloaded)', 'GET', f'/api/challenges/{OFFLOADED_CHALLENGE}/tests', None),
+        ('complete_challenge', 'POST', f'/api/challenges/{challenge_id}/complete',
+         {'userId': user_id, 'score': 10}),
+        ('complete_challenge (repeat)', 'POST', f'/api/challenges/{challenge_id}/complete',
+         {'userId': user_id, 'score': 10}),
+        ('complete_challenges_batch', 'POST', '/api/completions/batch',
+         {'completions': [{'userId': user_id, 'challenge_id': 'challenge_00002', 'score': 5}]}),
+        ('get_leaderboard', 'GET', '/api/leaderboard', None),
+        ('get_leaderboard (deep page)', 'GET', f'/api/leaderboard?limit=100&cursor={deep}', None),
+        ('get_leaderboard (day)', 'GET', '/api/leaderboard?window=day', None),
+        ('get_leaderboard (week)', 'GET', '/api/leaderboard?window=week', None),
+        ('get_leaderboard (week page)', 'GET', f'/api/leaderboard?window=week&limit=100&cursor={deep_window}', None),
+        ('get_leaderboard_around', 'GET', f'/api/leaderboard/around/{user_id}?radius=10', None),
+        ('get_leaderboard_export (ndjson)', 'GET', '/api/leaderboard/export', None),
+        ('get_leaderboard_export (csv)', 'GET', '/api/leaderboard/export?format=csv', None),
+        ('get_stats', 'GET', '/api/stats', None),
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--challenges', type=int, default=200)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    failures = 0
+    try:
+        seed_users(args.users)
+        seed_challenges(args.challenges)
+        store_test_cases(OFFLOADED_CHALLENGE, [
+            {'input': {'n': i}, 'expectedOutput': i, 'description': 'Synthetic test'} for i in range(100)
+        ], limit=0)
+
+        # Startup loads are part of the audit too
+        recorder.commands = []
+        recorder.recording = True
+        load_rank_index()
+        get_challenge_catalog().load()
+        recorder.recording = False
+        captured = [('warm_up', list(recorder.commands))]
+
+        client = app.test_client()
+        for label, method, path, body in routes(args.users):
+            recorder.commands = []
+            recorder.recording = True
+            # Streamed bodies only query the database as they are read
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            response.close()
+            recorder.recording = False
+            captured.append((label, list(recorder.commands)))
+
+        print(f"\n{'route':<34}{'command':<14}{'collection':<12}{'examined':>10}{'returned':>10}  plan")
+        for label, commands in captured:
+            for database, name, command in commands:
+                for target in explain_targets(name, command):
+                    stages, examined, returned = audit(database, target)
+                    banned = sorted(BANNED_STAGES.intersection(stages))
+                    verdict = f"FAIL ({', '.join(banned)})" if banned else 'ok'
+                    failures += bool(banned)
+                    print(f"{label:<34}{name:<14}{str(target.get(name)):<12}"
+                          f"{examined:>10}{returned:>10}  {'>'.join(reversed(stages))} {verdict}")
+    finally:
+        disconnect_bench_db()
+
+    if failures:
+        print(f"\n❌ {failures} queries use a collection scan or an in-memory sort")
+        sys.exit(1)
+    print("\n🎉 Every query is index-backed")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Compare the old full-scan rank calculation with the in-memory rank index.
+
+Usage: python -m benchmarks.rank_index [--sizes 10000 100000 1000000]
+"""
+
+import argparse
+import random
+
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_users, summarize, time_calls
+)
+from models.user import User
+from services.rank_index import get_rank_index, load_rank_index
+
+
+def scan_rank(userId):
+    """The rank loop complete_challenge used before the rank index"""
+    rank = 1
+    for u in User.objects.order_by('-score'):
+        if u.userId == userId:
+            return rank
+        rank += 1
+    return None
+
+
+def run(size, scan_repeat, index_repeat):
+    seed_users(size)
+    rng = random.Random(size)
+    targets = [f'user_{rng.randrange(size):08d}' for _ in range(index_repeat)]
+
+    build = time_calls(load_rank_index, 1)[0]
+    index = get_rank_index()
+
+    scan = summarize(time_calls(lambda: scan_rank(rng.choice(targets)), scan_repeat))
+    by_user = summarize(time_calls(lambda: index.rank_of(rng.choice(targets)), index_repeat))
+    by_position = summarize(time_calls(lambda: index.user_at(rng.randrange(1, size + 1)), index_repeat))
+    update = summarize(time_calls(
+        lambda: index.set_score(rng.choice(targets), rng.randrange(0, 5000)), index_repeat
+    ))
+
+    print(f"\n{size} users (index build {build:.2f}s)")
+    print(f"  {'operation':<24}{'mean ms':>12}{'p50 ms':>12}{'p99 ms':>12}")
+    for name, stats in [('full scan rank', scan), ('index rank_of', by_user),
+                        ('index user_at', by_position), ('index set_score', update)]:
+        print(f"  {name:<24}{stats['mean_ms']:>12.4f}{stats['p50_ms']:>12.4f}{stats['p99_ms']:>12.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--scan-repeat', type=int, default=5)
+    parser.add_argument('--index-repeat', type=int, default=10000)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        for size in args.sizes:
+            run(size, args.scan_repeat, args.index_repeat)
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Per-request CPU time of each GET route: the original hydrating
+implementations (MongoEngine Documents + jsonify) vs. the current routes
+(projected raw documents, in-memory caches, fast JSON).
+
+Both sides call the view code directly inside a request context and are
+timed with process_time, so the numbers are CPU spent in this process.
+
+Usage: python -m benchmarks.read_path [--users 100000] [--repeat 2000]
+"""
+
+import argparse
+import time
+
+from flask import jsonify
+
+import app as api
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_challenges, seed_users
+)
+from models.challenge import Challenge
+from models.user import User
+from services.challenge_catalog import get_challenge_catalog
+from services.rank_index import load_rank_index
+
+
+def old_get_user(userId):
+    user = User.objects(userId=userId).first()
+    return jsonify({
+        'userId': user.userId,
+        'score': user.score,
+        'rank': user.rank,
+        'completedChallenges': user.completedChallenges
+    })
+
+
+def old_get_challenges():
+    return jsonify([{
+        'id': c.challenge_id,
+        'title': c.title,
+        'description': c.description,
+        'difficulty': c.difficulty,
+        'starterCode': c.starterCode
+    } for c in Challenge.objects.all()])
+
+
+def old_get_challenge(challenge_id):
+    c = Challenge.objects(challenge_id=challenge_id).first()
+    return jsonify({
+        'id': c.challenge_id,
+        'title': c.title,
+        'description': c.description,
+        'difficulty': c.difficulty,
+        'starterCode': c.starterCode,
+        'testCases': c.testCases
+    })
+
+
+def old_get_leaderboard():
+    return jsonify([
+        {'userId': u.userId, 'score': u.score, 'rank': u.rank}
+        for u in User.objects.order_by('-score').limit(100)
+    ])
+
+
+def cpu_per_call(fn, repeat, path):
+    with api.app.test_request_context(path):
+        fn()  # warm up
+        started = time.process_time()
+        for _ in range(repeat):
+            fn()
+        return (time.process_time() - started) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--challenges', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=2000)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        seed_users(args.users)
+        seed_challenges(args.challenges)
+        load_rank_index()
+        get_challenge_catalog().load()
+
+        user_id = f'user_{args.users // 2:08d}'
+        challenge_id = 'challenge_00001'
+        routes = [
+            ('get_user', f'/api/users/{user_id}',
+             lambda: old_get_user(user_id), lambda: api.get_user(user_id)),
+            ('get_challenges', '/api/challenges', old_get_challenges, api.get_challenges),
+            ('get_challenge', f'/api/challenges/{challenge_id}',
+             lambda: old_get_challenge(challenge_id), lambda: api.get_challenge(challenge_id)),
+            ('get_leaderboard', '/api/leaderboard', old_get_leaderboard, api.get_leaderboard),
+            ('health_check', '/health',
+             lambda: jsonify({'status': 'healthy', 'message': 'Reactivate API is running'}),
+             api.health_check),
+        ]
+
+        print(f"\nCPU time per request ({args.repeat} calls each)")
+        print(f"  {'route':<18}{'before us':>12}{'after us':>12}{'speedup':>10}")
+        for name, path, before, after in routes:
+            old = cpu_per_call(before, args.repeat, path)
+            new = cpu_per_call(after, args.repeat, path)
+            print(f"  {name:<18}{old * 1e6:>12.1f}{new * 1e6:>12.1f}{old / new:>9.1f}x")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Payload size and latency of filtered and sparse challenge and user reads.
+
+Seeds a `--challenges` challenge catalog (default 5k) and a user with
+`--completed` embedded completions, then reports the body size and
+p50/p99 latency of GET /api/challenges with and without ?difficulty=,
+?ids= and ?fields=, and of GET /api/users/<userId> with and without
+?fields=.
+
+Usage: python -m benchmarks.sparse_fields [--challenges 5000] [--completed 1000]
+"""
+
+import argparse
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_challenges, summarize, time_calls
+)
+from models.user import User
+from seed_data import challenge_id
+from services.challenge_catalog import get_challenge_catalog
+
+USER_ID = 'sparse_user'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--challenges', type=int, default=5000)
+    parser.add_argument('--completed', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    connect_bench_db()
+    try:
+        seed_challenges(args.challenges)
+        get_challenge_catalog().load()
+        users = User._get_collection()
+        users.delete_many({'userId': USER_ID})
+        completed = [challenge_id(i) for i in range(min(args.completed, args.challenges))]
+        users.insert_one({
+            'userId': USER_ID, 'score': 10 * len(completed), 'rank': 0,
+            'completedChallenges': completed, 'completedCount': len(completed)
+        })
+
+        ids = ','.join(challenge_id(i) for i in range(0, args.challenges, max(1, args.challenges // 100)))
+        urls = [
+            ('all challenges', '/api/challenges'),
+            ('?fields=id,title,difficulty', '/api/challenges?fields=id,title,difficulty'),
+            ('?difficulty=easy', '/api/challenges?difficulty=easy'),
+            ('?difficulty=easy&fields=id,title', '/api/challenges?difficulty=easy&fields=id,title'),
+            ('?ids=<100 ids>', f'/api/challenges?ids={ids}'),
+            ('?ids=<100 ids>&fields=id,title', f'/api/challenges?ids={ids}&fields=id,title'),
+            ('user, full profile', f'/api/users/{USER_ID}'),
+            ('user ?fields=score', f'/api/users/{USER_ID}?fields=score'),
+            ('user ?fields=score,rank', f'/api/users/{USER_ID}?fields=score,rank'),
+        ]
+
+        client = app.test_client()
+        print(f"\n{args.challenges} challenges, user with {len(completed)} completions")
+        print(f"  {'request':<36}{'bytes':>10}{'p50 ms':>10}{'p99 ms':>10}")
+        for label, url in urls:
+            size = len(client.get(url).data)
+            stats = summarize(time_calls(lambda: client.get(url), args.repeat))
+            print(f"  {label:<36}{size:>10}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
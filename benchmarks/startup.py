@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Cold start: import time and time to first response.
+
+Measures `import app` in fresh interpreters (and lists the slowest modules
+from -X importtime), then starts `python app.py` against the benchmark
+database once per WARM_UP mode and records, from process start:
+  - the first 200 from /health (the server is accepting connections)
+  - the first 200 from /ready (connected and warmed up)
+  - the first 200 from /api/leaderboard and /api/challenges
+
+Seed the benchmark database first (e.g. `--users 1000000`) so that warm-up
+has real work to do.
+
+Usage: python -m benchmarks.startup [--users 1000000] [--imports 10]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+from benchmarks.common import (
+    BENCH_MONGODB_URI, connect_bench_db, disconnect_bench_db, seed_challenges, seed_users
+)
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMPORT_SNIPPET = 'import time; t = time.perf_counter(); import app; print(time.perf_counter() - t)'
+
+
+def import_times(repeat):
+    return [
+        float(subprocess.run([sys.executable, '-c', IMPORT_SNIPPET], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout.strip().splitlines()[-1])
+        for _ in range(repeat)
+    ]
+
+
+def slowest_imports(count):
+    """(cumulative microseconds, module) of the slowest imports under `import app`"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'], cwd=ROOT,
+                            check=True, capture_output=True, text=True).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        # Top-level packages only, so nested imports are not counted twice
+        if not name.startswith(' ') and '.' not in name.strip():
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def ok(url):
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status == 200
+    except (urllib.error.URLError, OSError):
+        return False
+
+
+def time_to_first_response(mode, port, timeout):
+    """Seconds from spawning the server until each probe first answers 200"""
+    env = dict(os.environ, WARM_UP=mode, MONGODB_URI=BENCH_MONGODB_URI, API_PORT=str(port),
+               FLASK_DEBUG='False')
+    base = f'http://127.0.0.1:{port}'
+    pending = {'/health': None, '/ready': None, '/api/leaderboard': None, '/api/challenges': None}
+    started = time.perf_counter()
+    process = subprocess.Popen([sys.executable, 'app.py'], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while any(value is None for value in pending.values()):
+            if time.perf_counter() - started > timeout or process.poll() is not None:
+                break
+            for path, value in pending.items():
+                if value is None and ok(base + path):
+                    pending[path] = time.perf_counter() - started
+            time.sleep(0.005)
+    finally:
+        process.terminate()
+        process.wait()
+    return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--challenges', type=int, default=200)
+    parser.add_argument('--imports', type=int, default=10)
+    parser.add_argument('--port', type=int, default=5077)
+    parser.add_argument('--timeout', type=float, default=300)
+    parser.add_argument('--skip-seed', action='store_true')
+    args = parser.parse_args()
+
+    times = import_times(args.imports)
+    print(f"\nimport app: median {statistics.median(times) * 1000:.0f} ms, "
+          f"min {min(times) * 1000:.0f} ms ({args.imports} fresh interpreters)")
+    print("  slowest top-level imports (cumulative):")
+    for micros, name in slowest_imports(8):
+        print(f"    {name:<24}{micros / 1000:>8.1f} ms")
+
+    if not args.skip_seed:
+        connect_bench_db()
+        try:
+            seed_users(args.users)
+            seed_challenges(args.challenges)
+        finally:
+            disconnect_bench_db()
+
+    print(f"\nSeconds from process start to first 200 ({args.users} users)")
+    print(f"  {'WARM_UP':<12}{'/health':>10}{'/ready':>10}{'leaderboard':>13}{'challenges':>12}")
+    for mode in ('blocking', 'background', 'lazy'):
+        result = time_to_first_response(mode, args.port, args.timeout)
+        cells = ''.join(
+            f"{value:>{width}.2f}" if value is not None else f"{'-':>{width}}"
+            for value, width in zip(result.values(), (10, 10, 13, 12))
+        )
+        print(f"  {mode:<12}{cells}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Windowed leaderboards from rollups vs. aggregating the event log on demand.
+
+Loads `--events` synthetic completions (default 50M) spread over the last
+four weeks into the benchmark database, rebuilds the day/week rollups from
+them, then times:
+  - GET /api/leaderboard?window=day|week (first page and a deep page)
+  - the same weekly top 100 computed on demand from the events
+  - recording one completion (event + rollup increments) on the write path
+
+Usage: python -m benchmarks.windowed_leaderboard [--events 50000000] [--users 1000000]
+"""
+
+import argparse
+import multiprocessing
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+from pymongo import MongoClient
+
+from app import app
+from benchmarks.common import (
+    BENCH_MONGODB_URI, connect_bench_db, disconnect_bench_db, summarize, time_calls
+)
+from models.completion import Completion
+from models.score_rollup import ScoreRollup
+from seed_data import challenge_id, challenge_points, user_id
+from services.rollups import rebuild_rollups, record_completions
+
+SPAN_DAYS = 28
+
+_events = None
+
+
+def _init_worker(uri):
+    global _events
+    _events = MongoClient(uri).get_default_database('reactivate_bench')[Completion._meta['collection']]
+
+
+def _insert_events(task):
+    start, stop, users, challenges, now = task
+    rng = random.Random(start)
+    docs = []
+    for i in range(start, stop):
+        user, nth = i % users, i // users
+        challenge = (user + nth) % challenges
+        docs.append({
+            'userId': user_id(user),
+            'challenge_id': challenge_id(challenge),
+            'score': challenge_points(challenge),
+            'completedAt': now - timedelta(seconds=rng.random() * SPAN_DAYS * 86400)
+        })
+    _events.insert_many(docs, ordered=False)
+    return len(docs)
+
+
+def load_events(events, users, challenges, workers, batch_size=10000):
+    with MongoClient(BENCH_MONGODB_URI) as client:
+        db = client.get_default_database('reactivate_bench')
+        db[Completion._meta['collection']].drop()
+        db[ScoreRollup._meta['collection']].drop()
+
+    now = datetime.now(timezone.utc)
+    tasks = [(start, min(start + batch_size, events), users, challenges, now)
+             for start in range(0, events, batch_size)]
+    started = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(BENCH_MONGODB_URI,)) as pool:
+        loaded = sum(pool.imap_unordered(_insert_events, tasks))
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {loaded} events in {elapsed:.0f}s ({loaded / elapsed:,.0f} rows/s)")
+
+
+def on_demand_week(now):
+    """Weekly top 100 straight from the event log, the approach rollups replace"""
+    week_start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return list(Completion._get_collection().aggregate([
+        {'$match': {'completedAt': {'$gte': week_start}}},
+        {'$group': {'_id': '$userId', 'score': {'$sum': '$score'}}},
+        {'$sort': {'score': -1, '_id': 1}},
+        {'$limit': 100}
+    ], allowDiskUse=True))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--events', type=int, default=50000000)
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--challenges', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--skip-load', action='store_true', help='reuse the existing events and rollups')
+    args = parser.parse_args()
+    if args.events > args.users * args.challenges:
+        parser.error('--events cannot exceed users * challenges')
+
+    # Workers fork before this process opens its own client
+    if not args.skip_load:
+        load_events(args.events, args.users, args.challenges, args.workers)
+
+    connect_bench_db()
+    try:
+        if not args.skip_load:
+            started = time.perf_counter()
+            Completion.ensure_indexes()
+            print(f"Built event indexes in {time.perf_counter() - started:.0f}s")
+            started = time.perf_counter()
+            rebuild_rollups()
+            print(f"Rebuilt rollups in {time.perf_counter() - started:.0f}s")
+
+        client = app.test_client()
+        print(f"\n{Completion.objects.count()} events, {ScoreRollup.objects.count()} rollups")
+        print(f"  {'query':<34}{'p50 ms':>10}{'p99 ms':>10}")
+        for window in ('day', 'week'):
+            url = f'/api/leaderboard?window={window}&limit=100'
+            first = client.get(url)
+            stats = summarize(time_calls(lambda: client.get(url), args.repeat))
+            print(f"  {'rollup ' + window + ' top 100':<34}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+            # Ten pages in, following cursors
+            deep = url
+            for _ in range(10):
+                cursor = first.headers.get('X-Next-Cursor')
+                if cursor is None:
+                    break
+                deep = f'{url}&cursor={cursor}'
+                first = client.get(deep)
+            stats = summarize(time_calls(lambda: client.get(deep), args.repeat))
+            print(f"  {'rollup ' + window + ' page 11':<34}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+        now = datetime.now(timezone.utc)
+        stats = summarize(time_calls(lambda: on_demand_week(now), 3))
+        print(f"  {'on-demand week top 100':<34}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+
+        counter = iter(range(10 ** 9))
+        stats = summarize(time_calls(
+            lambda: record_completions([(f'bench_writer_{next(counter)}', 'challenge_00000', 10)]),
+            args.repeat
+        ))
+        print(f"  {'record one completion':<34}{stats['p50_ms']:>10.2f}{stats['p99_ms']:>10.2f}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Contest burst: direct completions vs. the write-behind buffer.
+
+Sends `--completions` completions concentrated on `--hot-users` users from
+`--threads` concurrent clients, once with every completion written to the
+user document in the request and once with WRITE_BEHIND=True. Reports
+sustained completions/sec (including the final flush) and user document
+writes per completion (write amplification).
+
+Usage: python -m benchmarks.write_behind [--completions 50000] [--hot-users 300] [--threads 32]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app import app
+from benchmarks.common import (
+    connect_bench_db, disconnect_bench_db, seed_challenges, seed_users
+)
+from models.completion import Completion
+from seed_data import challenge_id, user_id
+from services.challenge_catalog import get_challenge_catalog
+from services.write_behind import get_write_behind_buffer
+
+
+def run_burst(completions, hot_users, threads):
+    """Send the burst; returns (elapsed seconds, 503 responses retried)"""
+    def send(worker):
+        client = app.test_client()
+        retried = 0
+        for i in range(worker, completions, threads):
+            url = f'/api/challenges/{challenge_id(i // hot_users)}/complete'
+            body = {'userId': user_id(i % hot_users), 'score': 10}
+            while client.post(url, json=body).status_code == 503:
+                retried += 1
+                time.sleep(0.01)
+        return retried
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        retried = sum(executor.map(send, range(threads)))
+    return time.perf_counter() - started, retried
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--completions', type=int, default=50000)
+    parser.add_argument('--hot-users', type=int, default=300)
+    parser.add_argument('--threads', type=int, default=32)
+    parser.add_argument('--storage', choices=['embedded', 'collection'], default='collection')
+    args = parser.parse_args()
+
+    os.environ['COMPLETIONS_STORAGE'] = args.storage
+    connect_bench_db()
+    try:
+        seed_challenges(args.completions // args.hot_users + 1)
+        get_challenge_catalog().load()
+
+        print(f"\n{args.completions} completions on {args.hot_users} users, {args.threads} threads")
+        print(f"  {'mode':<14}{'completions/s':>15}{'user writes':>13}{'writes/compl.':>15}{'503s':>8}")
+        for mode in ('direct', 'write-behind'):
+            seed_users(args.hot_users)
+            Completion._get_collection().delete_many({})
+            os.environ['WRITE_BEHIND'] = str(mode == 'write-behind')
+
+            if mode == 'direct':
+                elapsed, retried = run_burst(args.completions, args.hot_users, args.threads)
+                writes = args.completions
+            else:
+                buffer = get_write_behind_buffer()
+                buffer.start()
+                elapsed, retried = run_burst(args.completions, args.hot_users, args.threads)
+                started = time.perf_counter()
+                buffer.stop()
+                elapsed += time.perf_counter() - started
+                writes = buffer.stats()['userWrites']
+            print(f"  {mode:<14}{args.completions / elapsed:>15.0f}{writes:>13}"
+                  f"{writes / args.completions:>15.3f}{retried:>8}")
+    finally:
+        disconnect_bench_db()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Shared MongoDB connection for the API, scripts and tools.
+
+Every entry point (app.py, run.py, seed_data.py, test_connection.py)
+connects through here so the URI, pool size and timeouts are read from the
+environment in one place. Nothing connects at import time: the API
+connects on its first request, or when a server hook calls connect_db()
+after forking, and connect_db() is idempotent and thread-safe.
+
+MongoClient is not fork-safe, so connect in each worker after the fork,
+never in a pre-forking master.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from mongoengine import connect, disconnect
+from mongoengine.connection import get_db
+
+DEFAULT_URI = 'mongodb://localhost:27017/reactivate'
+
+_connected = False
+_connect_lock = threading.Lock()
+
+
+def mongodb_uri():
+    return os.getenv('MONGODB_URI', DEFAULT_URI)
+
+
+def pool_options():
+    """MongoClient pool and timeout settings from the environment"""
+    options = {
+        'maxPoolSize': int(os.getenv('MONGODB_MAX_POOL_SIZE', '100')),
+        'minPoolSize': int(os.getenv('MONGODB_MIN_POOL_SIZE', '0')),
+        'connectTimeoutMS': int(os.getenv('MONGODB_CONNECT_TIMEOUT_MS', '20000')),
+        'serverSelectionTimeoutMS': int(os.getenv('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '30000'))
+    }
+    for name, variable in (('socketTimeoutMS', 'MONGODB_SOCKET_TIMEOUT_MS'),
+                           ('waitQueueTimeoutMS', 'MONGODB_WAIT_QUEUE_TIMEOUT_MS')):
+        if os.getenv(variable):
+            options[name] = int(os.getenv(variable))
+    return options
+
+
+def connect_db(uri=None):
+    """Connect MongoEngine to `uri` (default: MONGODB_URI) unless already connected
+
+    Returns True when connected.
+    """
+    global _connected
+    if _connected:
+        return True
+    with _connect_lock:
+        if not _connected:
+            try:
+                connect(host=uri or mongodb_uri(), **pool_options())
+                _connected = True
+                print("Connected to MongoDB successfully!")
+            except Exception as e:
+                print(f"Error connecting to MongoDB: {e}")
+    return _connected
+
+
+def disconnect_db():
+    """Disconnect from MongoDB"""
+    global _connected
+    with _connect_lock:
+        try:
+            disconnect()
+            _connected = False
+            print("Disconnected from MongoDB")
+        except Exception as e:
+            print(f"Error disconnecting from MongoDB: {e}")
+
+
+def is_connected():
+    return _connected
+
+
+def ping():
+    """Round trip to the server; raises if it cannot be reached"""
+    get_db().command('ping')
+
+
+def warm_pool(connections):
+    """Open up to `connections` pooled sockets up front with concurrent pings"""
+    with ThreadPoolExecutor(max_workers=connections) as executor:
+        list(executor.map(lambda _: ping(), range(connections)))
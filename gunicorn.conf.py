@@ -0,0 +1,76 @@
+"""
+Gunicorn configuration for running the Flask app in production.
+
+    gunicorn -c gunicorn.conf.py app:app    (or: python run.py --server gunicorn)
+
+The app is imported once in the master and forked into WEB_CONCURRENCY
+workers. Creating the app does not connect, and MongoDB clients are not
+fork-safe, so each worker connects after the fork, warms its connection
+pool and then warms its in-memory caches according to WARM_UP (blocking
+by default: the worker only accepts requests once they are built). On
+SIGTERM workers stop accepting, finish their in-flight requests within
+GRACEFUL_TIMEOUT seconds, stop background jobs and close their
+connection.
+
+Ranks: the in-memory rank index (RANK_MODE=index) only sees the writes of
+its own process, so with more than one worker each would report different
+ranks. RANK_MODE is therefore forced to 'background' whenever workers > 1,
+and every worker serves the ranks stored by the rank materializer.
+
+Profiles: likewise, without PROFILE_CACHE_REDIS_URL a worker's profile
+cache never hears about another worker's writes and could serve a user the
+score from before their own completion. With workers > 1 the profile cache
+is therefore turned off unless the shared Redis tier is configured.
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('API_HOST', '0.0.0.0')}:{os.getenv('API_PORT', '5000').strip()}"
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# Set before the app is loaded and forked, so every worker inherits it
+rank_mode_forced = workers > 1 and os.getenv('RANK_MODE', 'index').lower() != 'background'
+if rank_mode_forced:
+    os.environ['RANK_MODE'] = 'background'
+profile_cache_disabled = (workers > 1 and os.getenv('PROFILE_CACHE', 'False').lower() == 'true'
+                          and not os.getenv('PROFILE_CACHE_REDIS_URL'))
+if profile_cache_disabled:
+    os.environ['PROFILE_CACHE'] = 'False'
+backlog = int(os.getenv('GUNICORN_BACKLOG', '2048'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GRACEFUL_TIMEOUT', '30'))
+preload_app = True
+accesslog = os.getenv('GUNICORN_ACCESS_LOG') or None
+
+
+def on_starting(server):
+    if rank_mode_forced:
+        server.log.warning("RANK_MODE=index needs a single worker; using RANK_MODE=background "
+                           "for %s workers", workers)
+    if profile_cache_disabled:
+        server.log.warning("PROFILE_CACHE needs PROFILE_CACHE_REDIS_URL with more than one worker; "
+                           "profile cache disabled for %s workers", workers)
+
+
+def post_fork(server, worker):
+    from app import app, connect_db, start_warm_up
+    from db import warm_pool
+
+    connect_db(app.config['MONGODB_URI'])
+    warm_pool(int(os.getenv('MONGODB_WARM_CONNECTIONS', str(threads))))
+    start_warm_up(app)
+    server.log.info("Worker %s ready", worker.pid)
+
+
+def worker_exit(server, worker):
+    from app import shut_down
+
+    shut_down()
@@ -1,4 +1,4 @@
-from mongoengine import Document, StringField, ListField, DictField
+from mongoengine import Document, StringField, IntField, ListField, DictField, ObjectIdField
 
 class Challenge(Document):
     """
@@ -9,10 +9,18 @@ class Challenge(Document):
     description = StringField(required=True)
     difficulty = StringField(required=True, choices=['easy', 'medium', 'hard'])
     starterCode = StringField(required=True)
-    testCases = ListField(DictField(), required=True)
+    # Empty when the set is too large to keep inline; see services/test_cases.py
+    testCases = ListField(DictField())
+    testCasesFile = ObjectIdField()
+    testCaseCount = IntField(min_value=0)
+    # Stable position of the challenge in completed-challenge bitmaps
+    ordinal = IntField(min_value=0)
     
     meta = {
-        'collection': 'challenges'
+        'collection': 'challenges',
+        'indexes': [
+            {'fields': ['ordinal'], 'unique': True, 'sparse': True}
+        ]
     }
     
     def to_dict(self):
@@ -23,7 +31,9 @@ class Challenge(Document):
             'description': self.description,
             'difficulty': self.difficulty,
             'starterCode': self.starterCode,
-            'testCases': self.testCases
+            'testCases': self.testCases,
+            'testCaseCount': self.testCaseCount if self.testCaseCount is not None else len(self.testCases),
+            'ordinal': self.ordinal
         }
     
     def to_dict_public(self):
@@ -33,7 +43,8 @@ class Challenge(Document):
             'title': self.title,
             'description': self.description,
             'difficulty': self.difficulty,
-            'starterCode': self.starterCode
+            'starterCode': self.starterCode,
+            'ordinal': self.ordinal
         }
     
     def __str__(self):
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+
+from mongoengine import Document, StringField, IntField, DateTimeField, BooleanField
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+class Completion(Document):
+    """
+    Append-only log of challenge completions
+    """
+    userId = StringField(required=True, max_length=100)
+    challenge_id = StringField(required=True, max_length=100)
+    score = IntField(required=True, min_value=0)
+    completedAt = DateTimeField(required=True, default=utc_now)
+    # Write-behind bookkeeping: unset for completions applied in the request
+    applied = BooleanField()
+    flushId = StringField()
+    # Write-behind buffer that logged the completion (see services.write_behind)
+    owner = StringField()
+    
+    meta = {
+        'collection': 'completions',
+        'indexes': [
+            # A user completes each challenge once
+            {'fields': ['userId', 'challenge_id'], 'unique': True},
+            # Rollup rebuilds scan a time range
+            {'fields': ['completedAt']},
+            # Write-behind flushes and crash replay look up unapplied completions
+            {'fields': ['flushId', 'completedAt'], 'partialFilterExpression': {'applied': False}}
+        ]
+    }
+    
+    def to_dict(self):
+        """Convert completion object to dictionary"""
+        return {
+            'userId': self.userId,
+            'challenge_id': self.challenge_id,
+            'score': self.score,
+            'completedAt': self.completedAt.isoformat()
+        }
+    
+    def __str__(self):
+        return f"Completion(userId={self.userId}, challenge_id={self.challenge_id}, score={self.score})"
@@ -0,0 +1,31 @@
+from mongoengine import Document, StringField, IntField
+
+class ScoreRollup(Document):
+    """
+    Score a user earned within one time bucket (a day or an ISO week)
+    """
+    window = StringField(required=True, choices=['day', 'week'])
+    bucket = StringField(required=True, max_length=20)
+    userId = StringField(required=True, max_length=100)
+    score = IntField(default=0, min_value=0)
+    
+    meta = {
+        'collection': 'score_rollups',
+        'indexes': [
+            {'fields': ['window', 'bucket', 'userId'], 'unique': True},
+            # Windowed leaderboard order: highest score first, ties by userId
+            {'fields': ['window', 'bucket', '-score', 'userId']}
+        ]
+    }
+    
+    def to_dict(self):
+        """Convert rollup object to dictionary"""
+        return {
+            'window': self.window,
+            'bucket': self.bucket,
+            'userId': self.userId,
+            'score': self.score
+        }
+    
+    def __str__(self):
+        return f"ScoreRollup(window={self.window}, bucket={self.bucket}, userId={self.userId}, score={self.score})"
@@ -8,9 +8,17 @@ class User(Document):
     score = IntField(default=0, min_value=0)
     rank = IntField(default=0, min_value=0)
     completedChallenges = ListField(StringField(), default=[])
+    completedCount = IntField(default=0, min_value=0)
+    # Write-behind flushes applied to this user but not yet marked applied
+    # on their events (makes replays idempotent)
+    appliedFlushIds = ListField(StringField())
     
     meta = {
-        'collection': 'users'
+        'collection': 'users',
+        'indexes': [
+            # Leaderboard order: highest score first, ties by userId
+            {'fields': ['-score', 'userId']}
+        ]
     }
     
     def to_dict(self):
@@ -19,7 +27,8 @@ class User(Document):
             'userId': self.userId,
             'score': self.score,
             'rank': self.rank,
-            'completedChallenges': self.completedChallenges
+            'completedChallenges': self.completedChallenges,
+            'completedCount': self.completedCount
         }
     
     def __str__(self):
@@ -1,13 +1,37 @@
 #!/usr/bin/env python3
 """
 Simple script to run the Flask application
+
+Pass --server async (or set SERVER_MODE=async) to run the async variant in
+asgi_app.py on uvicorn instead, or --server gunicorn for the production
+multi-process setup in gunicorn.conf.py.
 """
 
-from app import app, connect_db
+import argparse
+import os
+import sys
+
+from dotenv import load_dotenv
+
+load_dotenv()
 
 if __name__ == '__main__':
-    # Connect to database
-    connect_db()
-    
-    # Run the app
-    app.run(host='0.0.0.0', port=5000, debug=True) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description='Run the Reactivate API')
+    parser.add_argument('--server', choices=['flask', 'async', 'gunicorn'],
+                        default=os.getenv('SERVER_MODE', 'flask'))
+    args = parser.parse_args()
+
+    if args.server == 'gunicorn':
+        os.execvp(sys.executable, [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app'])
+    elif args.server == 'async':
+        import uvicorn
+
+        uvicorn.run('asgi_app:app', host='0.0.0.0', port=5000, backlog=4096)
+    else:
+        from app import app, start_warm_up
+
+        # Connects to the database and builds the in-memory caches per WARM_UP
+        start_warm_up(app)
+
+        # Run the app
+        app.run(host='0.0.0.0', port=5000, debug=os.getenv('FLASK_DEBUG', 'False').lower() == 'true')
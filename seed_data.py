@@ -1,31 +1,46 @@
 #!/usr/bin/env python3
 """
 Script to seed the database with sample data for testing
+
+Run without arguments to load the hand-written sample data. Pass --users
+to generate synthetic data at production scale instead, e.g.:
+
+    python seed_data.py --users 5000000 --challenges 2000 --completion-density 0.1
+
+Generated data is deterministic for a given --seed regardless of the number
+of worker processes.
 """
 
+import argparse
+import multiprocessing
 import os
-from mongoengine import connect, disconnect
+import random
+import time
+from mongoengine.connection import get_db
+from pymongo import MongoClient
+from db import connect_db, disconnect_db, mongodb_uri
 from models.user import User
 from models.challenge import Challenge
+from models.completion import Completion
+from models.score_rollup import ScoreRollup
+from services.completion_store import backfill_completions, collection_storage
+from services.test_cases import BUCKET_NAME as TEST_CASES_BUCKET
+from services.versions import bump_version
 
-# Set default MongoDB URI if not provided
-MONGODB_URI = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/reactivate')
+def clear_completion_data(db):
+    """Drop the completion log, score rollups and offloaded test cases of the old data"""
+    for name in (Completion._meta['collection'], ScoreRollup._meta['collection'],
+                 f'{TEST_CASES_BUCKET}.files', f'{TEST_CASES_BUCKET}.chunks'):
+        db.drop_collection(name)
 
-def connect_db():
-    """Connect to MongoDB"""
-    try:
-        connect(host=MONGODB_URI)
-        print("Connected to MongoDB successfully!")
-    except Exception as e:
-        print(f"Error connecting to MongoDB: {e}")
-
-def disconnect_db():
-    """Disconnect from MongoDB"""
-    try:
-        disconnect()
-        print("Disconnected from MongoDB")
-    except Exception as e:
-        print(f"Error disconnecting from MongoDB: {e}")
+def log_seeded_completions():
+    """Recreate the completion indexes and, with collection storage, log the seeded completions"""
+    Completion.ensure_indexes()
+    ScoreRollup.ensure_indexes()
+    if collection_storage():
+        # Keeps ?completed=full in line with completedCount
+        backfill_completions()
+        print("Copied the seeded completions into the completions collection")
 
 def seed_challenges():
     """Seed the database with sample challenges"""
@@ -134,8 +149,8 @@ def seed_challenges():
     Challenge.objects.delete()
     
     # Create new challenges
-    for challenge_data in challenges_data:
-        challenge = Challenge(**challenge_data)
+    for ordinal, challenge_data in enumerate(challenges_data):
+        challenge = Challenge(ordinal=ordinal, **challenge_data)
         challenge.save()
         print(f"Created challenge: {challenge.title}")
     
@@ -159,25 +174,165 @@ def seed_users():
     
     # Create new users
     for user_data in users_data:
-        user = User(**user_data)
+        user = User(completedCount=len(user_data['completedChallenges']), **user_data)
         user.save()
         print(f"Created user: {user.userId} with score {user.score}")
     
     print(f"Created {len(users_data)} users")
 
+# Synthetic data generator
+DIFFICULTY_POINTS = (('easy', 10), ('medium', 25), ('hard', 50))
+
+def challenge_id(index):
+    """Stable id of the nth synthetic challenge"""
+    return f'challenge_{index:05d}'
+
+def user_id(index):
+    """Stable id of the nth synthetic user"""
+    return f'user_{index:08d}'
+
+def challenge_points(index):
+    """Points awarded for the nth synthetic challenge"""
+    return DIFFICULTY_POINTS[index % len(DIFFICULTY_POINTS)][1]
+
+def generate_challenges(collection, count):
+    """Insert `count` synthetic challenges"""
+    docs = []
+    for i in range(count):
+        difficulty = DIFFICULTY_POINTS[i % len(DIFFICULTY_POINTS)][0]
+        docs.append({
+            'challenge_id': challenge_id(i),
+            'title': f'Challenge {i}',
+            'description': f'Synthetic {difficulty} challenge number {i}',
+            'difficulty': difficulty,
+            'ordinal': i,
+            'starterCode': 'def solve():\n    # Your code here\n    pass',
+            'testCases': [{'input': {'n': i}, 'expectedOutput': i, 'description': 'Synthetic test'}]
+        })
+    for start in range(0, count, 10000):
+        collection.insert_many(docs[start:start + 10000], ordered=False)
+
+def generate_user_batch(start, stop, challenges, density, seed):
+    """Build users [start, stop); each batch has its own seeded RNG"""
+    rng = random.Random(seed * 1000003 + start)
+    mean = density * challenges
+    docs = []
+    for i in range(start, stop):
+        # Exponential completion counts: most users did a little, a few did a lot
+        count = min(challenges, int(rng.expovariate(1 / mean))) if mean > 0 else 0
+        completed = sorted(rng.sample(range(challenges), count))
+        docs.append({
+            'userId': user_id(i),
+            'score': sum(challenge_points(c) for c in completed),
+            'rank': 0,
+            'completedChallenges': [challenge_id(c) for c in completed],
+            'completedCount': count
+        })
+    return docs
+
+_worker_collection = None
+
+def _init_worker(uri):
+    global _worker_collection
+    _worker_collection = MongoClient(uri).get_default_database('reactivate')[User._meta['collection']]
+
+def _insert_user_batch(task):
+    start, stop, challenges, density, seed = task
+    docs = generate_user_batch(start, stop, challenges, density, seed)
+    _worker_collection.insert_many(docs, ordered=False)
+    return len(docs)
+
+def generate_users(uri, users, challenges, density, seed=42, workers=None, batch_size=10000):
+    """Insert `users` synthetic users from parallel worker processes; returns rows/sec"""
+    tasks = [
+        (start, min(start + batch_size, users), challenges, density, seed)
+        for start in range(0, users, batch_size)
+    ]
+    workers = workers or os.cpu_count() or 1
+    inserted = 0
+    started = time.perf_counter()
+    with multiprocessing.Pool(workers, initializer=_init_worker, initargs=(uri,)) as pool:
+        for count in pool.imap_unordered(_insert_user_batch, tasks):
+            inserted += count
+            if inserted % (batch_size * 50) < batch_size:
+                elapsed = time.perf_counter() - started
+                print(f"  {inserted}/{users} users ({inserted / elapsed:,.0f} rows/s)")
+    elapsed = time.perf_counter() - started
+    return inserted / elapsed if elapsed else 0.0
+
+def generate(uri, users, challenges, density, seed=42, workers=None, batch_size=10000):
+    """Replace users, challenges and their completion data with synthetic data
+
+    Indexes are built after the load.
+    """
+    # Closed before the workers fork; each worker opens its own client
+    with MongoClient(uri) as client:
+        db = client.get_default_database('reactivate')
+
+        # Dropping also drops the indexes, so the bulk load does not maintain them
+        db[User._meta['collection']].drop()
+        db[Challenge._meta['collection']].drop()
+        clear_completion_data(db)
+
+        started = time.perf_counter()
+        generate_challenges(db[Challenge._meta['collection']], challenges)
+        print(f"Created {challenges} challenges in {time.perf_counter() - started:.1f}s")
+
+    print(f"Generating {users} users with {workers or os.cpu_count()} workers...")
+    rate = generate_users(uri, users, challenges, density, seed, workers, batch_size)
+    print(f"Created {users} users ({rate:,.0f} rows/s)")
+
+    started = time.perf_counter()
+    connect_db(uri)
+    try:
+        User.ensure_indexes()
+        Challenge.ensure_indexes()
+        print(f"Built indexes in {time.perf_counter() - started:.1f}s")
+        log_seeded_completions()
+
+        # Running servers must drop their cached copies of the old data
+        bump_version('leaderboard')
+        bump_version('challenges')
+    finally:
+        disconnect_db()
+
 def main():
     """Main function to seed the database"""
+    parser = argparse.ArgumentParser(description='Seed the Reactivate database')
+    parser.add_argument('--users', type=int, help='generate this many synthetic users')
+    parser.add_argument('--challenges', type=int, default=200)
+    parser.add_argument('--completion-density', type=float, default=0.1,
+                        help='average fraction of challenges each user has completed')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--batch-size', type=int, default=10000)
+    args = parser.parse_args()
+    
+    if args.users is not None:
+        print("Starting synthetic data generation...")
+        generate(mongodb_uri(), args.users, args.challenges, args.completion_density,
+                 args.seed, args.workers, args.batch_size)
+        return
+    
     print("Starting database seeding...")
     
     # Connect to database
     connect_db()
     
     try:
+        # Completions and rollups of the previous users would outlive them
+        clear_completion_data(get_db())
+        
         # Seed challenges
         seed_challenges()
         
         # Seed users
         seed_users()
+        log_seeded_completions()
+        
+        # Invalidate caches held by running API processes
+        bump_version('leaderboard')
+        bump_version('challenges')
         
         print("Database seeding completed successfully!")
         
@@ -0,0 +1,219 @@
+"""
+Admission control for the Flask routes.
+
+With ADMISSION_CONTROL=True every request is classified by endpoint into a
+priority class and must take a slot before it runs:
+
+  critical  health, readiness, metrics and stats: never queued or shed
+  read      profile, challenge and leaderboard reads
+  write     user creation and completions: shed first
+
+Each route may run at most ADMISSION_ROUTE_CONCURRENCY requests at once and
+queue up to ADMISSION_QUEUE_SIZE more. On top of that, all routes share
+ADMISSION_MAX_IN_FLIGHT slots, of which writes may only use the first
+ADMISSION_WRITE_SHARE; once the process is that busy, reads keep flowing
+while new writes queue and are the first to time out.
+
+Every admitted request gets a deadline (ADMISSION_READ_BUDGET_MS or
+ADMISSION_WRITE_BUDGET_MS from arrival). A request that cannot start before
+its deadline is rejected with 503 and Retry-After instead of waiting; one
+whose estimated queue wait (the route's recent service time times its
+queue position) already exceeds the budget is rejected on arrival. Time
+spent queued comes out of the budget, and the remainder bounds every
+MongoDB operation of the request through pymongo.timeout(), which sets
+maxTimeMS on the server and limits pool checkout and server selection.
+"""
+
+import math
+import os
+import threading
+import time
+
+CRITICAL = 'critical'
+READ = 'read'
+WRITE = 'write'
+
+# By Flask endpoint (blueprint.view function)
+ROUTE_PRIORITIES = {
+    'api.health_check': CRITICAL,
+    'api.get_metrics_text': CRITICAL,
+    'api.get_stats': CRITICAL,
+    'api.ready_check': CRITICAL,
+    'api.get_user': READ,
+    'api.get_challenges': READ,
+    'api.get_challenge': READ,
+    'api.get_challenge_tests': READ,
+    'api.get_leaderboard': READ,
+    'api.get_leaderboard_around': READ,
+    'api.get_leaderboard_export': READ,
+    'api.create_user': WRITE,
+    'api.create_users_batch': WRITE,
+    'api.complete_challenge': WRITE,
+    'api.complete_challenges_batch': WRITE,
+}
+
+# Weight of the newest sample in a route's average service time
+SERVICE_TIME_WEIGHT = 0.2
+
+
+class Overloaded(Exception):
+    """Raised when a request is shed; retry_after is in whole seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Server overloaded, retry in {retry_after}s')
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """An admitted request"""
+
+    __slots__ = ('route', 'deadline', 'started')
+
+    def __init__(self, route, deadline, started):
+        self.route = route
+        self.deadline = deadline
+        self.started = started
+
+    def remaining(self):
+        """Seconds left in the request budget (never negative)"""
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def expired(self):
+        return time.monotonic() >= self.deadline
+
+
+class _Route:
+    __slots__ = ('name', 'priority', 'in_flight', 'waiting', 'service_time',
+                 'admitted', 'rejected', 'expired')
+
+    def __init__(self, name, priority):
+        self.name = name
+        self.priority = priority
+        self.in_flight = 0
+        self.waiting = 0
+        self.service_time = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+
+class AdmissionController:
+    """
+    Per-route concurrency limits and queues with deadline-based shedding
+    """
+
+    def __init__(self, enabled=True, max_in_flight=64, route_concurrency=32, queue_size=64,
+                 write_share=0.5, read_budget=1.0, write_budget=2.0):
+        self.enabled = enabled
+        self.max_in_flight = max_in_flight
+        self.route_concurrency = route_concurrency
+        self.queue_size = queue_size
+        self.limits = {READ: max_in_flight, WRITE: max(1, int(max_in_flight * write_share))}
+        self.budgets = {READ: read_budget, WRITE: write_budget}
+        self._cond = threading.Condition()
+        self._routes = {}
+        self.in_flight = 0
+
+    def _route(self, endpoint):
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = self._routes[endpoint] = _Route(endpoint, ROUTE_PRIORITIES.get(endpoint, READ))
+        return route
+
+    def _can_start(self, route):
+        return (route.in_flight < self.route_concurrency
+                and self.in_flight < self.limits[route.priority])
+
+    def _reject(self, route, wait):
+        route.rejected += 1
+        raise Overloaded(max(1, math.ceil(wait)))
+
+    def admit(self, endpoint, arrived=None):
+        """Take a slot for a request to `endpoint`
+
+        Returns a Ticket, or None for critical and unknown endpoints, which
+        are not limited. Raises Overloaded when the request is shed.
+        """
+        if endpoint is None or ROUTE_PRIORITIES.get(endpoint) == CRITICAL:
+            return None
+        now = time.monotonic()
+        with self._cond:
+            route = self._route(endpoint)
+            deadline = (arrived or now) + self.budgets[route.priority]
+            if not route.waiting and self._can_start(route):
+                return self._start(route, deadline, now)
+
+            # Queue wait if the route drains at its recent pace
+            wait = route.service_time * (route.waiting + 1) / self.route_concurrency
+            if route.waiting >= self.queue_size or now + wait > deadline:
+                self._reject(route, wait)
+            route.waiting += 1
+            try:
+                while not self._can_start(route):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        route.expired += 1
+                        self._reject(route, route.service_time)
+                    self._cond.wait(remaining)
+            finally:
+                route.waiting -= 1
+            return self._start(route, deadline, time.monotonic())
+
+    def _start(self, route, deadline, now):
+        route.in_flight += 1
+        route.admitted += 1
+        self.in_flight += 1
+        return Ticket(route, deadline, now)
+
+    def release(self, ticket):
+        """Give back the slot of a finished request"""
+        elapsed = time.monotonic() - ticket.started
+        with self._cond:
+            route = ticket.route
+            route.in_flight -= 1
+            self.in_flight -= 1
+            route.service_time += SERVICE_TIME_WEIGHT * (elapsed - route.service_time)
+            self._cond.notify_all()
+
+    def stats(self):
+        """Return current load and admitted/rejected counts per route"""
+        with self._cond:
+            return {
+                'enabled': self.enabled,
+                'inFlight': self.in_flight,
+                'maxInFlight': self.max_in_flight,
+                'routes': {
+                    route.name: {
+                        'priority': route.priority,
+                        'inFlight': route.in_flight,
+                        'queued': route.waiting,
+                        'admitted': route.admitted,
+                        'rejected': route.rejected,
+                        'expiredInQueue': route.expired,
+                        'serviceTimeMs': round(route.service_time * 1000, 3)
+                    }
+                    for route in self._routes.values()
+                }
+            }
+
+
+_controller = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller():
+    """Return the shared admission controller"""
+    global _controller
+    if _controller is None:
+        with _controller_lock:
+            if _controller is None:
+                _controller = AdmissionController(
+                    enabled=os.getenv('ADMISSION_CONTROL', 'False').lower() == 'true',
+                    max_in_flight=int(os.getenv('ADMISSION_MAX_IN_FLIGHT', '64')),
+                    route_concurrency=int(os.getenv('ADMISSION_ROUTE_CONCURRENCY', '32')),
+                    queue_size=int(os.getenv('ADMISSION_QUEUE_SIZE', '64')),
+                    write_share=float(os.getenv('ADMISSION_WRITE_SHARE', '0.5')),
+                    read_budget=float(os.getenv('ADMISSION_READ_BUDGET_MS', '1000')) / 1000,
+                    write_budget=float(os.getenv('ADMISSION_WRITE_BUDGET_MS', '2000')) / 1000
+                )
+    return _controller
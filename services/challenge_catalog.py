@@ -0,0 +1,243 @@
+"""
+Process-local challenge catalog.
+
+The challenge set is small and changes rarely, so every challenge is loaded
+once and kept as ready-to-send JSON bytes: the public list body served by
+GET /api/challenges and one full body per challenge for
+GET /api/challenges/<id>. Bodies can optionally be kept gzip-compressed too.
+
+Filtered reads use in-memory indexes built at load time: the listing per
+difficulty and a dict by id. Bodies of filtered or sparse full lists
+(?difficulty=, ?fields=) are serialized on first use and cached until the
+next reload; there are at most a few dozen such combinations.
+
+Test-case sets offloaded to GridFS (services/test_cases.py) are not part
+of the full bodies: for those challenges the catalog keeps the file id and
+the body's other fields as an open JSON prefix, and the route streams the
+test cases after it.
+
+The catalog re-checks the shared 'challenges' version counter every
+`check_interval` seconds and reloads when it has been bumped, so reads are
+served without querying MongoDB in between.
+"""
+
+import gzip
+import json
+import os
+import threading
+import time
+from bisect import bisect_right
+from collections import namedtuple
+
+from services.fieldsets import select_fields
+from services.serialization import dumps
+from services.versions import get_version
+
+VERSION_KEY = 'challenges'
+
+DIFFICULTIES = ('easy', 'medium', 'hard')
+# Fields of the public listing, in response order
+PUBLIC_FIELDS = ('id', 'title', 'description', 'difficulty', 'starterCode', 'ordinal')
+# Fields of a single challenge
+CHALLENGE_FIELDS = PUBLIC_FIELDS + ('testCases', 'testCaseCount')
+
+CatalogEntry = namedtuple('CatalogEntry', ['body', 'gzipped'])
+
+
+class ChallengeCatalog:
+    """
+    In-memory, pre-serialized copy of the challenges collection
+    """
+
+    def __init__(self, compress=False, check_interval=30.0, auto_refresh=True):
+        self.compress = compress
+        self.check_interval = check_interval
+        # Callers without a MongoEngine connection refresh through populate()
+        self.auto_refresh = auto_refresh
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._list_entry = None
+        # Sorted challenge ids and their public dicts, swapped together
+        self._listing = ([], [])
+        # The same per difficulty, and public dicts by id
+        self._by_difficulty = {}
+        self._public_by_id = {}
+        # Serialized filtered lists by (difficulty, fields)
+        self._selections = {}
+        self._ordinals = {}
+        # (GridFS file id, body prefix) of offloaded test-case sets by challenge id
+        self._test_files = {}
+        self._version = None
+        self._checked_at = 0.0
+        self.reloads = 0
+
+    def _entry(self, obj):
+        body = dumps(obj)
+        return CatalogEntry(body, gzip.compress(body) if self.compress else None)
+
+    def load(self):
+        """Reload every challenge from the challenges collection"""
+        from models.challenge import Challenge
+
+        # Read the version first so a concurrent bump triggers another reload
+        version = get_version(VERSION_KEY)
+        return self.populate(version, Challenge.objects.order_by('challenge_id'))
+
+    def populate(self, version, challenges):
+        """Replace the catalog with Challenge documents sorted by challenge_id"""
+        challenges = list(challenges)
+        entries, test_files = {}, {}
+        for c in challenges:
+            full = c.to_dict()
+            if c.testCasesFile is not None:
+                del full['testCases']
+                test_files[c.challenge_id] = (c.testCasesFile, self.test_prefix(full))
+            entries[c.challenge_id] = self._entry(full)
+        public = [c.to_dict_public() for c in challenges]
+        list_entry = self._entry(public)
+        by_difficulty = {difficulty: ([], []) for difficulty in DIFFICULTIES}
+        for challenge in public:
+            ids, listed = by_difficulty.setdefault(challenge['difficulty'], ([], []))
+            ids.append(challenge['id'])
+            listed.append(challenge)
+
+        with self._lock:
+            self._entries = entries
+            self._list_entry = list_entry
+            self._listing = ([c.challenge_id for c in challenges], public)
+            self._by_difficulty = by_difficulty
+            self._public_by_id = {challenge['id']: challenge for challenge in public}
+            self._selections = {}
+            self._ordinals = {c.challenge_id: c.ordinal for c in challenges if c.ordinal is not None}
+            self._test_files = test_files
+            self._version = version
+            self._checked_at = time.monotonic()
+            self.reloads += 1
+        return self
+
+    @property
+    def version(self):
+        return self._version
+
+    def due_for_check(self):
+        """True once check_interval has passed since the version was last checked"""
+        if time.monotonic() - self._checked_at < self.check_interval:
+            return False
+        self._checked_at = time.monotonic()
+        return True
+
+    def refresh_if_stale(self):
+        """Reload if the shared version moved since the last check"""
+        if self.auto_refresh and self.due_for_check() and get_version(VERSION_KEY) != self._version:
+            self.load()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, challenge_id):
+        return challenge_id in self._entries
+
+    def list_entry(self):
+        """Serialized public list of all challenges"""
+        self.refresh_if_stale()
+        return self._list_entry
+
+    def _listing_for(self, difficulty):
+        if difficulty is None:
+            return self._listing
+        return self._by_difficulty.get(difficulty, ([], []))
+
+    def selection_entry(self, difficulty=None, fields=None):
+        """Serialized public list of one difficulty and/or with only `fields`"""
+        self.refresh_if_stale()
+        if difficulty is None and fields is None:
+            return self._list_entry
+        key = (difficulty, fields)
+        entry = self._selections.get(key)
+        if entry is None:
+            _, public = self._listing_for(difficulty)
+            entry = self._entry([select_fields(challenge, fields) for challenge in public])
+            self._selections[key] = entry
+        return entry
+
+    def page(self, limit, after=None, difficulty=None, fields=None):
+        """Return (public challenges, more) for the page after a challenge id"""
+        self.refresh_if_stale()
+        ids, public = self._listing_for(difficulty)
+        start = bisect_right(ids, after) if after is not None else 0
+        return (
+            [select_fields(challenge, fields) for challenge in public[start:start + limit]],
+            start + limit < len(ids)
+        )
+
+    def select(self, challenge_ids, difficulty=None, fields=None):
+        """Public dicts of the known challenges among `challenge_ids`, sorted by id"""
+        self.refresh_if_stale()
+        by_id = self._public_by_id
+        return [
+            select_fields(by_id[challenge_id], fields)
+            for challenge_id in sorted(challenge_ids)
+            if challenge_id in by_id and (difficulty is None or by_id[challenge_id]['difficulty'] == difficulty)
+        ]
+
+    def get(self, challenge_id):
+        """Serialized full challenge, or None if unknown"""
+        self.refresh_if_stale()
+        return self._entries.get(challenge_id)
+
+    def get_fields(self, challenge_id, fields):
+        """One challenge with only `fields`, or None if unknown
+
+        testCases is left out for offloaded sets; see test_file().
+        """
+        entry = self.get(challenge_id)
+        if entry is None:
+            return None
+        return select_fields(json.loads(entry.body), fields)
+
+    @staticmethod
+    def test_prefix(challenge):
+        """JSON of a challenge dict, left open for a streamed testCases array"""
+        body = dumps(challenge)
+        return body[:-1] + (b',' if challenge else b'') + b'"testCases":'
+
+    def test_file(self, challenge_id):
+        """(GridFS file id, body prefix) of an offloaded test-case set, or None"""
+        self.refresh_if_stale()
+        return self._test_files.get(challenge_id)
+
+    def exists(self, challenge_id):
+        """Check a challenge id against the catalog"""
+        self.refresh_if_stale()
+        return challenge_id in self._entries
+
+    def ordinals(self):
+        """Map of challenge id to its bitmap ordinal (challenges without one are left out)"""
+        self.refresh_if_stale()
+        return self._ordinals
+
+    def stats(self):
+        """Return catalog size and reload count"""
+        return {
+            'challenges': len(self._entries),
+            'offloadedTestSets': len(self._test_files),
+            'reloads': self.reloads,
+            'version': self._version
+        }
+
+
+_catalog = None
+_catalog_lock = threading.Lock()
+
+
+def get_challenge_catalog():
+    """Return the shared challenge catalog, loading it on first use"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = ChallengeCatalog(
+                    compress=os.getenv('CHALLENGE_CATALOG_GZIP', 'False').lower() == 'true',
+                    check_interval=float(os.getenv('CHALLENGE_CATALOG_TTL', '30'))
+                ).load()
+    return _catalog
@@ -0,0 +1,199 @@
+"""
+Where completed-challenge membership lives.
+
+COMPLETIONS_STORAGE=embedded (default) keeps each user's completed ids in
+User.completedChallenges and guards repeats with a $ne filter on the list.
+COMPLETIONS_STORAGE=collection leaves the list alone and uses the
+completions collection instead: its unique (userId, challenge_id) index is
+the membership check, so a completion never loads or rewrites a list and
+user documents stay the same size however many challenges a user solves.
+Both modes keep User.completedCount up to date.
+
+Profiles can return the full list, just the count, or a compact bitmap in
+which bit N is set when the challenge with ordinal N is completed.
+
+Switching an existing database to collection storage needs the embedded
+lists copied into the collection first:
+
+    python -m services.completion_store backfill
+"""
+
+import argparse
+import base64
+import os
+from datetime import datetime, timezone
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.completions import APPLIED, DUPLICATE, UNKNOWN_USER
+
+COMPLETED_FORMATS = ('full', 'count', 'compact')
+# Profile field holding completed challenges -> ?completed= format
+COMPLETED_KEYS = {'completedChallenges': 'full', 'completedCount': 'count', 'completedBitmap': 'compact'}
+PROFILE_FIELDS = ('userId', 'score', 'rank') + tuple(COMPLETED_KEYS)
+
+
+def collection_storage():
+    """True when membership is kept in the completions collection"""
+    return os.getenv('COMPLETIONS_STORAGE', 'embedded').lower() == 'collection'
+
+
+def complete_one(user_id, challenge_id, score):
+    """Apply one completion; returns (status, user) with the updated user on success
+
+    The user has userId, score, rank and completedCount, plus
+    completedChallenges with embedded storage.
+    """
+    from models.completion import Completion
+    from models.user import User
+
+    users = User._get_collection()
+    projection = {'_id': 0, 'userId': 1, 'score': 1, 'rank': 1, 'completedCount': 1}
+
+    if not collection_storage():
+        projection['completedChallenges'] = 1
+        # The filter makes concurrent retries for the same challenge a no-op
+        user = users.find_one_and_update(
+            {'userId': user_id, 'completedChallenges': {'$ne': challenge_id}},
+            {
+                '$inc': {'score': score, 'completedCount': 1},
+                '$push': {'completedChallenges': challenge_id}
+            },
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+        if user is not None:
+            return APPLIED, user
+        # Only reached on failure: tell a missing user apart from a repeat
+        if users.find_one({'userId': user_id}, {'_id': 1}) is None:
+            return UNKNOWN_USER, None
+        return DUPLICATE, None
+
+    if users.find_one({'userId': user_id}, {'_id': 1}) is None:
+        return UNKNOWN_USER, None
+    completions = Completion._get_collection()
+    try:
+        completion_id = completions.insert_one({
+            'userId': user_id, 'challenge_id': challenge_id, 'score': score,
+            'completedAt': datetime.now(timezone.utc)
+        }).inserted_id
+    except DuplicateKeyError:
+        return DUPLICATE, None
+    try:
+        user = users.find_one_and_update(
+            {'userId': user_id},
+            {'$inc': {'score': score, 'completedCount': 1}},
+            projection=projection,
+            return_document=ReturnDocument.AFTER
+        )
+    except Exception:
+        # Without its points the completion must not block a retry
+        completions.delete_one({'_id': completion_id})
+        raise
+    if user is None:
+        completions.delete_one({'_id': completion_id})
+        return UNKNOWN_USER, None
+    return APPLIED, user
+
+
+def profile_fields(completed='full'):
+    """Fields get_user returns by default for a ?completed= format"""
+    key = next(field for field, value in COMPLETED_KEYS.items() if value == completed)
+    return ('userId', 'score', 'rank', key)
+
+
+def profile_projection(fields):
+    """Fields get_user reads to build a profile with `fields`"""
+    projection = {'_id': 0, 'userId': 1}
+    if 'score' in fields or 'rank' in fields:
+        projection['score'] = 1
+    if 'rank' in fields:
+        projection['rank'] = 1
+    if 'completedCount' in fields:
+        projection['completedCount'] = 1
+    if ('completedChallenges' in fields or 'completedBitmap' in fields) and not collection_storage():
+        projection['completedChallenges'] = 1
+    return projection
+
+
+def completed_ids(user):
+    """Every challenge id a user has completed"""
+    from models.completion import Completion
+
+    if not collection_storage():
+        return user.get('completedChallenges', [])
+    # Covered by the unique (userId, challenge_id) index
+    cursor = Completion._get_collection().find(
+        {'userId': user['userId']}, {'_id': 0, 'challenge_id': 1}
+    ).sort('challenge_id', 1)
+    return [doc['challenge_id'] for doc in cursor]
+
+
+def completed_count(user):
+    """Number of completed challenges, from the counter when it is present"""
+    if 'completedCount' in user:
+        return user['completedCount']
+    return len(completed_ids(user))
+
+
+def completed_bitmap(challenge_ids, ordinals):
+    """Base64 bitmap with bit N set for each completed challenge of ordinal N
+
+    Bit N is bit (N % 8) of byte N // 8, least significant bit first.
+    """
+    positions = [ordinals[c] for c in challenge_ids if c in ordinals]
+    bitmap = bytearray((max(positions) // 8 + 1) if positions else 0)
+    for position in positions:
+        bitmap[position // 8] |= 1 << (position % 8)
+    return base64.b64encode(bytes(bitmap)).decode('ascii')
+
+
+def completed_field(user, completed, ordinals):
+    """(key, value) of the completed-challenge field for a ?completed= format"""
+    if completed == 'count':
+        return 'completedCount', completed_count(user)
+    if completed == 'compact':
+        return 'completedBitmap', completed_bitmap(completed_ids(user), ordinals)
+    return 'completedChallenges', completed_ids(user)
+
+
+def backfill_completions():
+    """Copy embedded completedChallenges lists into the completions collection"""
+    from models.completion import Completion
+    from models.user import User
+
+    Completion.ensure_indexes()
+    list(User._get_collection().aggregate([
+        {'$match': {'completedChallenges.0': {'$exists': True}}},
+        {'$unwind': '$completedChallenges'},
+        {'$project': {
+            '_id': 0, 'userId': 1, 'challenge_id': '$completedChallenges',
+            # Backfilled entries predate every leaderboard window
+            'score': {'$literal': 0}, 'completedAt': {'$toDate': 0}
+        }},
+        {'$merge': {
+            'into': Completion._meta['collection'],
+            'on': ['userId', 'challenge_id'],
+            'whenMatched': 'keepExisting',
+            'whenNotMatched': 'insert'
+        }}
+    ], allowDiskUse=True))
+    User._get_collection().update_many(
+        {'completedCount': {'$exists': False}},
+        [{'$set': {'completedCount': {'$size': {'$ifNull': ['$completedChallenges', []]}}}}]
+    )
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from db import connect_db
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Maintain completed-challenge storage')
+    parser.add_argument('command', choices=['backfill'])
+    parser.parse_args()
+
+    connect_db()
+    backfill_completions()
+    print("Embedded completions copied into the completions collection")
@@ -0,0 +1,210 @@
+"""
+Batch application of challenge completions.
+
+With COMPLETIONS_STORAGE=collection the batch is instead inserted into the
+completions collection with one unordered insert_many, whose unique
+(userId, challenge_id) index rejects repeats, followed by one bulk $inc of
+the affected users' scores. The rest of this describes embedded storage.
+
+A batch is validated in one pass against the challenge catalog and one
+read of the affected users, then applied with a single unordered bulk
+write holding one conditional update per user. Each update only matches
+while none of its challenges are already completed, and is an upsert: if
+a concurrent completion got there first, the upsert collides with the
+unique userId index and MongoDB reports exactly which update failed, so
+those users are re-read and retried instead of being double-awarded.
+Users are re-read just before the write and never deleted, so the upsert
+cannot create a user.
+"""
+
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+APPLIED = 'applied'
+DUPLICATE = 'duplicate'
+UNKNOWN_USER = 'unknown_user'
+UNKNOWN_CHALLENGE = 'unknown_challenge'
+INVALID = 'invalid'
+CONFLICT = 'conflict'
+
+MAX_BATCH_SIZE = 10000
+MAX_ATTEMPTS = 3
+
+
+def _valid_item(item):
+    if not isinstance(item, dict):
+        return False
+    score = item.get('score')
+    return (isinstance(item.get('userId'), str)
+            and isinstance(item.get('challenge_id'), str)
+            and isinstance(score, int) and not isinstance(score, bool) and score >= 0)
+
+
+def _apply_embedded(collection, items, statuses, pending):
+    """Apply {userId: [item index]} to the embedded completedChallenges lists"""
+    applied_users = set()
+    for _ in range(MAX_ATTEMPTS):
+        if not pending:
+            break
+
+        completed = {
+            doc['userId']: set(doc.get('completedChallenges', []))
+            for doc in collection.find(
+                {'userId': {'$in': list(pending)}},
+                {'_id': 0, 'userId': 1, 'completedChallenges': 1}
+            )
+        }
+
+        ops = []
+        op_items = []
+        for user_id, indexes in pending.items():
+            if user_id not in completed:
+                for i in indexes:
+                    statuses[i] = UNKNOWN_USER
+                continue
+            seen = completed[user_id]
+            todo = []
+            for i in indexes:
+                challenge_id = items[i]['challenge_id']
+                if challenge_id in seen:
+                    statuses[i] = DUPLICATE
+                else:
+                    seen.add(challenge_id)
+                    todo.append(i)
+            if not todo:
+                continue
+            challenge_ids = [items[i]['challenge_id'] for i in todo]
+            ops.append(UpdateOne(
+                {'userId': user_id, 'completedChallenges': {'$nin': challenge_ids}},
+                {
+                    '$inc': {'score': sum(items[i]['score'] for i in todo), 'completedCount': len(todo)},
+                    '$push': {'completedChallenges': {'$each': challenge_ids}}
+                },
+                upsert=True
+            ))
+            op_items.append((user_id, todo))
+
+        pending = {}
+        if not ops:
+            break
+
+        failed = set()
+        try:
+            collection.bulk_write(ops, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') != 11000:
+                    raise
+                failed.add(error['index'])
+
+        for op_index, (user_id, todo) in enumerate(op_items):
+            if op_index in failed:
+                # Lost a race with another completion: re-read and retry
+                pending[user_id] = todo
+            else:
+                applied_users.add(user_id)
+                for i in todo:
+                    statuses[i] = APPLIED
+
+    # Still racing after every attempt: nothing was applied for these
+    for indexes in pending.values():
+        for i in indexes:
+            statuses[i] = CONFLICT
+    return applied_users
+
+
+def _apply_to_collection(items, statuses, pending):
+    """Apply {userId: [item index]} through the completions collection"""
+    from models.completion import Completion
+    from models.user import User
+
+    users = User._get_collection()
+    known = {
+        doc['userId']
+        for doc in users.find({'userId': {'$in': list(pending)}}, {'_id': 0, 'userId': 1})
+    }
+
+    at = datetime.now(timezone.utc)
+    docs = []
+    doc_items = []
+    for user_id, indexes in pending.items():
+        for i in indexes:
+            if user_id not in known:
+                statuses[i] = UNKNOWN_USER
+            else:
+                item = items[i]
+                docs.append({
+                    'userId': user_id, 'challenge_id': item['challenge_id'],
+                    'score': item['score'], 'completedAt': at
+                })
+                doc_items.append(i)
+
+    failed = set()
+    if docs:
+        try:
+            Completion._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') != 11000:
+                    raise
+                failed.add(error['index'])
+
+    totals = {}
+    for doc_index, i in enumerate(doc_items):
+        if doc_index in failed:
+            statuses[i] = DUPLICATE
+            continue
+        statuses[i] = APPLIED
+        score, count = totals.get(items[i]['userId'], (0, 0))
+        totals[items[i]['userId']] = (score + items[i]['score'], count + 1)
+
+    if totals:
+        users.bulk_write([
+            UpdateOne({'userId': user_id}, {'$inc': {'score': score, 'completedCount': count}})
+            for user_id, (score, count) in totals.items()
+        ], ordered=False)
+    return set(totals)
+
+
+def apply_completions(items):
+    """Apply a list of {userId, challenge_id, score} items
+
+    Returns (statuses, scores): one status per item, and the new score of
+    every user that had at least one completion applied.
+    """
+    from models.user import User
+    from services.challenge_catalog import get_challenge_catalog
+
+    collection = User._get_collection()
+    catalog = get_challenge_catalog()
+    statuses = [None] * len(items)
+
+    # Validate shape and challenge ids without touching MongoDB
+    pending = {}
+    for i, item in enumerate(items):
+        if not _valid_item(item):
+            statuses[i] = INVALID
+        elif not catalog.exists(item['challenge_id']):
+            statuses[i] = UNKNOWN_CHALLENGE
+        else:
+            pending.setdefault(item['userId'], []).append(i)
+
+    from services.completion_store import collection_storage
+
+    if collection_storage():
+        applied_users = _apply_to_collection(items, statuses, pending)
+    else:
+        applied_users = _apply_embedded(collection, items, statuses, pending)
+
+    scores = {}
+    if applied_users:
+        scores = {
+            doc['userId']: doc['score']
+            for doc in collection.find(
+                {'userId': {'$in': list(applied_users)}},
+                {'_id': 0, 'userId': 1, 'score': 1}
+            )
+        }
+    return statuses, scores
@@ -0,0 +1,47 @@
+"""
+Query-string filters and sparse fieldsets.
+
+`?fields=title,difficulty` picks the response fields and `?ids=a,b` filters
+by id. Both are parsed here so every route rejects unknown or oversized
+values with the same ValueError (turned into a 400 by the route).
+"""
+
+MAX_IDS = 500
+
+
+def parse_fields(raw, allowed, always=()):
+    """Fields selected by a comma-separated `fields` value, in `allowed` order
+
+    Returns None when no fields were asked for (the full shape). Fields in
+    `always` are included whether asked for or not.
+    """
+    if raw is None:
+        return None
+    requested = {field.strip() for field in raw.split(',') if field.strip()}
+    if not requested:
+        raise ValueError('fields must name at least one field')
+    unknown = requested.difference(allowed)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))} "
+                         f"(allowed: {', '.join(allowed)})")
+    requested.update(always)
+    return tuple(field for field in allowed if field in requested)
+
+
+def parse_ids(raw, maximum=MAX_IDS, name='ids'):
+    """Distinct ids from a comma-separated value, in request order; None when absent"""
+    if raw is None:
+        return None
+    ids = list(dict.fromkeys(value.strip() for value in raw.split(',') if value.strip()))
+    if not ids:
+        raise ValueError(f'{name} must list at least one id')
+    if len(ids) > maximum:
+        raise ValueError(f'{name} accepts at most {maximum} ids')
+    return ids
+
+
+def select_fields(obj, fields):
+    """Copy of a dict with only `fields`, or the dict itself for the full shape"""
+    if fields is None:
+        return obj
+    return {field: obj[field] for field in fields if field in obj}
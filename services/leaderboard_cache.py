@@ -0,0 +1,232 @@
+"""
+Cache of the serialized top-N leaderboard response.
+
+The cached body is tagged with the shared 'leaderboard' version counter.
+Writes bump the counter only when they can change the top N: scores never
+decrease, so once the board is full a score below its lowest entry can
+never enter it.
+"""
+
+import os
+import threading
+import time
+
+from services.serialization import dumps
+from services.versions import bump_version, get_version
+
+LEADERBOARD_SIZE = 100
+VERSION_KEY = 'leaderboard'
+
+
+def leaderboard_query(after=None):
+    """Filter for the leaderboard page after the (score, userId) of the previous page"""
+    if after is None:
+        return {}
+    score, user_id = after
+    return {'$or': [
+        {'score': {'$lt': score}},
+        {'score': score, 'userId': {'$gt': user_id}}
+    ]}
+
+
+def leaderboard_projection(stored_ranks):
+    """Fields a leaderboard page reads
+
+    Without stored ranks the query stays covered by the (-score, userId) index.
+    """
+    projection = {'_id': 0, 'userId': 1, 'score': 1}
+    if stored_ranks:
+        projection['rank'] = 1
+    return projection
+
+
+LEADERBOARD_SORT = [('score', -1), ('userId', 1)]
+
+
+def rank_entries(docs, first_page, stored_ranks, rank_of_score):
+    """Turn sorted user documents into leaderboard entries (ties share a rank)
+
+    The first page is ranked from its own prefix; later pages take the rank
+    of each distinct score from `rank_of_score`. With stored ranks every
+    entry keeps its materialized rank.
+    """
+    leaderboard = []
+    previous = None
+    rank = 0
+    for position, doc in enumerate(docs, start=1):
+        if stored_ranks:
+            rank = doc.get('rank', 0)
+        elif doc['score'] != previous:
+            rank = position if first_page else rank_of_score(doc['score'])
+            previous = doc['score']
+        leaderboard.append({
+            'userId': doc['userId'],
+            'score': doc['score'],
+            'rank': rank
+        })
+    return leaderboard
+
+
+def build_leaderboard(limit=LEADERBOARD_SIZE, after=None):
+    """Query a page of the leaderboard and assign ranks
+
+    `after` is the (score, userId) of the last entry on the previous page.
+    """
+    from models.user import User
+    from services.ranking import background_ranking, rank_for_score
+
+    stored_ranks = background_ranking()
+    cursor = User._get_collection().find(
+        leaderboard_query(after), leaderboard_projection(stored_ranks)
+    ).sort(LEADERBOARD_SORT).limit(limit)
+    return rank_entries(
+        cursor, first_page=after is None, stored_ranks=stored_ranks,
+        rank_of_score=lambda score: rank_for_score(score, 0)
+    )
+
+
+def leaderboard_window(user_id, radius):
+    """Entries for the `radius` users directly above and below a user
+
+    Both sides are range queries on the (-score, userId) index starting at
+    the user's own key, so the cost does not depend on their position.
+    Returns None if the user does not exist.
+    """
+    from models.user import User
+    from services.ranking import background_ranking, rank_for_score
+
+    stored_ranks = background_ranking()
+    collection = User._get_collection()
+    projection = leaderboard_projection(stored_ranks)
+    user = collection.find_one({'userId': user_id}, projection)
+    if user is None:
+        return None
+    score = user.get('score', 0)
+    user['score'] = score
+
+    above = list(collection.find(
+        {'$or': [
+            {'score': {'$gt': score}},
+            {'score': score, 'userId': {'$lt': user_id}}
+        ]},
+        projection
+    ).sort([('score', 1), ('userId', -1)]).limit(radius))
+    above.reverse()
+    below = collection.find(
+        leaderboard_query((score, user_id)), projection
+    ).sort(LEADERBOARD_SORT).limit(radius)
+
+    return rank_entries(
+        above + [user] + list(below), first_page=False, stored_ranks=stored_ranks,
+        rank_of_score=lambda s: rank_for_score(s, 0)
+    )
+
+
+class LeaderboardCache:
+    """
+    Pre-serialized leaderboard body shared by every request in the process
+
+    get() and note_score() do the MongoDB work for the Flask app. The steps
+    they are built from (cached_version, lookup, store, needs_bump, bumped)
+    hold no I/O, so the async server drives the same cache with its own
+    driver.
+    """
+
+    def __init__(self, size=LEADERBOARD_SIZE, version_ttl=0.0):
+        self.size = size
+        self.version_ttl = version_ttl
+        self._lock = threading.Lock()
+        self._body = None
+        self._version = None
+        self._checked_at = 0.0
+        # Lowest score on a full board; None until the board has `size` users
+        self._cutoff = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def cached_version(self):
+        """Version still trusted within version_ttl, or None if it must be re-read"""
+        if self._version is not None and time.monotonic() - self._checked_at < self.version_ttl:
+            return self._version
+        return None
+
+    def mark_checked(self):
+        """Record that the shared version was just read from MongoDB"""
+        self._checked_at = time.monotonic()
+
+    def lookup(self, version):
+        """Return the cached body for `version`, or None on a miss"""
+        with self._lock:
+            if self._body is not None and self._version == version:
+                self.hits += 1
+                return self._body
+            self.misses += 1
+            return None
+
+    def store(self, version, leaderboard):
+        """Cache a freshly built leaderboard and return its body"""
+        body = dumps(leaderboard)
+        with self._lock:
+            self._body = body
+            self._version = version
+            if len(leaderboard) >= self.size:
+                self._cutoff = leaderboard[-1]['score']
+        return body
+
+    def needs_bump(self, score):
+        """True if a user's new score can appear on the board"""
+        cutoff = self._cutoff
+        return cutoff is None or score >= cutoff
+
+    def bumped(self, version):
+        """Record that the shared version was bumped to `version`"""
+        with self._lock:
+            self.invalidations += 1
+            if self._version is not None and self._version < version:
+                self._body = None
+
+    def get(self):
+        """Return (version, body) for the current leaderboard"""
+        version = self.cached_version()
+        if version is None:
+            version = get_version(VERSION_KEY)
+            self.mark_checked()
+        body = self.lookup(version)
+        if body is None:
+            # The version was read before building, so a concurrent write can
+            # only make the stored body look older than it is, never newer
+            body = self.store(version, build_leaderboard(self.size))
+        return version, body
+
+    def note_score(self, score):
+        """Invalidate the board if a user's new score can appear on it"""
+        if self.needs_bump(score):
+            self.bumped(bump_version(VERSION_KEY))
+
+    def stats(self):
+        """Return hit/miss counters"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'invalidations': self.invalidations,
+            'hitRatio': self.hits / total if total else 0.0,
+            'version': self._version
+        }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_leaderboard_cache():
+    """Return the shared leaderboard cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LeaderboardCache(
+                    version_ttl=float(os.getenv('LEADERBOARD_VERSION_TTL', '0'))
+                )
+    return _cache
@@ -0,0 +1,130 @@
+"""
+Streaming export of the full leaderboard.
+
+Every user is read in (-score, userId) order from one server-side cursor,
+LEADERBOARD_EXPORT_BATCH documents per round trip, and ranked as it
+passes: ties share the position of the first user with that score, as on
+the first leaderboard page. Rows are written out per batch, so memory
+stays constant however many users there are.
+
+Exports are long-running, so at most LEADERBOARD_EXPORT_CONCURRENCY run at
+once per process. The cursor is a live read, not a snapshot: a user whose
+score changes mid-export may be listed at either score.
+"""
+
+import csv
+import io
+import os
+import threading
+
+from services.leaderboard_cache import LEADERBOARD_SORT
+from services.serialization import dumps
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+CSV_HEADER = ('rank', 'userId', 'score')
+
+
+def export_batch_size():
+    return int(os.getenv('LEADERBOARD_EXPORT_BATCH', '5000'))
+
+
+def ranked_rows(docs):
+    """Yield (rank, userId, score) for user documents in leaderboard order"""
+    previous = None
+    rank = 0
+    for position, doc in enumerate(docs, start=1):
+        score = doc.get('score', 0)
+        if score != previous:
+            rank = position
+            previous = score
+        yield rank, doc['userId'], score
+
+
+def _ndjson_chunk(rows):
+    return b''.join(
+        dumps({'userId': user_id, 'score': score, 'rank': rank}) + b'\n'
+        for rank, user_id, score in rows
+    )
+
+
+def _csv_chunk(rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode('utf-8')
+
+
+def export_leaderboard(export_format='ndjson', batch_size=None):
+    """Yield the whole leaderboard as encoded chunks of one batch each"""
+    from models.user import User
+
+    batch_size = batch_size or export_batch_size()
+    encode = _csv_chunk if export_format == 'csv' else _ndjson_chunk
+    if export_format == 'csv':
+        yield _csv_chunk([CSV_HEADER])
+
+    cursor = User._get_collection().find(
+        {}, {'_id': 0, 'userId': 1, 'score': 1}
+    ).sort(LEADERBOARD_SORT).batch_size(batch_size)
+    with cursor:
+        batch = []
+        for row in ranked_rows(cursor):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield encode(batch)
+                batch = []
+        if batch:
+            yield encode(batch)
+
+
+class ExportLimiter:
+    """Caps the number of exports streaming at once"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self.active = 0
+        self.started = 0
+        self.rejected = 0
+
+    def try_acquire(self):
+        """Take a slot; returns False if all are busy"""
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            return False
+        with self._lock:
+            self.active += 1
+            self.started += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self.active -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self.active,
+                'started': self.started,
+                'rejected': self.rejected
+            }
+
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+def get_export_limiter():
+    """Return the shared export limiter"""
+    global _limiter
+    if _limiter is None:
+        with _limiter_lock:
+            if _limiter is None:
+                _limiter = ExportLimiter(int(os.getenv('LEADERBOARD_EXPORT_CONCURRENCY', '2')))
+    return _limiter
@@ -0,0 +1,199 @@
+"""
+Request and MongoDB instrumentation exposed in Prometheus text format.
+
+Routes are timed by Flask request hooks and MongoDB commands by a pymongo
+command listener, both feeding fixed-bucket histograms. Recording a sample
+is a bisect and a few integer increments under one lock, so it stays cheap
+enough for the hot path (see benchmarks/metrics_overhead.py).
+"""
+
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from pymongo import monitoring
+
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Histogram:
+    """Cumulative-bucket histogram for one label set"""
+
+    __slots__ = ('counts', 'sum')
+
+    def __init__(self, buckets):
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Times every MongoDB command by collection and command name"""
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self._collections = {}
+
+    def started(self, event):
+        target = event.command.get(event.command_name)
+        if event.command_name == 'getMore':
+            target = event.command.get('collection')
+        self._collections[(event.request_id, event.connection_id)] = (
+            target if isinstance(target, str) else ''
+        )
+
+    def succeeded(self, event):
+        collection = self._collections.pop((event.request_id, event.connection_id), '')
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop((event.request_id, event.connection_id), '')
+        self.metrics.observe_command(collection, event.command_name, event.duration_micros / 1e6, failed=True)
+
+
+class Metrics:
+    """
+    Registry of request and MongoDB command metrics
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._requests = {}
+        self._statuses = {}
+        self._commands = {}
+        self._command_failures = {}
+        self.in_flight = 0
+        self.command_listener = CommandMetricsListener(self)
+        self._installed = False
+
+    def install(self):
+        """Register the command listener; must run before the MongoDB client is created"""
+        if self.enabled and not self._installed:
+            monitoring.register(self.command_listener)
+            self._installed = True
+
+    @staticmethod
+    def _observe(series, key, buckets, seconds):
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram(buckets)
+        histogram.counts[bisect_left(buckets, seconds)] += 1
+        histogram.sum += seconds
+
+    def request_started(self):
+        """Note a request entering the app; returns its start time"""
+        with self._lock:
+            self.in_flight += 1
+        return time.perf_counter()
+
+    def request_finished(self, route, method, status, started):
+        """Record a finished request"""
+        seconds = time.perf_counter() - started
+        with self._lock:
+            self.in_flight -= 1
+            self._observe(self._requests, (route, method), REQUEST_BUCKETS, seconds)
+            key = (route, method, status)
+            self._statuses[key] = self._statuses.get(key, 0) + 1
+
+    def observe_command(self, collection, command, seconds, failed=False):
+        """Record one MongoDB command"""
+        key = (collection, command)
+        with self._lock:
+            self._observe(self._commands, key, COMMAND_BUCKETS, seconds)
+            if failed:
+                self._command_failures[key] = self._command_failures.get(key, 0) + 1
+
+    @staticmethod
+    def _render_histogram(lines, name, help_text, label_names, series, buckets):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(buckets, histogram.counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{name}_bucket{_labels(label_names, key, le)} {cumulative}')
+            cumulative += histogram.counts[-1]
+            le = 'le="+Inf"'
+            lines.append(f'{name}_bucket{_labels(label_names, key, le)} {cumulative}')
+            lines.append(f'{name}_sum{_labels(label_names, key)} {_format_value(histogram.sum)}')
+            lines.append(f'{name}_count{_labels(label_names, key)} {cumulative}')
+
+    @staticmethod
+    def _render_counter(lines, name, help_text, label_names, series):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(series.items()):
+            lines.append(f'{name}{_labels(label_names, key)} {value}')
+
+    def render(self):
+        """Return all metrics in Prometheus text exposition format"""
+        # Copy under the lock, format outside it
+        with self._lock:
+            requests = {key: _copy(h) for key, h in self._requests.items()}
+            statuses = dict(self._statuses)
+            commands = {key: _copy(h) for key, h in self._commands.items()}
+            failures = dict(self._command_failures)
+            in_flight = self.in_flight
+
+        lines = []
+        self._render_histogram(
+            lines, 'reactivate_http_request_duration_seconds', 'Request latency by route.',
+            ('route', 'method'), requests, REQUEST_BUCKETS
+        )
+        self._render_counter(
+            lines, 'reactivate_http_requests_total', 'Requests by route and status code.',
+            ('route', 'method', 'status'), statuses
+        )
+        lines.append('# HELP reactivate_http_requests_in_flight Requests currently being served.')
+        lines.append('# TYPE reactivate_http_requests_in_flight gauge')
+        lines.append(f'reactivate_http_requests_in_flight {in_flight}')
+        self._render_histogram(
+            lines, 'reactivate_mongodb_command_duration_seconds', 'MongoDB command latency by collection.',
+            ('collection', 'command'), commands, COMMAND_BUCKETS
+        )
+        self._render_counter(
+            lines, 'reactivate_mongodb_command_failures_total', 'Failed MongoDB commands by collection.',
+            ('collection', 'command'), failures
+        )
+        return '\n'.join(lines) + '\n'
+
+
+def _copy(histogram):
+    copy = Histogram(())
+    copy.counts = list(histogram.counts)
+    copy.sum = histogram.sum
+    return copy
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    """Return the shared metrics registry"""
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics(enabled=os.getenv('METRICS_ENABLED', 'True').lower() == 'true')
+    return _metrics
@@ -0,0 +1,40 @@
+"""
+Opaque cursors and limits for keyset pagination.
+
+A cursor encodes the sort key of the last item on a page, so the next
+page starts with an indexed range query instead of skipping rows.
+"""
+
+import base64
+import json
+
+
+def encode_cursor(key):
+    """Encode a sort key (a JSON-serializable list) as an opaque cursor"""
+    raw = json.dumps(key, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, length):
+    """Decode a cursor holding a `length`-item sort key; raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(key, list) or len(key) != length:
+        raise ValueError('Invalid cursor')
+    return key
+
+
+def parse_limit(raw, default, maximum, name='limit'):
+    """Parse a ?limit= (or other count) value; raises ValueError if out of range"""
+    if raw is None:
+        return default
+    try:
+        limit = int(raw)
+    except ValueError as e:
+        raise ValueError(f'{name} must be an integer') from e
+    if limit < 1 or limit > maximum:
+        raise ValueError(f'{name} must be between 1 and {maximum}')
+    return limit
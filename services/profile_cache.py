@@ -0,0 +1,311 @@
+"""
+Two-tier cache of the user documents behind GET /api/users/<userId>.
+
+With PROFILE_CACHE=True profiles are read through an in-process LRU of
+PROFILE_CACHE_SIZE users, each kept for PROFILE_CACHE_TTL seconds, and,
+when PROFILE_CACHE_REDIS_URL is set, a shared Redis tier whose entries
+live for PROFILE_CACHE_SHARED_TTL seconds. Only stored fields are cached;
+ranks are still computed per request.
+
+Writes go through the cache: complete_challenge and create_user store the
+document their write returned, while routes that change users without
+reading them back (batch completions, write-behind flushes) invalidate
+them. A cached document is versioned by its completedCount, which every
+completion increments, so an older document never replaces a newer one.
+An invalidation leaves a short-lived tombstone that turns away documents
+read before it.
+
+The shared tier publishes every write and invalidation, and each process
+drops its local copy when it hears about one from another process.
+Without the shared tier a process only sees its own writes, so under
+several workers a profile may be up to PROFILE_CACHE_TTL seconds stale in
+the others.
+"""
+
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from services.completion_store import PROFILE_FIELDS, profile_projection
+from services.serialization import dumps, loads
+from services.users import find_user_profile
+
+# Seconds an invalidation keeps turning away documents read before it
+TOMBSTONE_TTL = 5.0
+
+
+def profile_cache_enabled():
+    """True when profiles are cached"""
+    return os.getenv('PROFILE_CACHE', 'False').lower() == 'true'
+
+
+def cached_projection():
+    """Fields cached per user: everything any profile format reads"""
+    return profile_projection(PROFILE_FIELDS)
+
+
+def _version(doc):
+    return doc.get('completedCount', 0)
+
+
+# KEYS[1]: profile key; ARGV: version, document, TTL in ms, tombstone marker
+_PUT_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if current then
+  if current == ARGV[4] then return 0 end
+  local version = tonumber(string.match(current, '^(%d+):'))
+  if version and version > tonumber(ARGV[1]) then return 0 end
+end
+redis.call('SET', KEYS[1], ARGV[1] .. ':' .. ARGV[2], 'PX', ARGV[3])
+return 1
+"""
+
+
+class RedisTier:
+    """
+    Profiles shared by every process through Redis
+
+    Values are '<completedCount>:<JSON document>' and are only replaced by
+    documents at least as new. Redis errors count as misses.
+    """
+
+    TOMBSTONE = b'invalidated'
+
+    def __init__(self, url, ttl=300.0, prefix='profile:', channel='profile-invalidations'):
+        # Imported here so that processes without a shared tier never load it
+        try:
+            import redis
+        except ImportError:  # pragma: no cover - the shared tier is optional
+            raise RuntimeError('PROFILE_CACHE_REDIS_URL is set but the redis package is not installed') from None
+        self.client = redis.Redis.from_url(url)
+        self._redis_error = redis.RedisError
+        self.ttl_ms = int(ttl * 1000)
+        self.prefix = prefix
+        self.channel = channel
+        # Tells this process's own messages apart from other processes'
+        self.origin = f'{os.getpid()}-{uuid.uuid4().hex}'
+        self._put = self.client.register_script(_PUT_SCRIPT)
+        self._pubsub = None
+        self._listener = None
+        self.errors = 0
+
+    def _key(self, user_id):
+        return self.prefix + user_id
+
+    def get(self, user_id):
+        """Cached document of user_id, or None"""
+        try:
+            value = self.client.get(self._key(user_id))
+        except self._redis_error:
+            self.errors += 1
+            return None
+        if value is None or value == self.TOMBSTONE:
+            return None
+        return loads(value.split(b':', 1)[1])
+
+    def put(self, docs, publish=False):
+        """Store documents unless newer ones are cached; `publish` tells other processes"""
+        pipe = self.client.pipeline(transaction=False)
+        for doc in docs:
+            self._put(keys=[self._key(doc['userId'])],
+                      args=[_version(doc), dumps(doc), self.ttl_ms, self.TOMBSTONE], client=pipe)
+            if publish:
+                pipe.publish(self.channel, f"{self.origin} {doc['userId']}")
+        self._execute(pipe)
+
+    def invalidate(self, user_ids):
+        pipe = self.client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.set(self._key(user_id), self.TOMBSTONE, px=int(TOMBSTONE_TTL * 1000))
+            pipe.publish(self.channel, f'{self.origin} {user_id}')
+        self._execute(pipe)
+
+    def _execute(self, pipe):
+        try:
+            pipe.execute()
+        except self._redis_error:
+            self.errors += 1
+
+    def listen(self, callback):
+        """Call callback(user_id) for each write or invalidation made by another process"""
+        def handle(message):
+            origin, user_id = message['data'].decode('utf-8').split(' ', 1)
+            if origin != self.origin:
+                callback(user_id)
+
+        def count_error(error, pubsub, thread):
+            self.errors += 1
+            time.sleep(1)
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{self.channel: handle})
+        self._listener = self._pubsub.run_in_thread(
+            sleep_time=1.0, daemon=True, exception_handler=count_error
+        )
+
+    def close(self):
+        if self._listener is not None:
+            self._listener.stop()
+            self._listener = None
+        self.client.close()
+
+
+class ProfileCache:
+    """
+    In-process LRU of user documents with TTL, in front of an optional shared tier
+    """
+
+    def __init__(self, enabled=True, size=10000, ttl=30.0, shared=None):
+        self.enabled = enabled
+        self.size = size
+        self.ttl = ttl
+        self.shared = shared
+        self._lock = threading.Lock()
+        # userId -> (expires, version, document, invalidated at); tombstones have no document
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        self.rejected_writes = 0
+
+    def _lookup(self, user_id, now):
+        entry = self._entries.get(user_id)
+        if entry is not None and entry[0] <= now:
+            del self._entries[user_id]
+            self.expirations += 1
+            return None
+        return entry
+
+    def _insert(self, user_id, entry):
+        self._entries[user_id] = entry
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def _store(self, docs, started):
+        """Cache documents read or written from `started` on, unless superseded"""
+        now = time.monotonic()
+        with self._lock:
+            for doc in docs:
+                entry = self._lookup(doc['userId'], now)
+                if entry is not None and (
+                    started < entry[3] if entry[2] is None else entry[1] > _version(doc)
+                ):
+                    self.rejected_writes += 1
+                    continue
+                self._insert(doc['userId'], (now + self.ttl, _version(doc), doc, None))
+
+    def fetch(self, user_id):
+        """Return the cached document of user_id, reading it on a miss; None if unknown
+
+        The document is shared with other requests and must not be modified.
+        """
+        started = time.monotonic()
+        with self._lock:
+            entry = self._lookup(user_id, started)
+            if entry is not None and entry[2] is not None:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[2]
+
+        if self.shared is not None:
+            doc = self.shared.get(user_id)
+            if doc is not None:
+                with self._lock:
+                    self.shared_hits += 1
+                self._store([doc], started)
+                return doc
+
+        with self._lock:
+            self.misses += 1
+        doc = find_user_profile(user_id, cached_projection())
+        if doc is not None:
+            self._store([doc], started)
+            if self.shared is not None:
+                self.shared.put([doc])
+        return doc
+
+    def write(self, docs, started):
+        """Write through the user documents returned by a write that began at `started`"""
+        if not self.enabled or not docs:
+            return
+        fields = [field for field in cached_projection() if field != '_id']
+        docs = [{field: doc[field] for field in fields if field in doc} for doc in docs]
+        self._store(docs, started)
+        if self.shared is not None:
+            self.shared.put(docs, publish=True)
+
+    def invalidate(self, user_ids):
+        """Drop users whose documents changed without being read back"""
+        if not self.enabled or not user_ids:
+            return
+        self.evict_local(user_ids)
+        if self.shared is not None:
+            self.shared.invalidate(user_ids)
+
+    def evict_local(self, user_ids):
+        """Replace this process's copies with tombstones"""
+        now = time.monotonic()
+        with self._lock:
+            for user_id in user_ids:
+                self._insert(user_id, (now + TOMBSTONE_TTL, None, None, now))
+                self.invalidations += 1
+
+    def clear(self):
+        """Drop every locally cached document (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+
+    def close(self):
+        if self.shared is not None:
+            self.shared.close()
+            self.shared = None
+
+    def stats(self):
+        """Return hit, eviction and invalidation counts"""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'enabled': self.enabled,
+                'size': len(self._entries),
+                'maxSize': self.size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'sharedHits': self.shared_hits,
+                'misses': self.misses,
+                'hitRatio': round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'rejectedWrites': self.rejected_writes,
+                'sharedTier': None if self.shared is None else {'errors': self.shared.errors}
+            }
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_profile_cache():
+    """Return the shared profile cache"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                cache = ProfileCache(
+                    enabled=profile_cache_enabled(),
+                    size=int(os.getenv('PROFILE_CACHE_SIZE', '10000')),
+                    ttl=float(os.getenv('PROFILE_CACHE_TTL', '30'))
+                )
+                url = os.getenv('PROFILE_CACHE_REDIS_URL')
+                if cache.enabled and url:
+                    cache.shared = RedisTier(url, ttl=float(os.getenv('PROFILE_CACHE_SHARED_TTL', '300')))
+                    cache.shared.listen(lambda user_id: cache.evict_local([user_id]))
+                _cache = cache
+    return _cache
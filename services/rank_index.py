@@ -0,0 +1,303 @@
+"""
+In-memory rank index over user scores.
+
+Users are grouped into score buckets held in a treap ordered by score
+(highest first). Every node tracks how many users live in its subtree, so
+both "rank of score S" and "user at position K" are answered in O(log n)
+without touching MongoDB.
+
+Ranking uses competition order: users with the same score share a rank,
+which is 1 + the number of users with a strictly higher score. Within a
+bucket users are ordered by userId so that positions are deterministic.
+"""
+
+import random
+import threading
+from bisect import bisect_left, insort
+
+
+class _Node:
+    """A single score bucket"""
+
+    __slots__ = ('score', 'members', 'priority', 'left', 'right', 'size')
+
+    def __init__(self, score, members, priority=None):
+        self.score = score
+        self.members = members
+        self.priority = random.random() if priority is None else priority
+        self.left = None
+        self.right = None
+        self.size = len(members)
+
+
+def _size(node):
+    return node.size if node is not None else 0
+
+
+def _update(node):
+    node.size = len(node.members) + _size(node.left) + _size(node.right)
+
+
+def _rotate_right(node):
+    pivot = node.left
+    node.left = pivot.right
+    pivot.right = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _rotate_left(node):
+    pivot = node.right
+    node.right = pivot.left
+    pivot.left = node
+    _update(node)
+    _update(pivot)
+    return pivot
+
+
+def _merge(left, right):
+    """Merge two treaps where every score in left is higher than in right"""
+    if left is None:
+        return right
+    if right is None:
+        return left
+    if left.priority > right.priority:
+        left.right = _merge(left.right, right)
+        _update(left)
+        return left
+    right.left = _merge(left, right.left)
+    _update(right)
+    return right
+
+
+def _insert(node, score, user_id):
+    if node is None:
+        return _Node(score, [user_id])
+    if score == node.score:
+        insort(node.members, user_id)
+    elif score > node.score:
+        node.left = _insert(node.left, score, user_id)
+        if node.left.priority > node.priority:
+            return _rotate_right(node)
+    else:
+        node.right = _insert(node.right, score, user_id)
+        if node.right.priority > node.priority:
+            return _rotate_left(node)
+    _update(node)
+    return node
+
+
+def _delete(node, score, user_id):
+    if node is None:
+        return None
+    if score == node.score:
+        i = bisect_left(node.members, user_id)
+        if i < len(node.members) and node.members[i] == user_id:
+            del node.members[i]
+        if not node.members:
+            return _merge(node.left, node.right)
+    elif score > node.score:
+        node.left = _delete(node.left, score, user_id)
+    else:
+        node.right = _delete(node.right, score, user_id)
+    _update(node)
+    return node
+
+
+def _build(buckets, priorities, lo, hi, depth):
+    """Build a balanced treap from buckets[lo:hi] (sorted by score, highest first)"""
+    if lo >= hi:
+        return None
+    mid = (lo + hi) // 2
+    score, members = buckets[mid]
+    node = _Node(score, members, priorities[depth])
+    node.left = _build(buckets, priorities, lo, mid, depth + 1)
+    node.right = _build(buckets, priorities, mid + 1, hi, depth + 1)
+    _update(node)
+    return node
+
+
+class RankIndex:
+    """
+    Order-statistic index mapping users to leaderboard ranks
+    """
+
+    def __init__(self, pairs=()):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._root = None
+        self._scores = {}
+        # userId -> score (None when removed) changed while a rebuild reads its pairs
+        self._changes = None
+        self.rebuild(pairs)
+
+    def rebuild(self, pairs):
+        """Replace the index contents with (userId, score) pairs
+
+        Scores set or removed while the pairs are being read are applied
+        on top of the new contents, so a rebuild never loses them.
+        """
+        with self._rebuild_lock:
+            with self._lock:
+                self._changes = {}
+            try:
+                self._rebuild(pairs)
+            finally:
+                with self._lock:
+                    self._changes = None
+
+    def _rebuild(self, pairs):
+        scores = dict(pairs)
+        grouped = {}
+        for user_id, score in scores.items():
+            grouped.setdefault(score, []).append(user_id)
+        buckets = sorted(grouped.items(), key=lambda item: item[0], reverse=True)
+        for _, members in buckets:
+            members.sort()
+
+        # Depth-based priorities keep the heap property of the balanced build
+        # while later inserts still rotate into a random position.
+        depth = max(len(buckets), 1).bit_length() + 1
+        priorities = sorted((random.random() for _ in range(depth)), reverse=True)
+        root = _build(buckets, priorities, 0, len(buckets), 0)
+
+        with self._lock:
+            self._root = root
+            self._scores = scores
+            for user_id, score in self._changes.items():
+                self._move(user_id, score)
+
+    def __len__(self):
+        return len(self._scores)
+
+    def __contains__(self, user_id):
+        return user_id in self._scores
+
+    def score_of(self, user_id):
+        """Return the indexed score for a user, or None if unknown"""
+        return self._scores.get(user_id)
+
+    def _move(self, user_id, score):
+        """Put a user at `score`, or drop them when score is None; caller holds the lock"""
+        previous = self._scores.get(user_id)
+        if previous == score:
+            return
+        if previous is not None:
+            self._root = _delete(self._root, previous, user_id)
+            del self._scores[user_id]
+        if score is not None:
+            self._root = _insert(self._root, score, user_id)
+            self._scores[user_id] = score
+
+    def set_score(self, user_id, score):
+        """Insert a user or move them to a new score"""
+        with self._lock:
+            self._move(user_id, score)
+            if self._changes is not None:
+                self._changes[user_id] = score
+
+    def remove(self, user_id):
+        """Drop a user from the index"""
+        with self._lock:
+            self._move(user_id, None)
+            if self._changes is not None:
+                self._changes[user_id] = None
+
+    def _count_higher(self, score):
+        count = 0
+        node = self._root
+        while node is not None:
+            if score < node.score:
+                count += _size(node.left) + len(node.members)
+                node = node.right
+            elif score > node.score:
+                node = node.left
+            else:
+                count += _size(node.left)
+                break
+        return count
+
+    def rank_of_score(self, score):
+        """Rank a user with the given score would hold"""
+        with self._lock:
+            return self._count_higher(score) + 1
+
+    def rank_of(self, user_id):
+        """Rank of an indexed user, or None if unknown"""
+        with self._lock:
+            score = self._scores.get(user_id)
+            if score is None:
+                return None
+            return self._count_higher(score) + 1
+
+    def _user_at(self, position):
+        node = self._root
+        while node is not None:
+            left_size = _size(node.left)
+            if position <= left_size:
+                node = node.left
+                continue
+            position -= left_size
+            if position <= len(node.members):
+                return node.members[position - 1], node.score
+            position -= len(node.members)
+            node = node.right
+        return None
+
+    def user_at(self, position):
+        """Return (userId, score) at a 1-based leaderboard position, or None"""
+        with self._lock:
+            return self._user_at(position)
+
+    def top(self, limit, offset=0):
+        """Return [(userId, score, rank)] for positions offset+1 .. offset+limit"""
+        with self._lock:
+            entries = []
+            rank = None
+            previous = None
+            for position in range(offset + 1, min(offset + limit, len(self._scores)) + 1):
+                user_id, score = self._user_at(position)
+                if score != previous:
+                    rank = self._count_higher(score) + 1
+                    previous = score
+                entries.append((user_id, score, rank))
+            return entries
+
+
+_rank_index = None
+_rank_index_lock = threading.Lock()
+
+
+def _user_scores():
+    """(userId, score) of every user"""
+    from models.user import User
+
+    # Walk the (-score, userId) index so the rebuild is a covered index scan
+    cursor = User._get_collection().find(
+        {}, {'_id': 0, 'userId': 1, 'score': 1}
+    ).sort([('score', -1), ('userId', 1)])
+    return ((doc['userId'], doc.get('score', 0)) for doc in cursor)
+
+
+def load_rank_index():
+    """Rebuild the shared rank index from the users collection (explicit refresh)"""
+    global _rank_index
+    with _rank_index_lock:
+        if _rank_index is None:
+            _rank_index = RankIndex(_user_scores())
+            return _rank_index
+    # The current contents keep serving while the new ones are read
+    _rank_index.rebuild(_user_scores())
+    return _rank_index
+
+
+def get_rank_index():
+    """Return the shared rank index, building it once on first use"""
+    global _rank_index
+    if _rank_index is None:
+        with _rank_index_lock:
+            # Requests that queued behind the first build reuse it
+            if _rank_index is None:
+                _rank_index = RankIndex(_user_scores())
+    return _rank_index
@@ -0,0 +1,196 @@
+"""
+Background job that writes every user's rank in bulk.
+
+Instead of ranking on each write, a single aggregation ranks all users
+server-side ($setWindowFields with $rank, so ties share a rank exactly as
+the rank index does) and $merges back only the ranks that changed, so
+users whose rank held are not rewritten. The job runs every `interval`
+seconds, or sooner once `every` completions have been recorded.
+
+A lease document in the counters collection ensures only one process runs
+it at a time. The same document holds the completions recorded by every
+process since the last run, which the lease owner polls to decide when
+`every` is reached, and the stats of the last run, so every process
+reports them.
+"""
+
+import os
+import socket
+import threading
+import time
+import uuid
+
+from mongoengine.connection import get_db
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from services.versions import COUNTERS_COLLECTION, bump_version
+
+LEASE_ID = 'rank_materializer_lease'
+# Seconds between checks of the shared completion count when `every` is set
+POLL_SECONDS = 1.0
+
+RANK_PIPELINE = [
+    {'$setWindowFields': {
+        'sortBy': {'score': -1},
+        'output': {'newRank': {'$rank': {}}}
+    }},
+    {'$match': {'$expr': {'$ne': ['$rank', '$newRank']}}},
+    {'$project': {'_id': 1, 'rank': '$newRank'}},
+    {'$merge': {
+        'into': 'users',
+        'on': '_id',
+        'whenMatched': 'merge',
+        'whenNotMatched': 'discard'
+    }}
+]
+
+
+class RankMaterializer:
+    """
+    Periodically recomputes and stores User.rank for every user
+    """
+
+    def __init__(self, interval=30.0, every=0):
+        self.interval = interval
+        self.every = every
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.last_error = None
+
+    def _counters(self):
+        return get_db()[COUNTERS_COLLECTION]
+
+    def record_completions(self, count=1):
+        """Add applied completions to the shared count
+
+        Only the lease owner is woken when it reaches `every`; other
+        processes leave it to the owner's polling.
+        """
+        if not self.every:
+            return
+        lease = self._counters().find_one_and_update(
+            {'_id': LEASE_ID}, {'$inc': {'pendingCompletions': count}},
+            projection={'owner': 1, 'pendingCompletions': 1},
+            upsert=True, return_document=ReturnDocument.AFTER
+        )
+        if lease.get('owner') == self.owner and lease['pendingCompletions'] >= self.every:
+            self._wake.set()
+
+    def _acquire_lease(self):
+        """Take or extend the lease; returns the lease document, or None if another process holds it"""
+        # Matches when the lease is ours, expired or never taken; otherwise
+        # the upsert collides with the existing lease document
+        now = time.time()
+        try:
+            return self._counters().find_one_and_update(
+                {'_id': LEASE_ID, '$or': [
+                    {'owner': self.owner}, {'owner': None}, {'expiresAt': {'$lt': now}}
+                ]},
+                {'$set': {'owner': self.owner, 'expiresAt': now + max(self.interval, 1) * 2}},
+                projection={'pendingCompletions': 1},
+                upsert=True, return_document=ReturnDocument.AFTER
+            )
+        except DuplicateKeyError:
+            return None
+
+    def _due(self):
+        """True when `every` completions are waiting and the lease is ours or free"""
+        lease = self._counters().find_one(
+            {'_id': LEASE_ID}, {'owner': 1, 'expiresAt': 1, 'pendingCompletions': 1}
+        ) or {}
+        if lease.get('pendingCompletions', 0) < self.every:
+            return False
+        return lease.get('owner') in (None, self.owner) or lease.get('expiresAt', 0) < time.time()
+
+    def run_once(self):
+        """Rank every user now; returns False if another process holds the lease"""
+        lease = self._acquire_lease()
+        if lease is None:
+            return False
+
+        from models.user import User
+
+        collection = User._get_collection()
+        pending = lease.get('pendingCompletions', 0)
+        started = time.perf_counter()
+        users = collection.estimated_document_count()
+        list(collection.aggregate(RANK_PIPELINE, allowDiskUse=True))
+        # Completions recorded during the run stay pending for the next one
+        self._counters().update_one({'_id': LEASE_ID}, {
+            '$set': {
+                'lastDurationMs': (time.perf_counter() - started) * 1000,
+                'usersProcessed': users,
+                'lastFinishedAt': time.time()
+            },
+            '$inc': {'runs': 1, 'pendingCompletions': -pending}
+        })
+
+        # Stored ranks feed the leaderboard
+        bump_version('leaderboard')
+        return True
+
+    def _loop(self):
+        # Completions recorded by other processes only show up in the
+        # shared count, so with `every` set the count is polled
+        timeout = min(self.interval, POLL_SECONDS) if self.every else self.interval
+        last_attempt = time.monotonic()
+        while not self._stop.is_set():
+            woken = self._wake.wait(timeout)
+            self._wake.clear()
+            if self._stop.is_set():
+                break
+            try:
+                if woken or time.monotonic() - last_attempt >= self.interval or (self.every and self._due()):
+                    last_attempt = time.monotonic()
+                    self.run_once()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error materializing ranks: {e}")
+
+    def start(self):
+        """Start the background thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='rank-materializer', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the background thread"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def stats(self):
+        """Return duration, users processed and staleness of the last run in any process"""
+        lease = self._counters().find_one({'_id': LEASE_ID}) or {}
+        finished_at = lease.get('lastFinishedAt')
+        return {
+            'runs': lease.get('runs', 0),
+            'lastDurationMs': lease.get('lastDurationMs'),
+            'usersProcessed': lease.get('usersProcessed'),
+            'stalenessSeconds': time.time() - finished_at if finished_at else None,
+            'pendingCompletions': lease.get('pendingCompletions', 0),
+            'lastError': self.last_error
+        }
+
+
+_materializer = None
+_materializer_lock = threading.Lock()
+
+
+def get_rank_materializer():
+    """Return the shared rank materializer"""
+    global _materializer
+    if _materializer is None:
+        with _materializer_lock:
+            if _materializer is None:
+                _materializer = RankMaterializer(
+                    interval=float(os.getenv('RANK_MATERIALIZE_INTERVAL', '30')),
+                    every=int(os.getenv('RANK_MATERIALIZE_EVERY', '0'))
+                )
+    return _materializer
@@ -0,0 +1,50 @@
+"""
+Chooses how ranks are produced.
+
+RANK_MODE=index (default) ranks on every write and read with the in-memory
+rank index. RANK_MODE=background leaves writes rank-free and serves the
+ranks stored by the background rank materializer.
+"""
+
+import os
+
+from services.rank_index import get_rank_index
+
+
+def background_ranking():
+    """True when ranks come from the background materializer"""
+    return os.getenv('RANK_MODE', 'index').lower() == 'background'
+
+
+def record_scores(scores, completions=0):
+    """Tell the active ranking strategy about new {userId: score} values"""
+    if background_ranking():
+        if completions:
+            from services.rank_materializer import get_rank_materializer
+
+            get_rank_materializer().record_completions(completions)
+        return
+    rank_index = get_rank_index()
+    for user_id, score in scores.items():
+        rank_index.set_score(user_id, score)
+
+
+def rank_for(user_id, score, stored_rank):
+    """Rank to report for a user, given the score that was read for them
+
+    Reads never write to the index: the score may come from a cache, so the
+    user is ranked at the score the index holds for them, and at `score`
+    only if the index does not know them yet.
+    """
+    if background_ranking():
+        return stored_rank
+    rank_index = get_rank_index()
+    rank = rank_index.rank_of(user_id)
+    return rank if rank is not None else rank_index.rank_of_score(score)
+
+
+def rank_for_score(score, stored_rank):
+    """Rank to report for a leaderboard entry with the given score"""
+    if background_ranking():
+        return stored_rank
+    return get_rank_index().rank_of_score(score)
@@ -0,0 +1,206 @@
+"""
+Completion event log and per-window score rollups.
+
+Every applied completion is appended to the completions collection and
+added to the user's score in the current day and ISO-week buckets of the
+score_rollups collection in the same request. A windowed leaderboard is
+then a single range query on the (window, bucket, -score, userId) index,
+so its cost follows the page size rather than the number of events.
+
+Rollups can always be recomputed from the event log: rebuild_rollups()
+regroups the events of the retained buckets server-side and $merges the
+totals over the stored ones, and compact_rollups() drops buckets that have
+fallen out of retention. Both can be run from the command line:
+
+    python -m services.rollups rebuild
+    python -m services.rollups compact
+"""
+
+import argparse
+import os
+from datetime import datetime, timedelta, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+WINDOWS = ('day', 'week')
+
+
+def retention_days():
+    return int(os.getenv('ROLLUP_RETENTION_DAYS', '35'))
+
+
+def bucket_keys(at):
+    """Day and ISO-week bucket names for a UTC timestamp"""
+    year, week, _ = at.isocalendar()
+    return {'day': at.strftime('%Y-%m-%d'), 'week': f'{year}-W{week:02d}'}
+
+
+def current_bucket(window, now=None):
+    return bucket_keys(now or datetime.now(timezone.utc))[window]
+
+
+def _rollup_ops(events, at):
+    totals = {}
+    for user_id, _, score in events:
+        for window, bucket in bucket_keys(at).items():
+            key = (window, bucket, user_id)
+            totals[key] = totals.get(key, 0) + score
+    return [
+        UpdateOne({'window': window, 'bucket': bucket, 'userId': user_id},
+                  {'$inc': {'score': score}}, upsert=True)
+        for (window, bucket, user_id), score in totals.items()
+    ]
+
+
+def record_completions(events, at=None, logged=False):
+    """Log applied (userId, challenge_id, score) completions and add them to the rollups
+
+    Events already in the log (the unique (userId, challenge_id) index) are
+    skipped, so recording is idempotent. Pass logged=True when the caller
+    has already inserted the events (collection completion storage).
+    """
+    from models.completion import Completion
+    from models.score_rollup import ScoreRollup
+
+    if not events:
+        return
+    at = at or datetime.now(timezone.utc)
+    docs = [
+        {'userId': user_id, 'challenge_id': challenge_id, 'score': score, 'completedAt': at}
+        for user_id, challenge_id, score in events
+    ]
+    inserted = set(range(len(docs)))
+    if not logged:
+        try:
+            Completion._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') != 11000:
+                    raise
+                inserted.discard(error['index'])
+
+    ops = _rollup_ops([events[i] for i in sorted(inserted)], at)
+    collection = ScoreRollup._get_collection()
+    # Two first increments for the same bucket can race on the unique index;
+    # the loser is retried once and then finds the bucket
+    for attempt in range(2):
+        if not ops:
+            break
+        try:
+            collection.bulk_write(ops, ordered=False)
+            ops = []
+        except BulkWriteError as e:
+            failed = []
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') != 11000 or attempt:
+                    raise
+                failed.append(ops[error['index']])
+            ops = failed
+
+
+def window_leaderboard(window, limit, after=None, now=None):
+    """A page of the leaderboard for the current day or week
+
+    `after` is the (score, userId, rank) of the last entry on the previous
+    page. Deeper pages start from that rank and only count the users tied
+    with it, so their cost does not grow with the page number.
+    """
+    from models.score_rollup import ScoreRollup
+    from services.leaderboard_cache import (
+        LEADERBOARD_SORT, leaderboard_projection, leaderboard_query, rank_entries
+    )
+
+    collection = ScoreRollup._get_collection()
+    scope = {'window': window, 'bucket': current_bucket(window, now)}
+    cursor = collection.find(
+        dict(scope, **leaderboard_query(after[:2] if after else None)), leaderboard_projection(False)
+    ).sort(LEADERBOARD_SORT).limit(limit)
+    leaderboard = rank_entries(cursor, first_page=True, stored_ranks=False, rank_of_score=None)
+    if after is None:
+        return leaderboard
+
+    score, user_id, rank = after
+    # Position of the previous page's last entry among everyone ranked so far
+    position = rank + collection.count_documents(dict(scope, score=score, userId={'$lt': user_id}))
+    for entry in leaderboard:
+        entry['rank'] = rank if entry['score'] == score else position + entry['rank']
+    return leaderboard
+
+
+def _oldest_retained(now):
+    return bucket_keys(now - timedelta(days=retention_days()))
+
+
+def _bucket_expression(window):
+    if window == 'day':
+        return {'$dateToString': {'format': '%Y-%m-%d', 'date': '$completedAt'}}
+    week = {'$isoWeek': '$completedAt'}
+    return {'$concat': [
+        {'$toString': {'$isoWeekYear': '$completedAt'}},
+        '-W',
+        {'$cond': [{'$lt': [week, 10]}, {'$concat': ['0', {'$toString': week}]}, {'$toString': week}]}
+    ]}
+
+
+def rebuild_rollups(now=None):
+    """Recompute every retained bucket from the event log"""
+    from models.completion import Completion
+    from models.score_rollup import ScoreRollup
+
+    now = now or datetime.now(timezone.utc)
+    oldest = _oldest_retained(now)
+    ScoreRollup.ensure_indexes()
+    for window in WINDOWS:
+        # Start from the beginning of the oldest retained week so it is complete
+        since = now - timedelta(days=retention_days())
+        if window == 'week':
+            since -= timedelta(days=since.weekday())
+        since = since.replace(hour=0, minute=0, second=0, microsecond=0)
+        list(Completion._get_collection().aggregate([
+            {'$match': {'completedAt': {'$gte': since}}},
+            {'$group': {
+                '_id': {'bucket': _bucket_expression(window), 'userId': '$userId'},
+                'score': {'$sum': '$score'}
+            }},
+            {'$match': {'_id.bucket': {'$gte': oldest[window]}}},
+            {'$project': {
+                '_id': 0, 'window': {'$literal': window}, 'bucket': '$_id.bucket',
+                'userId': '$_id.userId', 'score': 1
+            }},
+            {'$merge': {
+                'into': ScoreRollup._meta['collection'],
+                'on': ['window', 'bucket', 'userId'],
+                'whenMatched': 'replace',
+                'whenNotMatched': 'insert'
+            }}
+        ], allowDiskUse=True))
+
+
+def compact_rollups(now=None):
+    """Delete buckets older than ROLLUP_RETENTION_DAYS; returns the number removed"""
+    from models.score_rollup import ScoreRollup
+
+    oldest = _oldest_retained(now or datetime.now(timezone.utc))
+    collection = ScoreRollup._get_collection()
+    return sum(
+        collection.delete_many({'window': window, 'bucket': {'$lt': oldest[window]}}).deleted_count
+        for window in WINDOWS
+    )
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from db import connect_db
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Maintain the windowed leaderboard rollups')
+    parser.add_argument('command', choices=['rebuild', 'compact'])
+    args = parser.parse_args()
+
+    connect_db()
+    if args.command == 'rebuild':
+        rebuild_rollups()
+        print("Rollups rebuilt from the completion log")
+    else:
+        print(f"Removed {compact_rollups()} expired rollups")
@@ -0,0 +1,45 @@
+"""
+Helpers for sending pre-serialized JSON bodies.
+
+Routes build plain dicts from projected raw documents and serialize them
+here, skipping both Document hydration and Flask's jsonify.
+"""
+
+import json
+
+from flask import Response, request
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+def dumps(obj):
+    """Serialize obj to compact JSON bytes (with orjson when installed)"""
+    if orjson is not None:
+        return orjson.dumps(obj)
+    return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+
+def loads(body):
+    """Parse JSON bytes (with orjson when installed)"""
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def json_response(body, status=200, gzipped=None):
+    """Build a JSON response from already serialized bytes
+
+    When a gzip-compressed copy is supplied it is sent to clients that
+    accept gzip.
+    """
+    if gzipped is not None and 'gzip' in request.accept_encodings:
+        response = Response(gzipped, status=status, mimetype='application/json')
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        response = Response(body, status=status, mimetype='application/json')
+    if gzipped is not None:
+        response.vary.add('Accept-Encoding')
+    return response
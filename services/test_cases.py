@@ -0,0 +1,152 @@
+"""
+Storage and streaming of large challenge test-case sets.
+
+Small sets stay inline in Challenge.testCases. A set whose JSON exceeds
+TEST_CASES_INLINE_BYTES is written once as a JSON array to the
+`challenge_tests` GridFS bucket (255 KB chunks) and the challenge only keeps
+its file id (testCasesFile) and testCaseCount, so catalog loads and every
+other challenge read no longer carry those bytes.
+
+Offloaded sets are sent by streaming the stored chunks straight to the
+client: the chunks already hold the serialized JSON, so a request holds
+one chunk in memory at a time however large the set is. Replacing a set
+writes a new file before switching the challenge to it and deletes the old
+one afterwards.
+
+Existing inline sets over the threshold can be moved with:
+
+    python -m services.test_cases offload
+"""
+
+import argparse
+import os
+from itertools import chain
+
+from gridfs import GridFSBucket
+from mongoengine.connection import get_db
+from pymongo import ReturnDocument
+
+from services.challenge_catalog import VERSION_KEY
+from services.serialization import dumps
+from services.versions import bump_version
+
+BUCKET_NAME = 'challenge_tests'
+
+
+def inline_limit():
+    """Largest test-case JSON (bytes) kept inside the challenge document"""
+    return int(os.getenv('TEST_CASES_INLINE_BYTES', '262144'))
+
+
+def get_bucket(db=None):
+    return GridFSBucket(db if db is not None else get_db(), bucket_name=BUCKET_NAME)
+
+
+def _write_file(bucket, challenge_id, cases):
+    """Upload cases as one JSON array; returns (file id, count)"""
+    count = 0
+    with bucket.open_upload_stream(f'{challenge_id}.json', metadata={'challenge_id': challenge_id}) as stream:
+        stream.write(b'[')
+        for case in cases:
+            if count:
+                stream.write(b',')
+            stream.write(dumps(case))
+            count += 1
+        stream.write(b']')
+    return stream._id, count
+
+
+def store_test_cases(challenge_id, cases, limit=None):
+    """Replace a challenge's test cases, offloading the set if it is large
+
+    `cases` may be any iterable; only up to `limit` bytes of it are held
+    in memory. Returns True if the set was offloaded, or None when the
+    challenge does not exist.
+    """
+    from models.challenge import Challenge
+
+    limit = inline_limit() if limit is None else limit
+    cases = iter(cases)
+    head, size, large = [], 2, False
+    for case in cases:
+        head.append(case)
+        size += len(dumps(case)) + 1
+        if size > limit:
+            large = True
+            break
+
+    bucket = get_bucket()
+    if large:
+        file_id, count = _write_file(bucket, challenge_id, chain(head, cases))
+        update = {'$set': {'testCases': [], 'testCasesFile': file_id, 'testCaseCount': count}}
+    else:
+        file_id = None
+        update = {'$set': {'testCases': head, 'testCaseCount': len(head)}, '$unset': {'testCasesFile': ''}}
+
+    previous = Challenge._get_collection().find_one_and_update(
+        {'challenge_id': challenge_id}, update,
+        projection={'_id': 0, 'testCasesFile': 1}, return_document=ReturnDocument.BEFORE
+    )
+    if previous is None:
+        if file_id is not None:
+            bucket.delete(file_id)
+        return None
+    if previous.get('testCasesFile') is not None:
+        bucket.delete(previous['testCasesFile'])
+    bump_version(VERSION_KEY)
+    return large
+
+
+def open_test_cases(file_id):
+    """Open an offloaded set for reading; raises gridfs.errors.NoFile if it is gone"""
+    return get_bucket().open_download_stream(file_id)
+
+
+def iter_chunks(grid_out):
+    """Yield the stored JSON of an opened set chunk by chunk"""
+    try:
+        while True:
+            chunk = grid_out.readchunk()
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        grid_out.close()
+
+
+def stream_challenge(prefix, grid_out):
+    """Yield a challenge body: its other fields, then the streamed test cases"""
+    yield prefix
+    yield from iter_chunks(grid_out)
+    yield b'}'
+
+
+def offload_large_sets(limit=None):
+    """Move inline test-case sets larger than `limit` bytes to GridFS; returns how many moved"""
+    from models.challenge import Challenge
+
+    limit = inline_limit() if limit is None else limit
+    moved = 0
+    cursor = Challenge._get_collection().find(
+        {'testCasesFile': None, 'testCases.0': {'$exists': True}},
+        {'_id': 0, 'challenge_id': 1, 'testCases': 1}
+    ).batch_size(1)
+    for doc in cursor:
+        if len(dumps(doc['testCases'])) > limit and store_test_cases(doc['challenge_id'], doc['testCases'], limit):
+            moved += 1
+    return moved
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from db import connect_db
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Maintain offloaded challenge test cases')
+    parser.add_argument('command', choices=['offload'])
+    parser.add_argument('--min-bytes', type=int, default=None,
+                        help='offload sets larger than this (default: TEST_CASES_INLINE_BYTES)')
+    args = parser.parse_args()
+
+    connect_db()
+    print(f"Offloaded {offload_large_sets(args.min_bytes)} test-case sets")
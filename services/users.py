@@ -0,0 +1,83 @@
+"""
+User provisioning without find-then-save round trips.
+
+Single users are created with an upsert and cohorts with one unordered
+insert_many; the unique userId index decides which users already existed.
+"""
+
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+
+CREATED = 'created'
+EXISTS = 'exists'
+INVALID = 'invalid'
+
+MAX_BATCH_SIZE = 10000
+
+
+def valid_user_id(user_id):
+    """Check a userId against the User model constraints"""
+    return isinstance(user_id, str) and 0 < len(user_id) <= 100
+
+
+PROFILE_PROJECTION = {'_id': 0, 'userId': 1, 'score': 1, 'rank': 1, 'completedChallenges': 1}
+
+
+def find_user_profile(user_id, projection=PROFILE_PROJECTION):
+    """Fetch the raw profile fields of a user, or None if unknown"""
+    from models.user import User
+
+    return User._get_collection().find_one({'userId': user_id}, projection)
+
+
+def new_user_fields():
+    """Field values a new user starts with (matches the User defaults)"""
+    return {'score': 0, 'rank': 0, 'completedChallenges': [], 'completedCount': 0}
+
+
+def create_user_document(user_id):
+    """Create a user in one round trip; returns False if it already existed"""
+    from models.user import User
+
+    try:
+        result = User._get_collection().update_one(
+            {'userId': user_id},
+            {'$setOnInsert': new_user_fields()},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # A concurrent upsert for the same userId inserted first
+        return False
+    return result.upserted_id is not None
+
+
+def create_user_documents(user_ids):
+    """Create many users with a single unordered insert; returns one status per id"""
+    from models.user import User
+
+    statuses = [None] * len(user_ids)
+    docs = []
+    doc_items = []
+    seen = set()
+    for i, user_id in enumerate(user_ids):
+        if not valid_user_id(user_id):
+            statuses[i] = INVALID
+        elif user_id in seen:
+            statuses[i] = EXISTS
+        else:
+            seen.add(user_id)
+            docs.append(dict(new_user_fields(), userId=user_id))
+            doc_items.append(i)
+
+    failed = set()
+    if docs:
+        try:
+            User._get_collection().insert_many(docs, ordered=False)
+        except BulkWriteError as e:
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') != 11000:
+                    raise
+                failed.add(error['index'])
+
+    for doc_index, i in enumerate(doc_items):
+        statuses[i] = EXISTS if doc_index in failed else CREATED
+    return statuses
@@ -0,0 +1,28 @@
+"""
+Shared version counters stored in MongoDB.
+
+Process-local caches compare their cached version against these counters
+so a write in one worker process invalidates the caches of every worker.
+"""
+
+from mongoengine.connection import get_db
+from pymongo import ReturnDocument
+
+COUNTERS_COLLECTION = 'counters'
+
+
+def get_version(name):
+    """Return the current version of a named counter (0 if never bumped)"""
+    doc = get_db()[COUNTERS_COLLECTION].find_one({'_id': name}, {'version': 1})
+    return doc['version'] if doc else 0
+
+
+def bump_version(name):
+    """Increment a named counter and return the new version"""
+    doc = get_db()[COUNTERS_COLLECTION].find_one_and_update(
+        {'_id': name},
+        {'$inc': {'version': 1}},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    return doc['version']
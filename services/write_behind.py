@@ -0,0 +1,446 @@
+"""
+Write-behind buffer for challenge completions.
+
+With WRITE_BEHIND=True a completion is made durable by appending it to the
+completions collection (whose unique (userId, challenge_id) index is also
+the duplicate check), but the user's score is not touched in the request.
+With embedded storage the user's completedChallenges list is checked as
+well, both when the completion is taken and again when it is flushed, since
+seeded or older lists are not in the event log.
+Increments are coalesced per user in memory and flushed with one unordered
+bulk write every WRITE_BEHIND_FLUSH_MS milliseconds, or as soon as
+WRITE_BEHIND_FLUSH_OPS completions are waiting. A burst of completions for
+a few hundred users therefore costs a few hundred user writes per flush
+instead of one per completion.
+
+The buffer holds at most WRITE_BEHIND_MAX_PENDING completions; beyond that
+submit() raises BufferFull and the route answers 503 so clients back off.
+
+Crash recovery: buffered events are logged with applied=False and the
+owner of the buffer that took them. A flush first claims its events with a
+fresh flushId, then applies each user's increment together with
+$addToSet of the flushId to User.appliedFlushIds (filtered on the flushId
+not being there yet), marks the events applied and finally $pulls the
+flushId again. Re-applying a flush is therefore a no-op for every user it
+already reached, however many flushes ran in between.
+
+Each buffer keeps a lease in the counters collection while it runs.
+replay() only touches events whose owner's lease has expired: it finishes
+their interrupted flushes and claims and flushes the events they logged but
+never claimed. Workers replay at startup, one at a time under the
+'write_behind_replay' lease, or run:
+
+    python -m services.write_behind replay
+"""
+
+import argparse
+import os
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+from mongoengine.connection import get_db
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from services.completions import APPLIED, DUPLICATE, UNKNOWN_USER
+from services.versions import COUNTERS_COLLECTION
+
+OWNER_LEASE_PREFIX = 'write_behind:'
+REPLAY_LEASE_ID = 'write_behind_replay'
+# Seconds a buffer's lease outlives its last renewal
+LEASE_SECONDS = 30.0
+
+
+class BufferFull(Exception):
+    """Raised when the write-behind buffer cannot take more completions"""
+
+
+def write_behind_enabled():
+    """True when completions are buffered"""
+    return os.getenv('WRITE_BEHIND', 'False').lower() == 'true'
+
+
+def _renew_lease(lease_id, owner, seconds):
+    """Take or extend a lease in the counters collection; False if someone else holds it"""
+    now = time.time()
+    try:
+        get_db()[COUNTERS_COLLECTION].update_one(
+            {'_id': lease_id, '$or': [{'owner': owner}, {'expiresAt': {'$lt': now}}]},
+            {'$set': {'owner': owner, 'expiresAt': now + seconds}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+def _release_lease(lease_id, owner):
+    get_db()[COUNTERS_COLLECTION].delete_one({'_id': lease_id, 'owner': owner})
+
+
+def _live_owners():
+    """Owners of buffers whose lease has not expired"""
+    cursor = get_db()[COUNTERS_COLLECTION].find(
+        {'_id': {'$regex': f'^{OWNER_LEASE_PREFIX}'}, 'expiresAt': {'$gte': time.time()}},
+        {'owner': 1}
+    )
+    return [doc['owner'] for doc in cursor]
+
+
+def _apply(flush_id, totals):
+    """Apply {userId: [score, count, challenge ids]} once per flushId"""
+    from models.user import User
+    from services.completion_store import collection_storage
+    from services.profile_cache import get_profile_cache
+
+    ops = []
+    for user_id, (score, count, challenge_ids) in totals.items():
+        update = {
+            '$inc': {'score': score, 'completedCount': count},
+            '$addToSet': {'appliedFlushIds': flush_id}
+        }
+        if not collection_storage():
+            update['$push'] = {'completedChallenges': {'$each': challenge_ids}}
+        ops.append(UpdateOne({'userId': user_id, 'appliedFlushIds': {'$ne': flush_id}}, update))
+    if ops:
+        User._get_collection().bulk_write(ops, ordered=False)
+        get_profile_cache().invalidate(list(totals))
+    return len(ops)
+
+
+def _totals(events):
+    totals = {}
+    for event in events:
+        entry = totals.setdefault(event['userId'], [0, 0, []])
+        entry[0] += event['score']
+        entry[1] += 1
+        entry[2].append(event['challenge_id'])
+    return totals
+
+
+def _drop_completed(flush_id, events):
+    """Remove events for challenges already in the user's embedded list
+
+    Seeded lists, lists written before the event log existed and
+    completions the batch route applied while these events were buffered
+    are not in the completions collection, so its unique index lets them
+    through. Users the flush already reached are left alone: their ids
+    came from this flush. Returns the events that still have to be paid.
+    """
+    from models.completion import Completion
+    from models.user import User
+
+    owned = {
+        doc['userId']: set(doc['owned'])
+        for doc in User._get_collection().aggregate([
+            {'$match': {'userId': {'$in': list({event['userId'] for event in events})},
+                        'appliedFlushIds': {'$ne': flush_id}}},
+            {'$project': {'_id': 0, 'userId': 1, 'owned': {'$setIntersection': [
+                {'$ifNull': ['$completedChallenges', []]},
+                list({event['challenge_id'] for event in events})
+            ]}}}
+        ])
+    }
+    completed = {event['_id'] for event in events if event['challenge_id'] in owned.get(event['userId'], ())}
+    if completed:
+        Completion._get_collection().delete_many({'_id': {'$in': list(completed)}})
+    return [event for event in events if event['_id'] not in completed]
+
+
+def _finish_flush(flush_id):
+    """Apply and mark every event claimed by flush_id; returns (events, user writes)"""
+    from models.completion import Completion
+    from models.user import User
+    from services.completion_store import collection_storage
+
+    events = list(Completion._get_collection().find(
+        {'flushId': flush_id, 'applied': False},
+        {'_id': 1, 'userId': 1, 'challenge_id': 1, 'score': 1}
+    ))
+    if events and not collection_storage():
+        events = _drop_completed(flush_id, events)
+    if not events:
+        return [], 0
+    totals = _totals(events)
+    writes = _apply(flush_id, totals)
+    Completion._get_collection().update_many(
+        {'flushId': flush_id, 'applied': False}, {'$set': {'applied': True}}
+    )
+    # No event of the flush is left to re-apply, so its marker can go
+    User._get_collection().update_many(
+        {'userId': {'$in': list(totals)}}, {'$pull': {'appliedFlushIds': flush_id}}
+    )
+    return events, writes
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces per-user score increments and flushes them in bulk
+    """
+
+    def __init__(self, flush_interval=0.1, flush_ops=1000, max_pending=10000):
+        self.owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.flush_interval = flush_interval
+        self.flush_ops = flush_ops
+        self.max_pending = max_pending
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        # Logged events waiting to be claimed: {event id: (userId, score)}
+        self._pending = {}
+        self._deltas = {}
+        # Claimed flushes that still have to be applied (retried after errors)
+        self._unfinished = []
+        self.submitted = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_events = 0
+        self.user_writes = 0
+        self.last_flush_duration = None
+        self.last_error = None
+        self._lease_renewed_at = None
+        self._started_at = time.monotonic()
+
+    def submit(self, user_id, challenge_id, score):
+        """Log a completion and buffer its increment
+
+        Returns (status, user) where the user's score includes the increments
+        still buffered in this process. Raises BufferFull without logging
+        anything when the buffer is at capacity.
+        """
+        from models.completion import Completion
+        from models.user import User
+        from services.completion_store import collection_storage
+
+        if len(self._pending) >= self.max_pending:
+            self.rejected += 1
+            self._wake.set()
+            raise BufferFull()
+
+        collection = User._get_collection()
+        query = {'userId': user_id}
+        if not collection_storage():
+            # Embedded lists may hold completions the event log never saw
+            query['completedChallenges'] = {'$ne': challenge_id}
+        user = collection.find_one(query, {'_id': 0, 'userId': 1, 'score': 1, 'rank': 1})
+        if user is None:
+            if 'completedChallenges' in query and collection.find_one({'userId': user_id}, {'_id': 1}):
+                return DUPLICATE, None
+            return UNKNOWN_USER, None
+        event_id = ObjectId()
+        try:
+            Completion._get_collection().insert_one({
+                '_id': event_id, 'userId': user_id, 'challenge_id': challenge_id,
+                'score': score, 'completedAt': datetime.now(timezone.utc), 'applied': False,
+                'owner': self.owner
+            })
+        except DuplicateKeyError:
+            return DUPLICATE, None
+
+        with self._lock:
+            self._pending[event_id] = (user_id, score)
+            self._deltas[user_id] = self._deltas.get(user_id, 0) + score
+            user['score'] = user.get('score', 0) + self._deltas[user_id]
+            self.submitted += 1
+            full = len(self._pending) >= self.flush_ops
+        if full:
+            self._wake.set()
+        return APPLIED, user
+
+    def _claim(self):
+        """Give the buffered events a flushId; they are then recovered by flushId"""
+        from models.completion import Completion
+
+        with self._lock:
+            batch = self._pending
+            self._pending = {}
+        if not batch:
+            return
+        flush_id = str(ObjectId())
+        try:
+            Completion._get_collection().update_many(
+                {'_id': {'$in': list(batch)}, 'applied': False, 'flushId': None},
+                {'$set': {'flushId': flush_id}}
+            )
+        except Exception:
+            with self._lock:
+                self._pending = {**batch, **self._pending}
+            raise
+        self._unfinished.append(flush_id)
+        with self._lock:
+            for user_id, score in batch.values():
+                remaining = self._deltas.get(user_id, 0) - score
+                if remaining > 0:
+                    self._deltas[user_id] = remaining
+                else:
+                    self._deltas.pop(user_id, None)
+
+    def flush(self):
+        """Apply everything buffered so far; returns the number of completions flushed"""
+        from models.user import User
+        from services.leaderboard_cache import get_leaderboard_cache
+        from services.ranking import record_scores
+        from services.rollups import record_completions
+
+        events = []
+        with self._flush_lock:
+            started = time.perf_counter()
+            self._claim()
+            for flush_id in list(self._unfinished):
+                flushed, writes = _finish_flush(flush_id)
+                self._unfinished.remove(flush_id)
+                events.extend(flushed)
+                self.flushes += 1
+                self.flushed_events += len(flushed)
+                self.user_writes += writes
+            if self._unfinished or events:
+                self.last_flush_duration = time.perf_counter() - started
+
+        if events:
+            scores = {
+                doc['userId']: doc['score']
+                for doc in User._get_collection().find(
+                    {'userId': {'$in': list({event['userId'] for event in events})}},
+                    {'_id': 0, 'userId': 1, 'score': 1}
+                )
+            }
+            record_scores(scores, completions=len(events))
+            if scores:
+                get_leaderboard_cache().note_score(max(scores.values()))
+            record_completions(
+                [(event['userId'], event['challenge_id'], event['score']) for event in events],
+                logged=True
+            )
+        return len(events)
+
+    def _renew(self):
+        """Keep this buffer's lease alive so replay() leaves its events alone"""
+        now = time.monotonic()
+        if self._lease_renewed_at is None or now - self._lease_renewed_at >= LEASE_SECONDS / 3:
+            _renew_lease(OWNER_LEASE_PREFIX + self.owner, self.owner, LEASE_SECONDS)
+            self._lease_renewed_at = now
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self._renew()
+                self.flush()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"Error flushing completions: {e}")
+
+    def start(self):
+        """Start the flush thread (idempotent)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._renew()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='write-behind', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop the flush thread and flush what is left"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+        if self._lease_renewed_at is not None:
+            _release_lease(OWNER_LEASE_PREFIX + self.owner, self.owner)
+            self._lease_renewed_at = None
+
+    def stats(self):
+        """Return buffer occupancy, flush counts and write amplification"""
+        elapsed = time.monotonic() - self._started_at
+        return {
+            'pending': len(self._pending),
+            'maxPending': self.max_pending,
+            'submitted': self.submitted,
+            'rejected': self.rejected,
+            'flushes': self.flushes,
+            'flushedCompletions': self.flushed_events,
+            'userWrites': self.user_writes,
+            # User document writes per completion; 1.0 without the buffer
+            'writeAmplification': self.user_writes / self.flushed_events if self.flushed_events else None,
+            'completionsPerSecond': self.flushed_events / elapsed if elapsed else None,
+            'lastFlushMs': self.last_flush_duration * 1000 if self.last_flush_duration is not None else None,
+            'lastError': self.last_error
+        }
+
+
+def replay(grace=60.0):
+    """Recover completions logged but not applied by a buffer that died
+
+    Only events whose owner no longer holds a live lease are touched:
+    their interrupted flushes are finished with their own flushId, and
+    their unclaimed events older than `grace` seconds are claimed and
+    flushed. One process replays at a time. Returns the number of
+    completions applied, or None if another process is replaying.
+    """
+    from models.completion import Completion
+
+    owner = f'{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+    if not _renew_lease(REPLAY_LEASE_ID, owner, LEASE_SECONDS):
+        return None
+    try:
+        collection = Completion._get_collection()
+        orphaned = {'applied': False, 'owner': {'$nin': _live_owners()}}
+        applied = 0
+        for flush_id in collection.distinct('flushId', dict(orphaned, flushId={'$ne': None})):
+            applied += len(_finish_flush(flush_id)[0])
+
+        cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace)
+        flush_id = str(ObjectId())
+        collection.update_many(
+            dict(orphaned, flushId=None, completedAt={'$lt': cutoff}),
+            {'$set': {'flushId': flush_id}}
+        )
+        applied += len(_finish_flush(flush_id)[0])
+        return applied
+    finally:
+        _release_lease(REPLAY_LEASE_ID, owner)
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_write_behind_buffer():
+    """Return the shared write-behind buffer"""
+    global _buffer
+    if _buffer is None:
+        with _buffer_lock:
+            if _buffer is None:
+                _buffer = WriteBehindBuffer(
+                    flush_interval=float(os.getenv('WRITE_BEHIND_FLUSH_MS', '100')) / 1000,
+                    flush_ops=int(os.getenv('WRITE_BEHIND_FLUSH_OPS', '1000')),
+                    max_pending=int(os.getenv('WRITE_BEHIND_MAX_PENDING', '10000'))
+                )
+    return _buffer
+
+
+if __name__ == '__main__':
+    from dotenv import load_dotenv
+    from db import connect_db
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description='Maintain the write-behind completion log')
+    parser.add_argument('command', choices=['replay'])
+    parser.add_argument('--grace', type=float, default=60.0,
+                        help='only flush unclaimed completions older than this many seconds')
+    args = parser.parse_args()
+
+    connect_db()
+    applied = replay(args.grace)
+    if applied is None:
+        print("Another process is replaying; try again shortly")
+    else:
+        print(f"Replayed {applied} completions")
@@ -6,6 +6,7 @@ Test script to verify API endpoints
 import requests
 import json
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 # API base URL
 BASE_URL = 'http://localhost:5000'
@@ -22,6 +23,18 @@ def test_health_check():
         print(f"Error: {e}")
         return False
 
+def test_ready():
+    """Test readiness endpoint"""
+    print("\nTesting readiness...")
+    try:
+        response = requests.get(f'{BASE_URL}/ready')
+        print(f"Status: {response.status_code}")
+        print(f"Response: {response.json()}")
+        return response.status_code == 200 and response.json()['status'] == 'ready'
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
 def test_create_user():
     """Test user creation"""
     print("\nTesting user creation...")
@@ -76,6 +89,36 @@ def test_get_challenge():
         print(f"Error: {e}")
         return False
 
+def test_challenge_tests():
+    """Test the test-case sub-resource"""
+    print("\nTesting challenge test cases...")
+    try:
+        response = requests.get(f'{BASE_URL}/api/challenges/challenge_001/tests')
+        print(f"Status: {response.status_code}")
+        tests = response.json()
+        print(f"Found {len(tests)} test cases")
+        return response.status_code == 200 and isinstance(tests, list)
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_sparse_reads():
+    """Test challenge filters and sparse fieldsets"""
+    print("\nTesting filtered and sparse reads...")
+    try:
+        response = requests.get(f'{BASE_URL}/api/challenges?difficulty=easy&fields=title')
+        print(f"Status: {response.status_code}")
+        challenges = response.json()
+        print(f"Found {len(challenges)} easy challenges")
+        if response.status_code != 200 or any(set(c) != {'id', 'title'} for c in challenges):
+            return False
+        response = requests.get(f'{BASE_URL}/api/users/test_user_001?fields=score')
+        print(f"Response: {response.json()}")
+        return response.status_code == 200 and set(response.json()) == {'userId', 'score'}
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
 def test_complete_challenge():
     """Test completing a challenge"""
     print("\nTesting complete challenge...")
@@ -89,6 +132,46 @@ def test_complete_challenge():
         print(f"Error: {e}")
         return False
 
+def test_concurrent_completion():
+    """Test that parallel completions of the same challenge award points once"""
+    print("\nTesting concurrent completions...")
+    try:
+        userId = f'test_concurrent_{int(time.time() * 1000)}'
+        requests.post(f'{BASE_URL}/api/users', json={'userId': userId})
+        
+        def complete(_):
+            data = {'userId': userId, 'score': 10}
+            return requests.post(f'{BASE_URL}/api/challenges/challenge_002/complete', json=data).status_code
+        
+        with ThreadPoolExecutor(max_workers=20) as pool:
+            statuses = list(pool.map(complete, range(20)))
+        
+        user = requests.get(f'{BASE_URL}/api/users/{userId}').json()
+        print(f"Statuses: {sorted(statuses)}")
+        print(f"Final score: {user['score']}, completed: {user['completedChallenges']}")
+        return (statuses.count(200) == 1 and statuses.count(409) == 19
+                and user['score'] == 10 and user['completedChallenges'] == ['challenge_002'])
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_profile_after_completion():
+    """Test that a profile read right after a completion shows the new score"""
+    print("\nTesting profile freshness after completion...")
+    try:
+        userId = f'test_fresh_{int(time.time() * 1000)}'
+        requests.post(f'{BASE_URL}/api/users', json={'userId': userId})
+        before = requests.get(f'{BASE_URL}/api/users/{userId}').json()
+        
+        data = {'userId': userId, 'score': 25}
+        requests.post(f'{BASE_URL}/api/challenges/challenge_003/complete', json=data)
+        after = requests.get(f'{BASE_URL}/api/users/{userId}').json()
+        print(f"Score before: {before['score']}, after: {after['score']}")
+        return before['score'] == 0 and after['score'] == 25
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
 def test_leaderboard():
     """Test getting leaderboard"""
     print("\nTesting leaderboard...")
@@ -104,6 +187,70 @@ def test_leaderboard():
         print(f"Error: {e}")
         return False
 
+def test_leaderboard_conditional_get():
+    """Test that an unchanged leaderboard revalidates with 304"""
+    print("\nTesting leaderboard conditional GET...")
+    try:
+        response = requests.get(f'{BASE_URL}/api/leaderboard')
+        etag = response.headers.get('ETag')
+        print(f"ETag: {etag}")
+        response = requests.get(f'{BASE_URL}/api/leaderboard', headers={'If-None-Match': etag})
+        print(f"Status: {response.status_code}")
+        return response.status_code == 304
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_leaderboard_around():
+    """Test the around-me leaderboard window"""
+    print("\nTesting leaderboard around user...")
+    try:
+        response = requests.get(f'{BASE_URL}/api/leaderboard/around/test_user_001?radius=2')
+        print(f"Status: {response.status_code}")
+        if response.status_code != 200:
+            return False
+        window = response.json()
+        print(f"Window: {window}")
+        return any(entry['userId'] == 'test_user_001' for entry in window)
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_leaderboard_export():
+    """Test streaming the full leaderboard as NDJSON and CSV"""
+    print("\nTesting leaderboard export...")
+    try:
+        response = requests.get(f'{BASE_URL}/api/leaderboard/export', stream=True)
+        print(f"Status: {response.status_code}")
+        rows = [json.loads(line) for line in response.iter_lines() if line]
+        print(f"Exported {len(rows)} users")
+        # Ties share a rank; otherwise the rank is the row's position
+        ranked = all(
+            row['rank'] == (rows[i - 1]['rank'] if i and rows[i - 1]['score'] == row['score'] else i + 1)
+            for i, row in enumerate(rows)
+        )
+        csv_response = requests.get(f'{BASE_URL}/api/leaderboard/export', params={'format': 'csv'})
+        lines = csv_response.text.splitlines()
+        return (response.status_code == 200 and ranked
+                and any(row['userId'] == 'test_user_001' for row in rows)
+                and csv_response.status_code == 200
+                and lines[0] == 'rank,userId,score' and len(lines) == len(rows) + 1)
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
+def test_metrics():
+    """Test that /metrics reports the requests made so far"""
+    print("\nTesting metrics...")
+    try:
+        response = requests.get(f'{BASE_URL}/metrics')
+        print(f"Status: {response.status_code}")
+        return (response.status_code == 200
+                and 'reactivate_http_requests_total{route="/health"' in response.text)
+    except Exception as e:
+        print(f"Error: {e}")
+        return False
+
 def main():
     """Run all tests"""
     print("Starting API tests...")
@@ -114,12 +261,21 @@ def main():
     
     tests = [
         test_health_check,
+        test_ready,
         test_create_user,
         test_get_user,
         test_get_challenges,
         test_get_challenge,
+        test_challenge_tests,
+        test_sparse_reads,
         test_complete_challenge,
-        test_leaderboard
+        test_concurrent_completion,
+        test_profile_after_completion,
+        test_leaderboard,
+        test_leaderboard_conditional_get,
+        test_leaderboard_around,
+        test_leaderboard_export,
+        test_metrics
     ]
     
     passed = 0
@@ -5,7 +5,7 @@ Simple script to test MongoDB connection
 
 import os
 from dotenv import load_dotenv
-from mongoengine import connect, disconnect
+from db import connect_db, disconnect_db, ping
 
 def test_mongodb_connection():
     """Test MongoDB connection"""
@@ -26,7 +26,9 @@ def test_mongodb_connection():
     
     try:
         # Attempt to connect
-        connect(host=mongodb_uri)
+        if not connect_db(mongodb_uri):
+            return False
+        ping()
         print("✅ MongoDB connection successful!")
         
         # Test basic operations
@@ -42,7 +44,7 @@ def test_mongodb_connection():
             print("📊 Database connected (collections may be empty)")
         
         # Disconnect
-        disconnect()
+        disconnect_db()
         print("🔌 Disconnected from MongoDB")
         
         return True